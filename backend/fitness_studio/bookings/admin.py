@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Instructor, ClassType, FitnessClass, Client, Booking
+from .models import Instructor, ClassType, FitnessClass, Client, Booking, ClientStats, OutboxMessage
+from .cancellation import cancel_classes
 
 @admin.register(Instructor)
 class InstructorAdmin(admin.ModelAdmin):
@@ -18,6 +19,12 @@ class FitnessClassAdmin(admin.ModelAdmin):
     list_filter = ['status', 'class_type', 'instructor']
     search_fields = ['class_type__name', 'instructor__name']
     date_hierarchy = 'datetime'
+    actions = ['cancel_and_notify']
+
+    @admin.action(description='Cancel selected classes and notify their bookings')
+    def cancel_and_notify(self, request, queryset):
+        classes, bookings = cancel_classes(queryset, reason='Cancelled by the studio')
+        self.message_user(request, f"{classes} class(es) and {bookings} booking(s) cancelled.")
 
 @admin.register(Client)
 class ClientAdmin(admin.ModelAdmin):
@@ -31,3 +38,32 @@ class BookingAdmin(admin.ModelAdmin):
     list_filter = ['status', 'fitness_class__class_type']
     search_fields = ['booking_reference', 'client__name', 'client__email']
     date_hierarchy = 'booking_datetime'
+    actions = ['mark_completed', 'mark_no_show']
+
+    def _transition(self, request, queryset, new_status):
+        updated = sum(
+            booking.transition_to(new_status)
+            for booking in queryset.filter(status='confirmed')
+        )
+        self.message_user(request, f"{updated} booking(s) marked as {new_status}.")
+
+    @admin.action(description='Mark selected bookings as completed')
+    def mark_completed(self, request, queryset):
+        self._transition(request, queryset, 'completed')
+
+    @admin.action(description='Mark selected bookings as no-show')
+    def mark_no_show(self, request, queryset):
+        self._transition(request, queryset, 'no_show')
+
+@admin.register(ClientStats)
+class ClientStatsAdmin(admin.ModelAdmin):
+    list_display = ['client', 'total_bookings', 'confirmed_bookings', 'completed_bookings',
+                    'cancelled_bookings', 'no_show_bookings', 'updated_at']
+    search_fields = ['client__name', 'client__email']
+    readonly_fields = ['updated_at']
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['topic', 'status', 'attempts', 'available_at', 'created_at', 'sent_at']
+    list_filter = ['topic', 'status']
+    readonly_fields = ['created_at', 'sent_at']
@@ -0,0 +1,19 @@
+"""
+bookings.urls with the read-heavy endpoints swapped for their async twins.
+Derived rather than copied so both route tables always expose the same API.
+"""
+from django.urls import path
+from . import async_views
+from .urls import urlpatterns as sync_urlpatterns
+
+ASYNC_VIEWS = {
+    'class-list': async_views.list_classes,
+    'class-detail': async_views.get_class_details,
+    'get-bookings': async_views.get_bookings,
+}
+
+urlpatterns = [
+    path(str(pattern.pattern), ASYNC_VIEWS[pattern.name], name=pattern.name)
+    if pattern.name in ASYNC_VIEWS else pattern
+    for pattern in sync_urlpatterns
+]
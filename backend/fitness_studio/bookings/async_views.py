@@ -0,0 +1,179 @@
+"""
+Async twins of the read-heavy endpoints, routed in place of the DRF views
+when the project is served through asgi.py (see fitness_studio.asgi_urls).
+They return the same payloads as their sync counterparts in views.py and
+share their query builders, but wait on the database and cache without
+holding a worker thread, so a small pool can serve many slow clients.
+
+DRF views cannot be coroutines, so authentication and throttling run
+through DRF's own classes in a single thread hop before the view body.
+"""
+import logging
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.core.cache import cache
+from django.http import JsonResponse, HttpResponseNotAllowed
+from rest_framework import exceptions, status
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from .models import FitnessClass, Client
+from .serializers import FitnessClassSerializer, BookingSerializer, ClientSerializer, FieldsetQuerySerializer
+from .utils import agenerate_booking_stats
+from .cache import aclass_list_cache_key, class_list_ttl
+from .pagination import ClassCursorPagination, BookingCursorPagination
+from .fast_serializers import serialize_classes
+from .fieldsets import sideloaded_entities
+from .views import (
+    upcoming_classes, class_list_metadata, booking_history, recent_booking_details, invalid_fieldset
+)
+
+logger = logging.getLogger('booking')
+
+def _api_request(request):
+    """Wrap a Django request for DRF paginators, authenticators and throttles"""
+    return Request(request, authenticators=[auth() for auth in api_settings.DEFAULT_AUTHENTICATION_CLASSES])
+
+def _check_access(request):
+    """
+    Authenticate and apply the default throttles the way APIView.initial()
+    does for the sync views; returns the APIException to report, or None
+    """
+    api_request = _api_request(request)
+    try:
+        api_request.user
+        waits = []
+        for throttle_class in api_settings.DEFAULT_THROTTLE_CLASSES:
+            throttle = throttle_class()
+            if not throttle.allow_request(api_request, None):
+                waits.append(throttle.wait())
+        waits = [wait for wait in waits if wait is not None]
+        if waits:
+            raise exceptions.Throttled(max(waits))
+    except exceptions.APIException as exc:
+        if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+            exc.auth_header = api_request.authenticators[0].authenticate_header(api_request)
+        return exc
+    return None
+
+def _error_response(exc):
+    response = JsonResponse({'detail': exc.detail}, status=exc.status_code)
+    if getattr(exc, 'auth_header', None):
+        response['WWW-Authenticate'] = exc.auth_header
+    if getattr(exc, 'wait', None) is not None:
+        response['Retry-After'] = str(int(exc.wait))
+    return response
+
+def _not_found(model):
+    # Same body DRF renders for get_object_or_404 in the sync views
+    return JsonResponse(
+        {'detail': f'No {model._meta.object_name} matches the given query.'},
+        status=status.HTTP_404_NOT_FOUND
+    )
+
+def read_view(view):
+    """GET-only async view behind DRF's authentication and throttling"""
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method != 'GET':
+            return HttpResponseNotAllowed(['GET'])
+        exc = await sync_to_async(_check_access)(request)
+        if exc is not None:
+            return _error_response(exc)
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+@read_view
+async def list_classes(request):
+    """GET /api/classes (async): same payload and cache entries as ClassListView"""
+    params = request.GET
+    query = FieldsetQuerySerializer(data=params, context={'serializer_class': FitnessClassSerializer})
+    if not query.is_valid():
+        return JsonResponse(invalid_fieldset(query), status=status.HTTP_400_BAD_REQUEST)
+    context = {'request': request, 'fieldset': query.validated_data['fieldset']}
+    
+    cache_key = await aclass_list_cache_key(params)
+    cached_response = await cache.aget(cache_key)
+
+    if cached_response:
+        return JsonResponse(cached_response)
+
+    paginator = ClassCursorPagination()
+    # Django's async ORM hands every query to a thread; the cursor paginator
+    # evaluates its page and prefetch in one such hop
+    page = await sync_to_async(paginator.paginate_queryset)(
+        upcoming_classes(params, FitnessClassSerializer(context=context)), _api_request(request)
+    )
+    data = paginator.get_paginated_response(serialize_classes(page, context)).data
+    data['metadata'] = class_list_metadata(params, len(page))
+    data.update(sideloaded_entities(context))
+
+    await cache.aset(cache_key, data, class_list_ttl(c.datetime for c in page))
+
+    logger.info(f"Classes listed: {len(page)} classes returned")
+    return JsonResponse(data)
+
+@read_view
+async def get_class_details(request, class_id):
+    """GET /api/classes/{class_id} (async)"""
+    try:
+        fitness_class = await FitnessClass.objects.with_related().aget(id=class_id)
+    except FitnessClass.DoesNotExist:
+        return _not_found(FitnessClass)
+
+    serializer = FitnessClassSerializer(fitness_class, context={'request': request})
+    confirmed = fitness_class.bookings.filter(status='confirmed')
+    recent_bookings = [booking async for booking in confirmed.select_related('client')[:5]]
+
+    return JsonResponse({
+        'success': True,
+        'class': serializer.data,
+        'booking_details': {
+            'confirmed_bookings': await confirmed.acount(),
+            'waitlist_count': await fitness_class.bookings.filter(status='waitlisted').acount(),
+            'available_slots': fitness_class.available_slots,
+            'is_bookable': fitness_class.is_bookable,
+            'recent_bookings': recent_booking_details(recent_bookings)
+        }
+    })
+
+@read_view
+async def get_bookings(request):
+    """GET /api/bookings?email=user@example.com (async)"""
+    email = request.GET.get('email')
+
+    if not email:
+        return JsonResponse({
+            'success': False,
+            'message': 'Email parameter is required'
+        }, status=status.HTTP_400_BAD_REQUEST)
+
+    query = FieldsetQuerySerializer(data=request.GET, context={'serializer_class': BookingSerializer})
+    if not query.is_valid():
+        return JsonResponse(invalid_fieldset(query), status=status.HTTP_400_BAD_REQUEST)
+    context = {'request': request, 'fieldset': query.validated_data['fieldset']}
+
+    try:
+        client = await Client.objects.aget(email=email)
+    except Client.DoesNotExist:
+        return _not_found(Client)
+
+    paginator = BookingCursorPagination()
+    page = await sync_to_async(paginator.paginate_queryset)(
+        booking_history(client, request.GET, BookingSerializer(context=context)), _api_request(request)
+    )
+    booking_rows = BookingSerializer(page, many=True, context=context).data
+    stats = await agenerate_booking_stats(client)
+
+    logger.info(f"Bookings retrieved for {email}: {len(page)} bookings")
+
+    return JsonResponse({
+        'success': True,
+        'bookings': booking_rows,
+        **sideloaded_entities(context),
+        'pagination': {
+            'next': paginator.get_next_link(),
+            'previous': paginator.get_previous_link()
+        },
+        'client_info': ClientSerializer(client).data,
+        'statistics': stats
+    })
@@ -0,0 +1,76 @@
+"""
+Token authentication that resolves tokens from the cache.
+
+CachedTokenAuthentication keeps each token, with its user, in the cache
+named by BOOKING_SETTINGS['AUTH_TOKEN_CACHE'], so an authenticated request
+only queries Token and User on a miss. Entries are invalidated when the
+token is deleted (logout, rotation) and whenever its user is saved, which
+covers deactivation; see signals.py. Changes made with QuerySet.update()
+bypass those signals and only show once the entry expires.
+
+Invalidation only reaches the processes that share the cache. With an
+in-process backend (LocMemCache, as shipped) and several workers, a revoked
+token stays valid on the other workers until their entry expires, hence the
+short AUTH_TOKEN_CACHE_TTL; `manage.py check --deploy` warns about such a
+configuration. Point AUTH_TOKEN_CACHE at Redis or Memcached in production.
+"""
+import hashlib
+from django.conf import settings
+from django.core import checks
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.db import transaction
+from rest_framework.authentication import TokenAuthentication
+
+# Also how long a revoked token can outlive its revocation on workers that
+# do not share the cache
+AUTH_TOKEN_TTL = settings.BOOKING_SETTINGS.get('AUTH_TOKEN_CACHE_TTL', 30)
+
+# Written over an invalidated entry for a while: a request that loaded the
+# token before the change adds its entry only where none exists, so it
+# cannot bring the old token back
+REVOKED = 'revoked'
+REVOKED_TTL = 60
+
+def token_cache():
+    return caches[settings.BOOKING_SETTINGS.get('AUTH_TOKEN_CACHE', 'default')]
+
+@checks.register(checks.Tags.security, deploy=True)
+def check_token_cache(app_configs, **kwargs):
+    if not isinstance(token_cache(), LocMemCache):
+        return []
+    return [checks.Warning(
+        f"AUTH_TOKEN_CACHE is a per-process cache: with more than one worker, a revoked "
+        f"token stays valid on the others for up to {AUTH_TOKEN_TTL} seconds.",
+        hint="Point BOOKING_SETTINGS['AUTH_TOKEN_CACHE'] at a Redis or Memcached cache.",
+        id='bookings.W001',
+    )]
+
+def token_cache_key(key):
+    # Token keys are credentials; keep them out of the cache's key space
+    return 'auth_token_' + hashlib.sha256(key.encode()).hexdigest()
+
+def invalidate_token(key):
+    """
+    Revoke a cached token now, and again once the surrounding transaction
+    commits, after which no request can read the old row
+    """
+    cache_key = token_cache_key(key)
+    token_cache().set(cache_key, REVOKED, REVOKED_TTL)
+    transaction.on_commit(lambda: token_cache().set(cache_key, REVOKED, REVOKED_TTL))
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication that skips the Token + User query on a cache hit"""
+
+    def authenticate_credentials(self, key):
+        cache = token_cache()
+        cache_key = token_cache_key(key)
+        cached = cache.get(cache_key)
+        if cached is not None and cached != REVOKED:
+            return (cached.user, cached)
+
+        # Inactive users and unknown keys raise here and are never cached
+        user, token = super().authenticate_credentials(key)
+        if cached is None:
+            cache.add(cache_key, token, AUTH_TOKEN_TTL)
+        return (user, token)
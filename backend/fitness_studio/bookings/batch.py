@@ -0,0 +1,203 @@
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.db import models, transaction
+from django.utils import timezone
+from .models import FitnessClass, Client, Booking, ClientStats
+from .cache import invalidate_class_listings, invalidate_client_stats
+from .outbox import enqueue_many
+from .utils import resolve_timezone
+from .streaming import announce_availability
+
+MAX_BATCH_BOOKINGS = settings.BOOKING_SETTINGS.get('MAX_BATCH_BOOKINGS', 26)
+
+ALL_OR_NOTHING = 'all_or_nothing'
+BEST_EFFORT = 'best_effort'
+MODES = [ALL_OR_NOTHING, BEST_EFFORT]
+
+DUPLICATE_BOOKING = "You already have a booking for this class."
+FULLY_BOOKED = "This class is fully booked."
+
+def booking_blocker(fitness_class):
+    """Why a class cannot take a new confirmed booking, or None if it can"""
+    if fitness_class is None:
+        return "Class not found."
+    if not fitness_class.is_open_for_booking:
+        if fitness_class.status != 'scheduled':
+            return "This class is not available for booking."
+        if fitness_class.is_past:
+            return "Cannot book past classes."
+        return "This class cannot be booked at this time."
+    if fitness_class.available_slots <= 0:
+        return FULLY_BOOKED
+    return None
+
+def recurrence_datetimes(weekday, at, weeks, tz_name, start_date=None):
+    """Start times of a weekly series in the member's timezone (weekday: Monday is 0)"""
+    tz = resolve_timezone(tz_name)
+    start = start_date or timezone.localdate(timezone=tz)
+    first = start + timedelta(days=(weekday - start.weekday()) % 7)
+    return [tz.localize(datetime.combine(first + timedelta(weeks=week), at)) for week in range(weeks)]
+
+def resolve_recurrence(class_type, datetimes, instructor=None):
+    """Scheduled classes of class_type at the given start times, keyed by start time"""
+    classes = FitnessClass.objects.filter(
+        status='scheduled',
+        datetime__in=datetimes,
+        class_type__name__iexact=class_type
+    )
+    if instructor:
+        classes = classes.filter(instructor__name__icontains=instructor)
+    matches = {}
+    for start, class_id in classes.order_by('datetime', 'id').values_list('datetime', 'id'):
+        matches.setdefault(start, class_id)
+    return matches
+
+class _BatchAborted(Exception):
+    """Raised inside the batch transaction to roll back an all_or_nothing batch"""
+
+class BatchBooking:
+    """
+    Book one client into several classes with a fixed number of queries,
+    however many classes are requested: one read for the classes, one for
+    the client's existing bookings, one set-based seat claim and one bulk
+    insert. In all_or_nothing mode any failure leaves the database untouched;
+    in best_effort mode every bookable class is booked.
+    """
+
+    def __init__(self, client_data, items, mode=ALL_OR_NOTHING, special_requests=''):
+        # items: (class_id or None, requested datetime or None, reason when unresolved)
+        self.client_data = client_data
+        self.items = items
+        self.mode = mode
+        self.special_requests = special_requests
+        self.classes = {}
+        self.failures = {}
+        self.bookings = {}
+
+    def run(self):
+        pending = self.check()
+        if pending and not (self.has_failures and self.mode == ALL_OR_NOTHING):
+            try:
+                with transaction.atomic():
+                    client, _ = Client.objects.get_or_create(
+                        email=self.client_data['email'], defaults=self.client_data
+                    )
+                    claimed = self.claim_seats(pending)
+                    if len(claimed) < len(pending) and self.mode == ALL_OR_NOTHING:
+                        raise _BatchAborted
+                    if claimed:
+                        self.create_bookings(client, claimed)
+            except _BatchAborted:
+                pass
+        return self.results()
+
+    def check(self):
+        """Load the classes and the client's bookings for them; returns the bookable classes"""
+        class_ids = list(dict.fromkeys(class_id for class_id, _, _ in self.items if class_id))
+        self.classes = FitnessClass.objects.select_related(
+            'class_type', 'instructor'
+        ).in_bulk(class_ids)
+        already_booked = set(Booking.objects.filter(
+            fitness_class_id__in=class_ids,
+            client__email=self.client_data['email']
+        ).values_list('fitness_class_id', flat=True))
+
+        pending = []
+        for class_id in class_ids:
+            fitness_class = self.classes.get(class_id)
+            # Any earlier booking, even a cancelled one, occupies the (class, client) pair
+            reason = DUPLICATE_BOOKING if class_id in already_booked else booking_blocker(fitness_class)
+            if reason:
+                self.failures[class_id] = reason
+            else:
+                pending.append(fitness_class)
+        return pending
+
+    def claim_seats(self, pending):
+        """Claim one seat in every pending class, set-based when nobody else got in first"""
+        with transaction.atomic():
+            claimed = FitnessClass.objects.filter(
+                id__in=[fitness_class.id for fitness_class in pending],
+                status='scheduled',
+                current_bookings__lt=models.F('max_capacity')
+            ).update(
+                current_bookings=models.F('current_bookings') + 1,
+                updated_at=timezone.now()
+            )
+            if claimed == len(pending):
+                for fitness_class in pending:
+                    fitness_class.current_bookings += 1
+                invalidate_class_listings(
+                    *(fitness_class.datetime for fitness_class in pending),
+                    class_type_ids={fitness_class.class_type_id for fitness_class in pending}
+                )
+                announce_availability(*(fitness_class.id for fitness_class in pending))
+                return pending
+            # A class filled up since check(); undo and find out which one
+            transaction.set_rollback(True)
+
+        claimed = []
+        for fitness_class in pending:
+            if fitness_class.reserve_seat():
+                claimed.append(fitness_class)
+            else:
+                self.failures[fitness_class.id] = FULLY_BOOKED
+        return claimed
+
+    def create_bookings(self, client, claimed):
+        bookings = [
+            Booking(
+                fitness_class=fitness_class,
+                client=client,
+                status='confirmed',
+                payment_status='pending',
+                special_requests=self.special_requests,
+                booking_reference=Booking.generate_reference()
+            )
+            for fitness_class in claimed
+        ]
+        # bulk_create skips Booking.save(), so maintain its side effects here
+        Booking.objects.bulk_create(bookings)
+        Client.objects.filter(pk=client.pk).update(
+            total_bookings=models.F('total_bookings') + len(bookings)
+        )
+        ClientStats.record_transition(client.pk, None, 'confirmed', count=len(bookings))
+        invalidate_client_stats(client.pk)
+        enqueue_many('booking_confirmation', [{'booking_id': str(booking.id)} for booking in bookings])
+        self.bookings = {booking.fitness_class_id: booking for booking in bookings}
+
+    @property
+    def has_failures(self):
+        # Items that never resolved to a class (a missing week) fail as well
+        return bool(self.failures) or any(reason for _, _, reason in self.items)
+
+    @property
+    def booked_count(self):
+        return len(self.bookings)
+
+    def results(self):
+        results = []
+        for class_id, requested_at, reason in self.items:
+            fitness_class = self.classes.get(class_id)
+            result = {
+                'class_id': str(class_id) if class_id else None,
+                'datetime': (fitness_class.datetime if fitness_class else requested_at),
+            }
+            booking = self.bookings.get(class_id)
+            if booking:
+                result.update(status='booked', booking={
+                    'id': str(booking.id),
+                    'reference': booking.booking_reference,
+                    'class_name': fitness_class.class_type.name,
+                    'instructor': fitness_class.instructor.name,
+                    'location': fitness_class.location,
+                    'price': str(fitness_class.price)
+                })
+            elif reason or class_id in self.failures:
+                result.update(status='failed', reason=reason or self.failures[class_id])
+            else:
+                result.update(status='skipped', reason='Not booked because another class in the batch failed')
+            if result['datetime']:
+                result['datetime'] = result['datetime'].isoformat()
+            results.append(result)
+        return results
@@ -0,0 +1,107 @@
+import logging
+import statistics
+import subprocess
+import time
+import tracemalloc
+from contextlib import contextmanager
+from pathlib import Path
+from django.conf import settings
+from django.test import Client as HttpClient
+from django.test.utils import override_settings
+from .instrumentation import record_queries
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of samples"""
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    rank = max(0, min(len(ordered) - 1, round(pct / 100 * len(ordered) + 0.5) - 1))
+    return ordered[rank]
+
+def summarize(samples):
+    """Latency summary in milliseconds"""
+    millis = [sample * 1000 for sample in samples]
+    return {
+        'iterations': len(millis),
+        'p50_ms': round(percentile(millis, 50), 3),
+        'p95_ms': round(percentile(millis, 95), 3),
+        'p99_ms': round(percentile(millis, 99), 3),
+        'mean_ms': round(statistics.fmean(millis), 3),
+        'max_ms': round(max(millis), 3),
+    }
+
+def time_calls(func, iterations, warmup=1):
+    """Call func repeatedly and return the per-call wall times in seconds"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+def profile_calls(func, iterations):
+    """
+    Per-call SQL count and Python allocations, measured in a separate pass
+    from timing because tracemalloc slows every allocation down
+    """
+    queries = []
+    peaks = []
+    retained = []
+    tracemalloc.start()
+    try:
+        for _ in range(iterations):
+            before, _ = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            with record_queries() as stats:
+                func()
+            after, peak = tracemalloc.get_traced_memory()
+            queries.append(stats.count)
+            peaks.append(peak - before)
+            retained.append(after - before)
+    finally:
+        tracemalloc.stop()
+    return {
+        'queries_per_request': round(statistics.fmean(queries), 2),
+        'max_queries': max(queries),
+        'alloc_peak_kb': round(statistics.fmean(peaks) / 1024, 1),
+        'alloc_retained_kb': round(statistics.fmean(retained) / 1024, 1),
+    }
+
+def git_revision():
+    """Commit hash of the working tree, so reports can be lined up with history"""
+    try:
+        result = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=Path(__file__).resolve().parent,
+            capture_output=True, text=True, check=True,
+        )
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip() or None
+
+@contextmanager
+def benchmark_environment():
+    """
+    In-process HTTP client with response caching and throttling neutralised,
+    so measurements reflect the view and database work on every call
+    """
+    booking_logger = logging.getLogger('booking')
+    previous_level = booking_logger.level
+    booking_logger.setLevel(logging.WARNING)
+    try:
+        with override_settings(
+            ALLOWED_HOSTS=['testserver'],
+            CACHES={
+                'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+                'shared': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'},
+            },
+            # Counters in the dummy cache never reach a limit
+            BOOKING_SETTINGS={
+                **settings.BOOKING_SETTINGS,
+                'THROTTLE_STORE': 'bookings.throttling.CacheThrottleStore',
+            },
+        ):
+            yield HttpClient()
+    finally:
+        booking_logger.setLevel(previous_level)
@@ -0,0 +1,215 @@
+import hashlib
+import math
+import time
+from urllib.parse import urlencode
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.db import transaction
+from django.utils import timezone
+
+# Upper bound for a cached class listing. Bookings and changes to classes,
+# class types and instructors bump namespace versions; class_list_ttl() also
+# expires a listing when one of its classes passes the booking cutoff or
+# starts. The bound covers changes made without signals (QuerySet.update).
+CLASS_LIST_TTL = settings.BOOKING_SETTINGS.get('CLASS_LIST_CACHE_TTL', 60 * 5)
+
+# Client statistics include time-dependent counters (upcoming bookings), so
+# they are invalidated on booking changes but still expire on their own
+CLIENT_STATS_TTL = settings.BOOKING_SETTINGS.get('CLIENT_STATS_CACHE_TTL', 60 * 5)
+
+ALL_CLASSES_SCOPE = 'all'
+
+# Bumped whenever a class type is added, renamed or removed, which can change
+# the types a type= or difficulty= filter matches
+CLASS_TYPES_SCOPE = 'class_types'
+
+# Query parameters that narrow a listing to a set of class types
+CLASS_TYPE_FILTERS = ('type', 'difficulty')
+
+def date_scope(value):
+    """Namespace scope for listings filtered to one calendar date"""
+    if hasattr(value, 'date'):
+        value = timezone.localtime(value).date()
+    return f"date:{value}"
+
+def class_type_scope(class_type_id):
+    """Namespace scope for the classes of one class type"""
+    return f"class_type:{class_type_id}"
+
+def client_scope(client_id):
+    """Namespace scope for everything cached about one client"""
+    return f"client:{client_id}"
+
+def _version_key(scope):
+    return f"cache_version:{scope}"
+
+def version_cache():
+    # A bump must reach every worker at once, so versions skip any
+    # per-process tier of the default cache
+    return caches[settings.BOOKING_SETTINGS.get('CACHE_VERSION_CACHE', 'default')]
+
+def get_version(scope):
+    """Current version of a namespace, initialised on first use"""
+    key = _version_key(scope)
+    versions = version_cache()
+    version = versions.get(key)
+    if version is None:
+        # Seed from the clock so an evicted namespace never reuses old versions
+        versions.add(key, time.time_ns(), None)
+        version = versions.get(key)
+    return version
+
+async def aget_version(scope):
+    """get_version for async views"""
+    key = _version_key(scope)
+    versions = version_cache()
+    version = await versions.aget(key)
+    if version is None:
+        await versions.aadd(key, time.time_ns(), None)
+        version = await versions.aget(key)
+    return version
+
+def bump_version(scope):
+    """Invalidate every listing cached under this namespace"""
+    key = _version_key(scope)
+    versions = version_cache()
+    try:
+        versions.incr(key)
+    except ValueError:
+        versions.set(key, time.time_ns(), None)
+
+def query_fingerprint(query_params):
+    """
+    Digest of a query string that is the same in every process and for any
+    order of its parameters. A repeated parameter's values keep their order:
+    the views read the last one.
+    """
+    if hasattr(query_params, 'lists'):
+        items = query_params.lists()
+    else:
+        items = ((name, value if isinstance(value, (list, tuple)) else [value])
+                 for name, value in query_params.items())
+    canonical = urlencode([
+        (name, str(value))
+        for name, values in sorted(items, key=lambda item: item[0]) for value in values
+    ])
+    return hashlib.blake2b(canonical.encode(), digest_size=16).hexdigest()
+
+def _class_type_filters(query_params):
+    return {name: query_params.get(name) for name in CLASS_TYPE_FILTERS if query_params.get(name)}
+
+def _matching_class_types(filters):
+    from .models import ClassType
+    # Same lookups as views.upcoming_classes
+    class_types = ClassType.objects.all()
+    if 'type' in filters:
+        class_types = class_types.filter(name__icontains=filters['type'])
+    if 'difficulty' in filters:
+        class_types = class_types.filter(difficulty_level=filters['difficulty'])
+    return class_types.order_by('pk').values_list('pk', flat=True)
+
+def _listing_key(scopes, versions, query_params):
+    if len(scopes) == 1:
+        label, version = scopes[0], versions[0]
+    else:
+        # One version per matching class type; keep the key short
+        label = 'types'
+        version = hashlib.blake2b('.'.join(map(str, versions)).encode(), digest_size=8).hexdigest()
+    return f"classes_list_{label}_v{version}_{query_fingerprint(query_params)}"
+
+def class_list_cache_key(query_params):
+    """
+    Build the cache key for a class listing. Date-filtered listings only
+    depend on that date's namespace, listings filtered by class type (or
+    difficulty) on the namespaces of the matching types; everything else
+    hangs off the global one.
+    """
+    date = query_params.get('date')
+    filters = _class_type_filters(query_params)
+    if date:
+        scopes = [date_scope(date)]
+    elif filters:
+        # Which types match only changes with CLASS_TYPES_SCOPE
+        registry = get_version(CLASS_TYPES_SCOPE)
+        types_key = f"class_type_ids_v{registry}_{query_fingerprint(filters)}"
+        class_type_ids = cache.get(types_key)
+        if class_type_ids is None:
+            class_type_ids = list(_matching_class_types(filters))
+            cache.set(types_key, class_type_ids, CLASS_LIST_TTL)
+        scopes = [CLASS_TYPES_SCOPE] + [class_type_scope(pk) for pk in class_type_ids]
+    else:
+        scopes = [ALL_CLASSES_SCOPE]
+    return _listing_key(scopes, [get_version(scope) for scope in scopes], query_params)
+
+async def aclass_list_cache_key(query_params):
+    date = query_params.get('date')
+    filters = _class_type_filters(query_params)
+    if date:
+        scopes = [date_scope(date)]
+    elif filters:
+        registry = await aget_version(CLASS_TYPES_SCOPE)
+        types_key = f"class_type_ids_v{registry}_{query_fingerprint(filters)}"
+        class_type_ids = await cache.aget(types_key)
+        if class_type_ids is None:
+            class_type_ids = [pk async for pk in _matching_class_types(filters)]
+            await cache.aset(types_key, class_type_ids, CLASS_LIST_TTL)
+        scopes = [CLASS_TYPES_SCOPE] + [class_type_scope(pk) for pk in class_type_ids]
+    else:
+        scopes = [ALL_CLASSES_SCOPE]
+    return _listing_key(scopes, [await aget_version(scope) for scope in scopes], query_params)
+
+def class_list_ttl(class_datetimes):
+    """
+    Seconds a listing of classes starting at these times stays right: until
+    the next of them passes the booking cutoff (is_bookable) or starts
+    (is_past, and it leaves the upcoming listing), at most CLASS_LIST_TTL
+    """
+    from .models import FitnessClass
+    now = timezone.now()
+    cutoff_lead = FitnessClass.booking_cutoff() - now
+    boundaries = [
+        (boundary - now).total_seconds()
+        for value in class_datetimes
+        for boundary in (value - cutoff_lead, value)
+        if boundary > now
+    ]
+    return max(1, min([CLASS_LIST_TTL, *(math.ceil(seconds) for seconds in boundaries)]))
+
+def invalidate_class_listings(*class_datetimes, class_type_ids):
+    """
+    Bump the namespaces touched by classes at these datetimes and of these
+    class types once the surrounding transaction commits, so readers never
+    cache pre-commit state
+    """
+    scopes = {ALL_CLASSES_SCOPE}
+    scopes.update(date_scope(value) for value in class_datetimes if value is not None)
+    scopes.update(class_type_scope(pk) for pk in class_type_ids if pk is not None)
+
+    def bump():
+        for scope in scopes:
+            bump_version(scope)
+
+    transaction.on_commit(bump)
+
+def invalidate_class_types(*class_type_ids):
+    """A class type was added, renamed or removed: re-resolve type filters too"""
+    scopes = {ALL_CLASSES_SCOPE, CLASS_TYPES_SCOPE}
+    scopes.update(class_type_scope(pk) for pk in class_type_ids if pk is not None)
+
+    def bump():
+        for scope in scopes:
+            bump_version(scope)
+
+    transaction.on_commit(bump)
+
+def client_stats_cache_key(client_id):
+    scope = client_scope(client_id)
+    return f"booking_stats_{client_id}_v{get_version(scope)}"
+
+async def aclient_stats_cache_key(client_id):
+    scope = client_scope(client_id)
+    return f"booking_stats_{client_id}_v{await aget_version(scope)}"
+
+def invalidate_client_stats(client_id):
+    """Drop a client's cached statistics once the surrounding transaction commits"""
+    transaction.on_commit(lambda: bump_version(client_scope(client_id)))
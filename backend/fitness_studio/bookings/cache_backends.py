@@ -0,0 +1,164 @@
+"""
+Two-tier cache backend: a bounded in-process LRU (L1) in front of another
+configured cache (L2, shared by every worker).
+
+    CACHES = {
+        'default': {
+            'BACKEND': 'bookings.cache_backends.TwoTierCache',
+            'LOCATION': 'shared',  # alias of the L2 cache
+            'OPTIONS': {'L1_MAX_ENTRIES': 1024, 'L1_TIMEOUT': 5},
+        },
+        'shared': {...},
+    }
+
+Reads are served from L1 for at most L1_TIMEOUT seconds, so a change made
+by another worker shows after that long; writes, increments and deletes go
+to L2 and update or drop this process's L1 entry at once. An entry whose key
+changes on every write (the versioned listing keys in cache.py) is never
+stale in L1, provided the version it is keyed on is read from L2: keep
+version counters, and data that must be revoked everywhere immediately such
+as auth tokens, in L2 directly.
+"""
+import pickle
+import threading
+import time
+from collections import OrderedDict
+from django.core.cache import caches
+from django.core.cache.backends.base import BaseCache, DEFAULT_TIMEOUT
+
+# One L1 per LOCATION per process: Django builds cache instances per thread
+_layers = {}
+_layers_lock = threading.Lock()
+
+class _Layer:
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.counters = dict.fromkeys(('l1_hits', 'l1_misses', 'l2_hits', 'l2_misses'), 0)
+
+class TwoTierCache(BaseCache):
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.l2_alias = location
+        self.l1_max_entries = options.get('L1_MAX_ENTRIES', 1024)
+        self.l1_timeout = options.get('L1_TIMEOUT', 5)
+        with _layers_lock:
+            self.layer = _layers.setdefault(location, _Layer())
+
+    @property
+    def l2(self):
+        return caches[self.l2_alias]
+
+    # L1: pickled values, like LocMemCache, so callers never share objects
+
+    def _l1_get(self, key):
+        layer = self.layer
+        with layer.lock:
+            entry = layer.entries.get(key)
+            if entry is not None and entry[0] > time.monotonic():
+                layer.entries.move_to_end(key)
+                layer.counters['l1_hits'] += 1
+                return True, entry[1]
+            if entry is not None:
+                del layer.entries[key]
+            layer.counters['l1_misses'] += 1
+        return False, None
+
+    def _l1_set(self, key, value, timeout):
+        lifetime = self.l1_timeout
+        if timeout is not None and timeout is not DEFAULT_TIMEOUT:
+            lifetime = min(lifetime, timeout)
+        if lifetime <= 0:
+            return self._l1_delete(key)
+        pickled = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        layer = self.layer
+        with layer.lock:
+            layer.entries[key] = (time.monotonic() + lifetime, pickled)
+            layer.entries.move_to_end(key)
+            while len(layer.entries) > self.l1_max_entries:
+                layer.entries.popitem(last=False)
+
+    def _l1_delete(self, key):
+        with self.layer.lock:
+            self.layer.entries.pop(key, None)
+
+    def _count_l2(self, hit):
+        with self.layer.lock:
+            self.layer.counters['l2_hits' if hit else 'l2_misses'] += 1
+
+    def get(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version)
+        found, pickled = self._l1_get(l1_key)
+        if found:
+            return pickle.loads(pickled)
+        missing = object()
+        value = self.l2.get(key, missing, version=version)
+        self._count_l2(value is not missing)
+        if value is missing:
+            return default
+        self._l1_set(l1_key, value, self.l1_timeout)
+        return value
+
+    async def aget(self, key, default=None, version=None):
+        l1_key = self.make_and_validate_key(key, version)
+        found, pickled = self._l1_get(l1_key)
+        if found:
+            return pickle.loads(pickled)
+        missing = object()
+        value = await self.l2.aget(key, missing, version=version)
+        self._count_l2(value is not missing)
+        if value is missing:
+            return default
+        self._l1_set(l1_key, value, self.l1_timeout)
+        return value
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self.l2.set(key, value, timeout, version=version)
+        self._l1_set(self.make_and_validate_key(key, version), value, timeout)
+
+    async def aset(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        await self.l2.aset(key, value, timeout, version=version)
+        self._l1_set(self.make_and_validate_key(key, version), value, timeout)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        # The stored value is L2's to decide; the next get() fills L1
+        self._l1_delete(self.make_and_validate_key(key, version))
+        return self.l2.add(key, value, timeout, version=version)
+
+    async def aadd(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version))
+        return await self.l2.aadd(key, value, timeout, version=version)
+
+    def incr(self, key, delta=1, version=None):
+        # Atomic in L2; a cached L1 copy would be behind
+        self._l1_delete(self.make_and_validate_key(key, version))
+        return self.l2.incr(key, delta, version=version)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        # L1's copy may now outlive a shortened L2 entry; the next get() refills it
+        self._l1_delete(self.make_and_validate_key(key, version))
+        return self.l2.touch(key, timeout, version=version)
+
+    def delete(self, key, version=None):
+        self._l1_delete(self.make_and_validate_key(key, version))
+        return self.l2.delete(key, version=version)
+
+    def has_key(self, key, version=None):
+        # A stored None is still a key
+        missing = object()
+        return self.get(key, missing, version=version) is not missing
+
+    def clear(self):
+        with self.layer.lock:
+            self.layer.entries.clear()
+        self.l2.clear()
+
+    def stats(self):
+        """Hit and miss counts per layer in this process, and L1's size"""
+        with self.layer.lock:
+            return dict(self.layer.counters, l1_entries=len(self.layer.entries))
+
+    def reset_stats(self):
+        with self.layer.lock:
+            self.layer.counters.update(dict.fromkeys(self.layer.counters, 0))
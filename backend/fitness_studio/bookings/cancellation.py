@@ -0,0 +1,112 @@
+from collections import defaultdict
+from django.db import models, transaction
+from django.db.models import Case, Value, When
+from django.utils import timezone
+from .models import FitnessClass, Booking, ClientStats
+from .cache import invalidate_class_listings, invalidate_client_stats
+from .outbox import enqueue_many
+from .streaming import announce_availability
+
+ACTIVE_STATUSES = ['confirmed', 'waitlisted']
+
+def _group_by_deltas(booking_rows):
+    """
+    Group clients by how many confirmed and waitlisted bookings they lose.
+    Nearly everyone loses exactly one, so this yields a handful of groups
+    and the counters move with one UPDATE per group instead of one per client.
+    """
+    per_client = defaultdict(lambda: [0, 0])
+    for _, client_id, booking_status, _ in booking_rows:
+        per_client[client_id][booking_status == 'waitlisted'] += 1
+    groups = defaultdict(list)
+    for client_id, (confirmed, waitlisted) in per_client.items():
+        groups[confirmed, waitlisted].append(client_id)
+    return groups
+
+def _apply_stats_deltas(booking_rows):
+    """Move the counters of clients that have a ClientStats row; returns how many rows moved"""
+    updated = 0
+    for (confirmed, waitlisted), client_ids in _group_by_deltas(booking_rows).items():
+        updated += ClientStats.objects.filter(client_id__in=client_ids).update(
+            confirmed_bookings=models.F('confirmed_bookings') - confirmed,
+            waitlisted_bookings=models.F('waitlisted_bookings') - waitlisted,
+            cancelled_bookings=models.F('cancelled_bookings') + confirmed + waitlisted,
+            updated_at=timezone.now()
+        )
+    return updated
+
+def _update_client_stats(booking_rows):
+    """
+    Account for the cancelled bookings, once they are written. Clients
+    without a row get one counted from the Booking table, as in
+    ClientStats.apply_deltas.
+    """
+    client_ids = {row[1] for row in booking_rows}
+    if _apply_stats_deltas(booking_rows) == len(client_ids):
+        return
+    missing = client_ids - set(
+        ClientStats.objects.filter(client_id__in=client_ids).values_list('client_id', flat=True)
+    )
+    conflicted = set(ClientStats.create_missing(sorted(missing)))
+    if conflicted:
+        # Rows created meanwhile by another transaction lack this change
+        _apply_stats_deltas([row for row in booking_rows if row[1] in conflicted])
+
+def cancel_classes(classes, reason=''):
+    """
+    Cancel every scheduled class in the queryset and all of their active
+    bookings with a fixed number of statements, whatever the fan-out:
+
+    - one UPDATE marks the classes cancelled and frees their seats
+    - one UPDATE cancels the bookings (refunding paid ones)
+    - one UPDATE per distinct (confirmed, waitlisted) loss moves the
+      affected clients' ClientStats counters
+    - one bulk INSERT queues a class_cancelled message per class, listing
+      the bookings whose clients must be notified
+
+    Returns (classes cancelled, bookings cancelled).
+    """
+    with transaction.atomic():
+        class_rows = list(
+            classes.filter(status='scheduled').order_by().values_list('id', 'datetime', 'class_type_id')
+        )
+        class_ids = [class_id for class_id, _, _ in class_rows]
+        if not class_ids:
+            return 0, 0
+
+        # Writing first takes the locks, so no seat can be claimed once we
+        # start reading bookings (reserve_seat only claims scheduled classes)
+        FitnessClass.objects.filter(id__in=class_ids, status='scheduled').update(
+            status='cancelled',
+            current_bookings=0,
+            updated_at=timezone.now()
+        )
+
+        affected = Booking.objects.filter(fitness_class_id__in=class_ids, status__in=ACTIVE_STATUSES)
+        booking_rows = list(affected.order_by().values_list('id', 'client_id', 'status', 'fitness_class_id'))
+        if booking_rows:
+            affected.update(
+                status='cancelled',
+                payment_status=Case(
+                    When(payment_status='paid', then=Value('refunded')),
+                    default=models.F('payment_status')
+                )
+            )
+            _update_client_stats(booking_rows)
+            per_class = defaultdict(list)
+            for booking_id, _, _, class_id in booking_rows:
+                per_class[class_id].append(str(booking_id))
+            enqueue_many('class_cancelled', [
+                {'class_id': str(class_id), 'booking_ids': booking_ids, 'reason': reason}
+                for class_id, booking_ids in per_class.items()
+            ])
+
+        invalidate_class_listings(
+            *(class_datetime for _, class_datetime, _ in class_rows),
+            class_type_ids={class_type_id for _, _, class_type_id in class_rows}
+        )
+        announce_availability(*class_ids)
+        for client_id in {row[1] for row in booking_rows}:
+            invalidate_client_stats(client_id)
+
+    return len(class_ids), len(booking_rows)
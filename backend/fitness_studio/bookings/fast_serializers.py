@@ -0,0 +1,195 @@
+"""
+Read-only fast path for serializing many objects.
+
+CompiledSerializer produces exactly what a ModelSerializer's .data would,
+but walks a flat list of (key, getter) pairs built once per response from
+the serializer's bound fields, instead of dispatching through DRF's field
+machinery (get_attribute, to_representation, BindingDict) for every row.
+Field types without a dedicated getter fall back to the field's own
+to_representation, so new fields stay correct, just not faster.
+"""
+import decimal
+from operator import attrgetter
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import serializers
+from rest_framework import ISO_8601
+from rest_framework.settings import api_settings
+from .serializers import FitnessClassSerializer, prepare_local_times
+from .fieldsets import SideloadedField
+
+def _identity(value):
+    return value
+
+def _datetime_converter(field):
+    output_format = getattr(field, 'format', api_settings.DATETIME_FORMAT)
+    if output_format is None or output_format.lower() != ISO_8601:
+        return field.to_representation
+    field_timezone = field.timezone if hasattr(field, 'timezone') else field.default_timezone()
+    if field_timezone is None:
+        return field.to_representation
+
+    def convert(value):
+        if not timezone.is_aware(value):
+            return field.to_representation(value)
+        value = value.astimezone(field_timezone).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+def _decimal_converter(field):
+    coerce_to_string = getattr(field, 'coerce_to_string', api_settings.COERCE_DECIMAL_TO_STRING)
+    if (not coerce_to_string or field.localize or field.normalize_output
+            or field.decimal_places is None):
+        return field.to_representation
+    context = decimal.getcontext().copy()
+    if field.max_digits is not None:
+        context.prec = field.max_digits
+    exponent = decimal.Decimal('.1') ** field.decimal_places
+
+    def convert(value):
+        if not isinstance(value, decimal.Decimal):
+            return field.to_representation(value)
+        return '{:f}'.format(value.quantize(exponent, rounding=field.rounding, context=context))
+    return convert
+
+def _uuid_converter(field):
+    return str if field.uuid_format == 'hex_verbose' else field.to_representation
+
+def _boolean_converter(field):
+    def convert(value):
+        return value if value is True or value is False else field.to_representation(value)
+    return convert
+
+def _choice_converter(field):
+    choices = field.choice_strings_to_values
+
+    def convert(value):
+        if value == '':
+            return value
+        return choices.get(str(value), value)
+    return convert
+
+CONVERTERS = {
+    serializers.UUIDField: _uuid_converter,
+    serializers.CharField: lambda field: str,
+    serializers.EmailField: lambda field: str,
+    serializers.IntegerField: lambda field: int,
+    serializers.BooleanField: _boolean_converter,
+    serializers.ChoiceField: _choice_converter,
+    serializers.ReadOnlyField: lambda field: _identity,
+    serializers.JSONField: lambda field: field.to_representation if field.binary else _identity,
+    serializers.DateTimeField: _datetime_converter,
+    serializers.DecimalField: _decimal_converter,
+}
+
+def _compile_fields(serializer):
+    """(key, getter) pairs reproducing serializer.to_representation for one object"""
+    plan = []
+    for name, field in serializer.fields.items():
+        if field.write_only:
+            continue
+        if isinstance(field, serializers.SerializerMethodField):
+            plan.append((name, getattr(field.parent, field.method_name)))
+            continue
+        if isinstance(field, SideloadedField):
+            plan.append((name, _sideload_getter(field)))
+            continue
+        # Related fields read just the foreign key when rendering ids
+        if (field.source == '*' or isinstance(field, serializers.ListSerializer)
+                or isinstance(field, serializers.RelatedField)):
+            plan.append((name, _fallback(field)))
+            continue
+
+        read = attrgetter(field.source)
+        if isinstance(field, serializers.BaseSerializer):
+            convert = _compile_related(field)
+        else:
+            factory = CONVERTERS.get(type(field))
+            convert = factory(field) if factory else field.to_representation
+        plan.append((name, _getter(read, convert)))
+    return plan
+
+def _getter(read, convert):
+    def get(obj):
+        value = read(obj)
+        return None if value is None else convert(value)
+    return get
+
+def _sideload_getter(field):
+    read = attrgetter(field.source)
+    objects = field.context['sideloaded'][field.key].objects
+
+    def get(obj):
+        value = read(obj)
+        if value is None:
+            return None
+        objects[value.pk] = value
+        return value.pk
+    return get
+
+def _fallback(field):
+    def get(obj):
+        attribute = field.get_attribute(obj)
+        return None if attribute is None else field.to_representation(attribute)
+    return get
+
+def _compile_object(serializer):
+    plan = _compile_fields(serializer)
+
+    def convert(obj):
+        return {name: get(obj) for name, get in plan}
+    return convert
+
+def _compile_related(serializer):
+    """
+    Like _compile_object, for related objects: a listing repeats the same
+    few instructors and class types, so each is rendered once per response
+    """
+    convert = _compile_object(serializer)
+    rendered = {}
+
+    def convert_related(obj):
+        representation = rendered.get(obj.pk)
+        if representation is None:
+            representation = rendered[obj.pk] = convert(obj)
+        return representation
+    return convert_related
+
+class CompiledSerializer:
+    """
+    Fast read-only rendering for a ModelSerializer. render() returns the same
+    list of dicts as serializer_class(instances, many=True, context=context).data.
+    """
+
+    def __init__(self, serializer_class):
+        self.serializer_class = serializer_class
+
+    def render(self, instances, context=None):
+        # Binding the fields once per response gives method fields and nested
+        # serializers the response context, as DRF would
+        serializer = self.serializer_class(context=context if context is not None else {})
+        convert = _compile_object(serializer)
+        instances = list(instances)
+        self.prepare(serializer, instances)
+        return [convert(obj) for obj in instances]
+
+    def prepare(self, serializer, instances):
+        """Hook for the batch passes the serializer's list_serializer_class does"""
+
+class CompiledFitnessClassSerializer(CompiledSerializer):
+    def prepare(self, serializer, instances):
+        prepare_local_times(serializer.context, serializer.local_datetimes(instances))
+
+fitness_class_renderer = CompiledFitnessClassSerializer(FitnessClassSerializer)
+
+def serialize_classes(instances, context):
+    """
+    Listing rows for FitnessClass instances loaded for the serializer,
+    through the compiled fast path unless BOOKING_SETTINGS['FAST_CLASS_SERIALIZER']
+    is switched off
+    """
+    if settings.BOOKING_SETTINGS.get('FAST_CLASS_SERIALIZER', True):
+        return fitness_class_renderer.render(instances, context)
+    return FitnessClassSerializer(instances, many=True, context=context).data
@@ -0,0 +1,185 @@
+"""
+Sparse fieldsets for the list endpoints.
+
+?fields=id,datetime,location keeps only the named top-level fields, and
+?expand=instructor,fitness_class.class_type names the nested objects to
+embed; nested objects left out of an explicit expand render as their id.
+Without either parameter a response keeps its full shape.
+
+?normalize=true moves embedded objects whose serializer names a
+Meta.sideload_as key out of the rows: each row keeps <field>_id and the
+response carries every distinct object once under that top-level key.
+
+The bound serializer is the single description of a response: serializers
+using SparseFieldsetMixin drop what the context's Fieldset leaves out, and
+load_fields() reads the remaining fields to decide which columns to load
+and which relations to join or prefetch.
+"""
+from django.db import models
+from rest_framework import serializers
+
+def split_param(value):
+    """Comma-separated query parameter as a list of non-empty names"""
+    return [part.strip() for part in value.split(',') if part.strip()]
+
+class Fieldset:
+    """
+    Fields and expansions requested for one response; None means all.
+    Expand paths are dotted, and expanding a path expands its parents.
+    """
+
+    def __init__(self, fields=None, expand=None, normalize=False):
+        self.fields = None if fields is None else frozenset(fields)
+        self.normalize = normalize
+        self.expand = None
+        if expand is not None:
+            self.expand = frozenset(
+                '.'.join(parts[:depth])
+                for parts in (path.split('.') for path in expand)
+                for depth in range(1, len(parts) + 1)
+            )
+
+    def includes(self, path, name):
+        # ?fields= names top-level fields; embedded objects stay whole
+        return bool(path) or self.fields is None or name in self.fields
+
+    def expands(self, path):
+        return self.expand is None or path in self.expand
+
+def field_path(field):
+    """Dotted position of a bound field below the root serializer"""
+    names = []
+    while field is not None:
+        if field.field_name:
+            names.append(field.field_name)
+        field = field.parent
+    return '.'.join(reversed(names))
+
+def nested_serializers(serializer, prefix=''):
+    """(dotted path, serializer) for every embedded object, depth first"""
+    for name, field in serializer.fields.items():
+        if isinstance(field, serializers.BaseSerializer) and not isinstance(field, serializers.ListSerializer):
+            yield prefix + name, field
+            yield from nested_serializers(field, f'{prefix}{name}.')
+
+class Sideload:
+    """Distinct objects collected by a SideloadedField over one response"""
+
+    def __init__(self, serializer):
+        self.serializer = serializer
+        self.objects = {}
+
+class SideloadedField(serializers.PrimaryKeyRelatedField):
+    """
+    Renders a nested object as its id and collects the object into the
+    response's sideload, where the wrapped serializer renders it once
+    """
+
+    def __init__(self, serializer, key, **kwargs):
+        self.serializer = serializer
+        self.key = key
+        super().__init__(read_only=True, **kwargs)
+
+    def bind(self, field_name, parent):
+        super().bind(field_name, parent)
+        self.serializer.bind(self.source, self)
+        self.context.setdefault('sideloaded', {}).setdefault(self.key, Sideload(self.serializer))
+
+    def use_pk_only_optimization(self):
+        return False
+
+    def to_representation(self, value):
+        self.context['sideloaded'][self.key].objects[value.pk] = value
+        return value.pk
+
+def sideloaded_entities(context):
+    """Top-level maps, by id, of the objects normalized out of the rows"""
+    return {
+        key: {
+            str(pk): sideload.serializer.to_representation(obj)
+            for pk, obj in sideload.objects.items()
+        }
+        for key, sideload in context.get('sideloaded', {}).items()
+    }
+
+class SparseFieldsetMixin:
+    """
+    ModelSerializer mixin applying context['fieldset']: fields outside the
+    fieldset are removed, unexpanded nested serializers become ids and, when
+    normalizing, sideloadable ones become SideloadedFields
+    """
+
+    def get_fields(self):
+        fields = super().get_fields()
+        fieldset = self.context.get('fieldset')
+        if fieldset is None:
+            return fields
+
+        path = field_path(self)
+        prefix = f'{path}.' if path else ''
+        selected = {}
+        for name, field in fields.items():
+            if not fieldset.includes(path, name):
+                continue
+            if isinstance(field, serializers.BaseSerializer):
+                key = getattr(getattr(field, 'Meta', None), 'sideload_as', None)
+                if not fieldset.expands(prefix + name):
+                    field = serializers.PrimaryKeyRelatedField(source=field.source, read_only=True)
+                elif fieldset.normalize and key:
+                    field = SideloadedField(field, key, source=field.source or name)
+                    name = f'{name}_id'
+            selected[name] = field
+        return selected
+
+def readable_columns(serializer):
+    """
+    Model columns the serializer's fields read. Meta.field_sources names them
+    for fields that are not model fields; any other such field loads them all.
+    """
+    model = serializer.Meta.model
+    concrete = {field.name for field in model._meta.concrete_fields}
+    sources = getattr(serializer.Meta, 'field_sources', {})
+    columns = set()
+    for name, field in serializer.fields.items():
+        if name in sources:
+            columns.update(sources[name])
+        elif field.source in concrete:
+            columns.add(field.source)
+        else:
+            return concrete
+    return columns
+
+def load_fields(queryset, serializer, always=()):
+    """
+    Restrict queryset to what the bound serializer renders: only() the
+    columns its fields read, and join (or prefetch, for nested serializers
+    defining related_queryset()) just the objects it still embeds
+    """
+    columns = set(always)
+    queryset = _load_fields(queryset, serializer, '', columns)
+    return queryset.only(*columns)
+
+def _load_fields(queryset, serializer, prefix, columns):
+    for column in readable_columns(serializer):
+        # Columns of a related row (fitness_class__datetime) need its join
+        relations = column.split('__')[:-1]
+        for depth in range(1, len(relations) + 1):
+            relation = prefix + '__'.join(relations[:depth])
+            columns.add(relation)
+            queryset = queryset.select_related(relation)
+        columns.add(prefix + column)
+
+    for name, field in serializer.fields.items():
+        if isinstance(field, SideloadedField):
+            field = field.serializer
+        if not isinstance(field, serializers.BaseSerializer) or isinstance(field, serializers.ListSerializer):
+            continue
+        path = prefix + field.source.replace('.', '__')
+        related_queryset = getattr(field, 'related_queryset', None)
+        if related_queryset is not None:
+            queryset = queryset.prefetch_related(
+                models.Prefetch(path, queryset=load_fields(related_queryset(), field))
+            )
+        else:
+            queryset = _load_fields(queryset.select_related(path), field, f'{path}__', columns)
+    return queryset
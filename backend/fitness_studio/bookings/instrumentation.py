@@ -0,0 +1,68 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from django.db import connections
+from django.db.backends.signals import connection_created
+
+# Stats objects recording in the current context. A context variable rather
+# than per-connection wrappers so statements issued by async views, which
+# run on executor threads with their own connections, are still attributed
+# to the request that awaited them.
+_recording = ContextVar('recording_query_stats', default=())
+
+class QueryStats:
+    """Tally of SQL count, total DB time and the slowest statement"""
+
+    def __init__(self):
+        self.count = 0
+        self.total_time = 0.0
+        self.slowest_time = 0.0
+        self.slowest_sql = None
+
+    def add(self, sql, elapsed):
+        self.count += 1
+        self.total_time += elapsed
+        if elapsed >= self.slowest_time:
+            self.slowest_time = elapsed
+            self.slowest_sql = sql
+
+    def as_dict(self):
+        return {
+            'query_count': self.count,
+            'db_time_ms': round(self.total_time * 1000, 3),
+            'slowest_query_ms': round(self.slowest_time * 1000, 3),
+            'slowest_query': self.slowest_sql,
+        }
+
+def _record(execute, sql, params, many, context):
+    recording = _recording.get()
+    if not recording:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        elapsed = time.perf_counter() - start
+        for stats in recording:
+            stats.add(sql, elapsed)
+
+def instrument(connection, **kwargs):
+    """Install the recorder on a connection; a no-op while nothing records"""
+    if _record not in connection.execute_wrappers:
+        # First in line, so connection.execute_wrapper() blocks opened
+        # earlier still pop their own wrapper off the end
+        connection.execute_wrappers.insert(0, _record)
+
+connection_created.connect(instrument)
+
+@contextmanager
+def record_queries():
+    """Record every statement run for the current context on any configured database"""
+    stats = QueryStats()
+    for alias in connections:
+        instrument(connections[alias])
+    token = _recording.set(_recording.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _recording.reset(token)
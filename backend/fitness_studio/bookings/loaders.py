@@ -0,0 +1,43 @@
+from .models import FitnessClass, Booking
+
+class BookingLoader:
+    """
+    Request-scoped identity map for the booking path.
+    Each entity is fetched at most once per request and shared between
+    BookingCreateSerializer and the view that consumes it.
+    """
+
+    def __init__(self):
+        self._classes = {}
+        self._active_bookings = {}
+
+    @classmethod
+    def for_request(cls, request):
+        """Return the loader bound to this request, creating it on first use"""
+        # DRF wraps the Django request; pin the loader to the underlying one
+        http_request = getattr(request, '_request', request)
+        loader = getattr(http_request, 'booking_loader', None)
+        if loader is None:
+            loader = cls()
+            http_request.booking_loader = loader
+        return loader
+
+    def get_fitness_class(self, class_id):
+        """Fitness class with class_type and instructor joined, or None"""
+        key = str(class_id)
+        if key not in self._classes:
+            self._classes[key] = FitnessClass.objects.select_related(
+                'class_type', 'instructor'
+            ).filter(id=class_id).first()
+        return self._classes[key]
+
+    def has_active_booking(self, class_id, client_email):
+        """Whether the client already holds a confirmed or waitlisted booking"""
+        key = (str(class_id), client_email)
+        if key not in self._active_bookings:
+            self._active_bookings[key] = Booking.objects.filter(
+                fitness_class_id=class_id,
+                client__email=client_email,
+                status__in=['confirmed', 'waitlisted']
+            ).exists()
+        return self._active_bookings[key]
@@ -0,0 +1,226 @@
+import itertools
+import json
+from datetime import timedelta
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import models, transaction
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from bookings.benchmarks import (
+    benchmark_environment, git_revision, profile_calls, summarize, time_calls
+)
+from bookings.models import FitnessClass, Client, Booking
+from bookings.synthetic import generate_dataset
+
+BENCH_PASSWORD = 'Bench-Passw0rd!'
+
+# Query parameters accepted by the class listing; every combination is measured
+CLASS_LIST_FILTERS = ('type', 'instructor', 'date', 'difficulty', 'available_only')
+
+class Command(BaseCommand):
+    help = 'Measure latency, queries and allocations for every bookings endpoint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--seed-data', action='store_true',
+                            help='Bulk-load a synthetic dataset before measuring')
+        parser.add_argument('--classes', type=int, default=5000)
+        parser.add_argument('--clients', type=int, default=5000)
+        parser.add_argument('--bookings', type=int, default=50000)
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Timed requests per endpoint')
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--profile-iterations', type=int, default=5,
+                            help='Requests per endpoint used to count queries and allocations')
+        parser.add_argument('--only', action='append', default=[],
+                            help='Only run endpoints whose name starts with this prefix (repeatable)')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+        parser.add_argument('--compare', help='Print p50/p95 changes against an earlier JSON report')
+
+    def handle(self, *args, **options):
+        if options['seed_data']:
+            generate_dataset(
+                options['classes'], options['clients'], options['bookings'],
+                seed=options['seed'], log=self.stdout.write
+            )
+
+        calls_per_endpoint = options['warmup'] + options['iterations'] + options['profile_iterations']
+        report = {
+            'revision': git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'dataset': {
+                'classes': FitnessClass.objects.count(),
+                'clients': Client.objects.count(),
+                'bookings': Booking.objects.count(),
+            },
+            'iterations': options['iterations'],
+            'endpoints': {},
+        }
+
+        # Writes made by the booking and auth scenarios are rolled back so
+        # the seeded database is identical from one run to the next
+        with benchmark_environment() as client, transaction.atomic():
+            scenarios = self.build_scenarios(client, calls_per_endpoint)
+            for name, call in scenarios.items():
+                if options['only'] and not name.startswith(tuple(options['only'])):
+                    continue
+                statuses = []
+
+                def request():
+                    statuses.append(call().status_code)
+
+                samples = time_calls(request, options['iterations'], warmup=options['warmup'])
+                result = summarize(samples)
+                result.update(profile_calls(request, options['profile_iterations']))
+                result['status_codes'] = sorted(set(statuses))
+                report['endpoints'][name] = result
+                self.stdout.write(
+                    f"{name:<60} p50 {result['p50_ms']:>9.3f}  p95 {result['p95_ms']:>9.3f}  "
+                    f"p99 {result['p99_ms']:>9.3f} ms  {result['queries_per_request']:>6} q  "
+                    f"{result['alloc_peak_kb']:>9.1f} KiB  {result['status_codes']}"
+                )
+            transaction.set_rollback(True)
+
+        if options['compare']:
+            self.compare(report, options['compare'])
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def build_scenarios(self, client, calls):
+        """Map endpoint names to zero-argument callables issuing one request each"""
+        fitness_class = (FitnessClass.objects.filter(status='scheduled', datetime__gte=timezone.now())
+                         .select_related('class_type', 'instructor').order_by('datetime').first())
+        heavy_client = Client.objects.order_by('-total_bookings').first()
+        if fitness_class is None or heavy_client is None:
+            raise CommandError('No data to benchmark; run with --seed-data first')
+
+        users = self.create_users(calls)
+        member = users[0]
+        auth = {'HTTP_AUTHORIZATION': f'Token {Token.objects.get(user=member).key}'}
+
+        scenarios = {}
+        filter_values = {
+            'type': fitness_class.class_type.name,
+            'instructor': fitness_class.instructor.name,
+            'date': timezone.localtime(fitness_class.datetime).date().isoformat(),
+            'difficulty': fitness_class.class_type.difficulty_level,
+            'available_only': 'true',
+        }
+        for size in range(len(CLASS_LIST_FILTERS) + 1):
+            for combo in itertools.combinations(CLASS_LIST_FILTERS, size):
+                params = {name: filter_values[name] for name in combo}
+                name = 'class-list' + ('?' + '&'.join(combo) if combo else '')
+                scenarios[name] = self.get(client, reverse('class-list'), params)
+
+        scenarios['class-detail'] = self.get(client, reverse('class-detail', args=[fitness_class.id]))
+        availability = reverse('class-availability')
+        scenarios['class-availability'] = self.get(client, availability)
+        etag = client.get(availability)['ETag']
+        scenarios['class-availability?if-none-match'] = self.get(client, availability, HTTP_IF_NONE_MATCH=etag)
+        scenarios['get-bookings'] = self.get(client, reverse('get-bookings'), {'email': heavy_client.email})
+        scenarios['get-bookings?status'] = self.get(
+            client, reverse('get-bookings'), {'email': heavy_client.email, 'status': 'completed'}
+        )
+
+        # Each booking takes a fresh seat with a fresh email; the created
+        # bookings are then the ones cancelled by the next scenario
+        seats = iter(self.open_seats(calls))
+        booked = []
+
+        def book():
+            class_id, number = next(seats)
+            response = client.post(reverse('book-class'), {
+                'class_id': str(class_id),
+                'client_name': f'Bench Member {number}',
+                'client_email': f'bench-member-{number}@bench.example',
+            }, content_type='application/json', **auth)
+            if response.status_code == 201:
+                booked.append(response.json()['booking']['id'])
+            return response
+
+        def cancel():
+            booking_id = booked.pop(0)
+            return client.post(reverse('cancel-booking', args=[booking_id]), **auth)
+
+        scenarios['book-class'] = book
+        scenarios['cancel-booking'] = cancel
+
+        registrations = itertools.count()
+        logins = iter(users)
+        logouts = iter(users)
+
+        def register():
+            number = next(registrations)
+            return client.post(reverse('register'), {
+                'username': f'bench-new-{number}',
+                'email': f'bench-new-{number}@bench.example',
+                'password': BENCH_PASSWORD,
+                'first_name': 'Bench',
+                'last_name': f'New {number}',
+            }, content_type='application/json')
+
+        def login():
+            return client.post(reverse('login'), {
+                'username': next(logins).username, 'password': BENCH_PASSWORD,
+            }, content_type='application/json')
+
+        def logout():
+            # login() may have replaced the token, so look up the current one
+            token = Token.objects.get_or_create(user=next(logouts))[0]
+            return client.post(reverse('logout'), HTTP_AUTHORIZATION=f'Token {token.key}')
+
+        scenarios['auth-register'] = register
+        scenarios['auth-login'] = login
+        scenarios['auth-profile'] = self.get(client, reverse('user-profile'), **auth)
+        scenarios['auth-logout'] = logout
+        return scenarios
+
+    def get(self, client, url, params=None, **extra):
+        return lambda: client.get(url, params or {}, **extra)
+
+    def create_users(self, count):
+        """Benchmark accounts sharing one password hash, each with its own token"""
+        password = make_password(BENCH_PASSWORD)
+        start = User.objects.count()
+        users = User.objects.bulk_create([
+            User(username=f'bench-user-{start + i}', email=f'bench-user-{start + i}@bench.example',
+                 password=password)
+            for i in range(count)
+        ])
+        users = list(User.objects.filter(username__in=[user.username for user in users]).order_by('id'))
+        Token.objects.bulk_create([Token(key=Token.generate_key(), user=user) for user in users])
+        return users
+
+    def open_seats(self, count):
+        """(class id, sequence number) pairs for bookable seats on upcoming classes"""
+        classes = (FitnessClass.objects
+                   .filter(status='scheduled', datetime__gte=timezone.now() + timedelta(hours=5),
+                           current_bookings__lt=models.F('max_capacity'))
+                   .order_by('datetime', 'id')
+                   .values_list('id', 'max_capacity', 'current_bookings'))
+        seats = []
+        for class_id, capacity, taken in classes.iterator():
+            seats.extend((class_id, len(seats) + n) for n in range(capacity - taken))
+            if len(seats) >= count:
+                return seats[:count]
+        raise CommandError(f'Only {len(seats)} open seats on upcoming classes; {count} needed')
+
+    def compare(self, report, path):
+        with open(path) as handle:
+            baseline = json.load(handle)
+        self.stdout.write(f"\nCompared with {baseline.get('revision') or path}:")
+        for name, result in report['endpoints'].items():
+            before = baseline.get('endpoints', {}).get(name)
+            if not before:
+                continue
+            changes = []
+            for metric in ('p50_ms', 'p95_ms'):
+                delta = (result[metric] - before[metric]) / before[metric] * 100 if before[metric] else 0
+                changes.append(f'{metric[:3]} {delta:+6.1f}%')
+            queries = result['queries_per_request'] - before.get('queries_per_request', 0)
+            self.stdout.write(f"{name:<60} {'  '.join(changes)}  queries {queries:+.2f}")
@@ -0,0 +1,115 @@
+import json
+import random
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from django.utils import timezone
+from bookings.benchmarks import benchmark_environment, summarize, time_calls
+from bookings.models import FitnessClass, Client, Booking
+from bookings.synthetic import generate_dataset
+
+class Command(BaseCommand):
+    help = (
+        'Measure per-endpoint latency with and without the composite query indexes, '
+        'on a synthetic dataset in a throwaway test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=100000)
+        parser.add_argument('--clients', type=int, default=50000)
+        parser.add_argument('--bookings', type=int, default=1000000)
+        parser.add_argument('--iterations', type=int, default=50,
+                            help='Timed requests per endpoint, index state and round')
+        parser.add_argument('--rounds', type=int, default=2,
+                            help='Rounds of both index states; every round reverses the order')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if options['rounds'] < 1:
+            raise CommandError('--rounds must be positive')
+
+        # Indexes are dropped and data generated in a database of our own,
+        # never in the configured one; destroying it is the cleanup
+        old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+        try:
+            generate_dataset(
+                options['classes'], options['clients'], options['bookings'],
+                seed=options['seed'], log=self.stdout.write
+            )
+            report = self.run_rounds(options)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0)
+
+        for name in report['with_indexes']:
+            with_idx = report['with_indexes'][name]['p50_ms']
+            without_idx = report['without_indexes'][name]['p50_ms']
+            self.stdout.write(f'{name:<24} p50 {with_idx:>10.3f} ms indexed   {without_idx:>10.3f} ms unindexed')
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def run_rounds(self, options):
+        endpoints = self.build_endpoints(random.Random(options['seed']))
+        if not endpoints:
+            raise CommandError('The generated dataset has no upcoming classes or clients')
+
+        # Alternate which state goes first (indexed, unindexed, unindexed,
+        # indexed, ...) so warm-up and drift do not favour either
+        samples = {True: {name: [] for name in endpoints}, False: {name: [] for name in endpoints}}
+        indexed = True
+        for round_number in range(options['rounds']):
+            for wanted in ((True, False) if round_number % 2 == 0 else (False, True)):
+                if wanted != indexed:
+                    self.drop_indexes() if indexed else self.restore_indexes()
+                    indexed = wanted
+                for name, results in self.measure(endpoints, options['iterations']).items():
+                    samples[indexed][name].extend(results)
+
+        return {
+            'dataset': {
+                'classes': FitnessClass.objects.count(),
+                'clients': Client.objects.count(),
+                'bookings': Booking.objects.count(),
+            },
+            'rounds': options['rounds'],
+            'with_indexes': {name: summarize(values) for name, values in samples[True].items()},
+            'without_indexes': {name: summarize(values) for name, values in samples[False].items()},
+        }
+
+    def build_endpoints(self, rng):
+        upcoming = FitnessClass.objects.filter(status='scheduled', datetime__gte=timezone.now())
+        fitness_class = upcoming.order_by('datetime').first()
+        heavy_client = Client.objects.order_by('-total_bookings').first()
+        if fitness_class is None or heavy_client is None:
+            return {}
+
+        class_date = timezone.localtime(fitness_class.datetime).date().isoformat()
+        return {
+            'class-list': (reverse('class-list'), {}),
+            'class-list?date': (reverse('class-list'), {'date': class_date}),
+            'class-detail': (reverse('class-detail', args=[fitness_class.id]), {}),
+            'get-bookings': (reverse('get-bookings'), {'email': heavy_client.email}),
+        }
+
+    def measure(self, endpoints, iterations):
+        results = {}
+        with benchmark_environment() as client:
+            for name, (url, params) in endpoints.items():
+                results[name] = time_calls(lambda: client.get(url, params), iterations)
+        return results
+
+    def index_targets(self):
+        return [(model, index) for model in (FitnessClass, Booking) for index in model._meta.indexes]
+
+    def drop_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, index in self.index_targets():
+                editor.remove_index(model, index)
+
+    def restore_indexes(self):
+        with connection.schema_editor() as editor:
+            for model, index in self.index_targets():
+                editor.add_index(model, index)
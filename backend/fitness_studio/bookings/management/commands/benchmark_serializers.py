@@ -0,0 +1,67 @@
+import json
+from django.core.management.base import BaseCommand, CommandError
+from django.test import RequestFactory
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+from bookings.benchmarks import git_revision, summarize, time_calls
+from bookings.fast_serializers import fitness_class_renderer
+from bookings.models import FitnessClass
+from bookings.serializers import FitnessClassSerializer
+
+class Command(BaseCommand):
+    help = (
+        'Compare DRF and the compiled fast path rendering a class listing, '
+        'checking both produce byte-identical JSON'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--classes', type=int, default=500,
+                            help='Classes rendered per call')
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--warmup', type=int, default=2)
+        parser.add_argument('--timezone', default='America/New_York',
+                            help='Client timezone for the datetime_local field')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        classes = list(FitnessClass.objects.with_related().order_by('datetime')[:options['classes']])
+        if not classes:
+            raise CommandError('No classes to render; run seed_data first')
+
+        request = RequestFactory().get('/api/classes')
+        request.user_timezone = options['timezone']
+        renderers = {
+            'drf': lambda: FitnessClassSerializer(classes, many=True, context={'request': request}).data,
+            'compiled': lambda: fitness_class_renderer.render(classes, {'request': request}),
+        }
+
+        outputs = {name: JSONRenderer().render(render()) for name, render in renderers.items()}
+        if outputs['drf'] != outputs['compiled']:
+            raise CommandError('Compiled serializer output differs from DRF')
+
+        report = {
+            'revision': git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'classes': len(classes),
+            'response_bytes': len(outputs['drf']),
+            'serializers': {
+                name: summarize(time_calls(render, options['iterations'], options['warmup']))
+                for name, render in renderers.items()
+            },
+        }
+        drf, compiled = report['serializers']['drf'], report['serializers']['compiled']
+        report['speedup_p50'] = round(drf['p50_ms'] / compiled['p50_ms'], 2)
+
+        for name, result in report['serializers'].items():
+            self.stdout.write(
+                f"{name:<9} p50 {result['p50_ms']:>9.3f}  p95 {result['p95_ms']:>9.3f} ms"
+            )
+        self.stdout.write(
+            f"{len(classes)} classes, {report['response_bytes']} bytes, identical output, "
+            f"{report['speedup_p50']}x faster at p50"
+        )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
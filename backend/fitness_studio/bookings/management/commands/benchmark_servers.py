@@ -0,0 +1,174 @@
+import asyncio
+import io
+import json
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.urls import reverse
+from django.utils import timezone
+from bookings.benchmarks import benchmark_environment, git_revision, summarize
+from bookings.models import FitnessClass, Client
+from fitness_studio.asgi import AsyncReadsASGIHandler
+
+ENDPOINTS = ('class-list', 'class-detail', 'get-bookings')
+
+class Command(BaseCommand):
+    help = (
+        'Compare WSGI and ASGI throughput for the read endpoints with many '
+        'concurrent slow clients, driving both handlers in-process'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=ENDPOINTS, default=[],
+                            help='Endpoint to measure (repeatable; default all)')
+        parser.add_argument('--concurrency', type=int, default=200,
+                            help='Clients with a request in flight at any time')
+        parser.add_argument('--requests', type=int, default=2000,
+                            help='Requests per endpoint and server model')
+        parser.add_argument('--workers', type=int, default=8,
+                            help='WSGI worker threads (the pool a sync server would run)')
+        parser.add_argument('--client-delay-ms', type=float, default=500,
+                            help='Time each client takes to receive a response')
+        parser.add_argument('--output', help='Write the JSON report to this file')
+
+    def handle(self, *args, **options):
+        if options['concurrency'] < 1 or options['requests'] < options['concurrency']:
+            raise CommandError('--requests must be at least --concurrency, which must be positive')
+
+        report = {
+            'revision': git_revision(),
+            'created_at': timezone.now().isoformat(),
+            'settings': {name: options[name] for name in
+                         ('concurrency', 'requests', 'workers', 'client_delay_ms')},
+            'endpoints': {},
+        }
+        with benchmark_environment():
+            targets = self.targets()
+            wsgi, asgi = WSGIHandler(), AsyncReadsASGIHandler()
+            for name in options['endpoint'] or ENDPOINTS:
+                path, query = targets[name]
+                results = {
+                    'wsgi': self.run_wsgi(wsgi, path, query, options),
+                    'asgi': asyncio.run(self.run_asgi(asgi, path, query, options)),
+                }
+                report['endpoints'][name] = results
+                for server, result in results.items():
+                    self.stdout.write(
+                        f"{name:<14} {server}  {result['throughput_rps']:>9.1f} req/s  "
+                        f"p50 {result['p50_ms']:>9.3f}  p95 {result['p95_ms']:>9.3f} ms  "
+                        f"threads {result['peak_threads']:>4}  {result['status_codes']}"
+                    )
+
+        if options['output']:
+            with open(options['output'], 'w') as handle:
+                json.dump(report, handle, indent=2)
+            self.stdout.write(self.style.SUCCESS(f"Report written to {options['output']}"))
+
+    def targets(self):
+        fitness_class = FitnessClass.objects.filter(
+            status='scheduled', datetime__gte=timezone.now()
+        ).order_by('datetime').first()
+        heavy_client = Client.objects.order_by('-total_bookings').first()
+        if fitness_class is None or heavy_client is None:
+            raise CommandError('No data to benchmark; run seed_data first')
+        return {
+            'class-list': (reverse('class-list'), ''),
+            'class-detail': (reverse('class-detail', args=[fitness_class.id]), ''),
+            'get-bookings': (reverse('get-bookings'), f'email={heavy_client.email}'),
+        }
+
+    def run_wsgi(self, handler, path, query, options):
+        """
+        A threaded WSGI server: `workers` threads each serve one request at a
+        time, including the time spent writing the response to a slow client
+        """
+        delay = options['client_delay_ms'] / 1000
+        latencies, statuses, peak_threads = [], set(), [threading.active_count()]
+
+        def serve(submitted):
+            environ = {
+                'REQUEST_METHOD': 'GET', 'PATH_INFO': path, 'QUERY_STRING': query,
+                'SCRIPT_NAME': '', 'SERVER_NAME': 'testserver', 'SERVER_PORT': '80',
+                'HTTP_HOST': 'testserver', 'SERVER_PROTOCOL': 'HTTP/1.1',
+                'wsgi.input': io.BytesIO(), 'wsgi.errors': sys.stderr,
+                'wsgi.url_scheme': 'http', 'wsgi.multithread': True,
+                'wsgi.multiprocess': False, 'wsgi.run_once': False,
+            }
+            response = handler(environ, lambda status, headers: statuses.add(int(status[:3])))
+            try:
+                for _ in response:
+                    pass
+                time.sleep(delay)
+            finally:
+                response.close()
+            latencies.append(time.perf_counter() - submitted)
+            peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+        # Requests beyond `concurrency` wait for a client to free up, as
+        # with a fixed number of clients looping on the endpoint
+        clients = threading.Semaphore(options['concurrency'])
+
+        def client_request(submitted):
+            try:
+                serve(submitted)
+            finally:
+                clients.release()
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['workers']) as pool:
+            futures = []
+            for _ in range(options['requests']):
+                clients.acquire()
+                futures.append(pool.submit(client_request, time.perf_counter()))
+        for future in futures:
+            future.result()
+        return self.result(latencies, statuses, peak_threads[0], time.perf_counter() - start)
+
+    async def run_asgi(self, application, path, query, options):
+        """
+        An ASGI server: one event loop; a slow client only delays its own
+        send() while the loop serves everybody else
+        """
+        delay = options['client_delay_ms'] / 1000
+        latencies, statuses, peak_threads = [], set(), [threading.active_count()]
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1',
+            'method': 'GET', 'scheme': 'http', 'path': path, 'raw_path': path.encode(),
+            'query_string': query.encode(), 'root_path': '',
+            'headers': [(b'host', b'testserver')],
+            'client': ('127.0.0.1', 0), 'server': ('testserver', 80),
+        }
+
+        async def receive():
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+
+        async def send(message):
+            if message['type'] == 'http.response.start':
+                statuses.add(message['status'])
+            elif not message.get('more_body'):
+                await asyncio.sleep(delay)
+
+        requests = iter(range(options['requests']))
+
+        async def client():
+            for _ in requests:
+                submitted = time.perf_counter()
+                await application(dict(scope), receive, send)
+                latencies.append(time.perf_counter() - submitted)
+                peak_threads[0] = max(peak_threads[0], threading.active_count())
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['concurrency'])))
+        return self.result(latencies, statuses, peak_threads[0], time.perf_counter() - start)
+
+    def result(self, latencies, statuses, peak_threads, elapsed):
+        result = summarize(latencies)
+        result.update(
+            throughput_rps=round(len(latencies) / elapsed, 1),
+            peak_threads=peak_threads,
+            status_codes=sorted(statuses),
+        )
+        return result
@@ -0,0 +1,32 @@
+import time
+from django.core.management.base import BaseCommand
+from bookings.outbox import drain
+
+class Command(BaseCommand):
+    help = 'Deliver pending outbox messages (confirmation emails and other side effects)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=100)
+        parser.add_argument('--max-attempts', type=int, default=5,
+                            help='Attempts before a message is marked as failed')
+        parser.add_argument('--loop', action='store_true',
+                            help='Keep polling instead of exiting once the outbox is empty')
+        parser.add_argument('--interval', type=float, default=1.0,
+                            help='Seconds to sleep between polls when idle')
+
+    def handle(self, *args, **options):
+        total_sent = total_failed = 0
+        while True:
+            sent, failed = drain(options['batch_size'], options['max_attempts'])
+            total_sent += sent
+            total_failed += failed
+            if sent or failed:
+                self.stdout.write(f'Delivered {sent}, failed {failed}')
+                continue
+            if not options['loop']:
+                break
+            time.sleep(options['interval'])
+        
+        self.stdout.write(self.style.SUCCESS(
+            f'Outbox drained: {total_sent} delivered, {total_failed} failed'
+        ))
@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+from bookings.models import Client, ClientStats
+
+class Command(BaseCommand):
+    help = 'Rebuild the ClientStats materialization from the Booking table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000,
+                            help='Number of clients recomputed per transaction')
+
+    def handle(self, *args, **options):
+        chunk_size = options['chunk_size']
+        client_ids = Client.objects.order_by('id').values_list('id', flat=True)
+        
+        rebuilt = 0
+        last_id = None
+        while True:
+            # Walk clients by primary key so each chunk is an index range scan
+            chunk = client_ids.filter(id__gt=last_id) if last_id else client_ids
+            chunk = list(chunk[:chunk_size])
+            if not chunk:
+                break
+            
+            ClientStats.rebuild(chunk)
+            rebuilt += len(chunk)
+            last_id = chunk[-1]
+            self.stdout.write(f'Rebuilt stats for {rebuilt} clients')
+        
+        self.stdout.write(self.style.SUCCESS(f'Successfully rebuilt stats for {rebuilt} clients'))
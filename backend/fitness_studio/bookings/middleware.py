@@ -1,5 +1,12 @@
-import pytz
+import json
+import logging
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
 from django.utils.deprecation import MiddlewareMixin
+from .instrumentation import record_queries
+from .utils import resolve_timezone
+
+query_logger = logging.getLogger('booking.queries')
 
 class TimezoneMiddleware(MiddlewareMixin):
     """Middleware to handle timezone for each request"""
@@ -7,9 +14,58 @@ class TimezoneMiddleware(MiddlewareMixin):
     def process_request(self, request):
         timezone_header = request.META.get('HTTP_X_TIMEZONE', 'Asia/Kolkata')
         
-        # Validate timezone
-        try:
-            pytz.timezone(timezone_header)
+        # Validate timezone (resolved once per distinct header value)
+        if resolve_timezone(timezone_header) is not None:
             request.user_timezone = timezone_header
-        except pytz.exceptions.UnknownTimeZoneError:
-            request.user_timezone = 'Asia/Kolkata' 
\ No newline at end of file
+        else:
+            request.user_timezone = 'Asia/Kolkata' 
+
+class QueryInstrumentationMiddleware:
+    """
+    Record SQL count, total DB time and the slowest statement per request,
+    keyed by URL name. Emitted as response headers when DEBUG is on and as a
+    structured log line otherwise; always attached to response.query_stats
+    so tests can assert query budgets.
+    """
+    
+    sync_capable = True
+    async_capable = True
+    
+    def __init__(self, get_response):
+        self.get_response = get_response
+        # Under ASGI stay async end to end, so async views never wait on a
+        # thread held by this middleware
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+    
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with record_queries() as stats:
+            response = self.get_response(request)
+        return self.report(request, response, stats)
+    
+    async def __acall__(self, request):
+        with record_queries() as stats:
+            response = await self.get_response(request)
+        return self.report(request, response, stats)
+    
+    def report(self, request, response, stats):
+        match = getattr(request, 'resolver_match', None)
+        url_name = match.url_name if match else None
+        response.query_stats = dict(stats.as_dict(), url_name=url_name)
+        
+        if settings.DEBUG:
+            response['X-DB-Query-Count'] = str(stats.count)
+            response['X-DB-Time-Ms'] = f"{stats.total_time * 1000:.3f}"
+            response['X-DB-Slowest-Query-Ms'] = f"{stats.slowest_time * 1000:.3f}"
+        else:
+            query_logger.info(json.dumps({
+                'event': 'request_queries',
+                'url_name': url_name,
+                'method': request.method,
+                'status': response.status_code,
+                **stats.as_dict(),
+            }))
+        
+        return response
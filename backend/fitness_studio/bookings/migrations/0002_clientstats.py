@@ -0,0 +1,65 @@
+# Generated by Django 4.2.22 on 2026-10-18 14:08
+
+from django.db import migrations, models
+from django.db.models.functions import Coalesce
+import django.db.models.deletion
+
+
+# Booking status -> counter, as in ClientStats.STATUS_COUNTERS
+STATUS_COUNTERS = {
+    'confirmed': 'confirmed_bookings',
+    'waitlisted': 'waitlisted_bookings',
+    'cancelled': 'cancelled_bookings',
+    'completed': 'completed_bookings',
+    'no_show': 'no_show_bookings',
+}
+
+
+def backfill_client_stats(apps, schema_editor):
+    """Count every existing client's bookings, so deltas start from the truth"""
+    Client = apps.get_model('bookings', 'Client')
+    Booking = apps.get_model('bookings', 'Booking')
+    ClientStats = apps.get_model('bookings', 'ClientStats')
+    rows = Booking.objects.values('client_id').annotate(
+        total_bookings=models.Count('id'),
+        feedback_count=models.Count('feedback_rating'),
+        feedback_rating_sum=Coalesce(models.Sum('feedback_rating'), 0),
+        **{
+            field: models.Count('id', filter=models.Q(status=status))
+            for status, field in STATUS_COUNTERS.items()
+        }
+    )
+    stats_by_client = {row.pop('client_id'): row for row in rows}
+    ClientStats.objects.bulk_create([
+        ClientStats(client_id=client_id, **stats_by_client.get(client_id, {}))
+        for client_id in Client.objects.values_list('id', flat=True).iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClientStats',
+            fields=[
+                ('client', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to='bookings.client')),
+                ('total_bookings', models.PositiveIntegerField(default=0)),
+                ('confirmed_bookings', models.PositiveIntegerField(default=0)),
+                ('waitlisted_bookings', models.PositiveIntegerField(default=0)),
+                ('cancelled_bookings', models.PositiveIntegerField(default=0)),
+                ('completed_bookings', models.PositiveIntegerField(default=0)),
+                ('no_show_bookings', models.PositiveIntegerField(default=0)),
+                ('feedback_count', models.PositiveIntegerField(default=0)),
+                ('feedback_rating_sum', models.PositiveIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name_plural': 'client stats',
+            },
+        ),
+        migrations.RunPython(backfill_client_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.22 on 2026-10-18 14:10
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0002_clientstats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['client', '-booking_datetime'], name='booking_client_recent_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['fitness_class', 'status'], name='booking_class_status_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['fitness_class', 'client', 'status'], name='booking_class_client_st_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='fitnessclass',
+            index=models.Index(fields=['status', 'datetime'], name='class_status_datetime_idx'),
+        ),
+    ]
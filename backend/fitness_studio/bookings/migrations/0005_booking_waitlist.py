@@ -0,0 +1,31 @@
+# Generated by Django 4.2.22 on 2026-10-18 14:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('bookings', '0004_outboxmessage'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='booking',
+            name='booking_class_status_idx',
+        ),
+        migrations.AddField(
+            model_name='booking',
+            name='waitlist_position',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='fitnessclass',
+            name='waitlist_sequence',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='booking',
+            index=models.Index(fields=['fitness_class', 'status', 'waitlist_position'], name='booking_class_waitlist_idx'),
+        ),
+    ]
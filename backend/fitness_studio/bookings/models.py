@@ -1,8 +1,83 @@
-from django.db import models
+from django.db import models, transaction, IntegrityError
+from django.db.models.functions import Coalesce
 from django.core.validators import MinValueValidator, MaxValueValidator, EmailValidator
 from django.utils import timezone
 from datetime import timedelta
 import uuid
+from .cache import invalidate_class_listings, invalidate_client_stats
+from .streaming import announce_availability
+
+class InstructorQuerySet(models.QuerySet):
+    def with_class_counts(self):
+        """Annotate total_classes (completed sessions) as used by InstructorSerializer"""
+        return self.annotate(
+            total_classes=models.Count('classes', filter=models.Q(classes__status='completed'))
+        )
+
+    def with_detail_stats(self):
+        """Annotate the aggregates read by InstructorDetailSerializer"""
+        return self.annotate(
+            upcoming_classes=models.Count(
+                'classes',
+                filter=models.Q(classes__datetime__gte=timezone.now(), classes__status='scheduled'),
+                distinct=True
+            ),
+            total_completed_classes=models.Count(
+                'classes', filter=models.Q(classes__status='completed'), distinct=True
+            ),
+            average_rating=models.Avg(
+                'classes__bookings__feedback_rating',
+                filter=models.Q(classes__bookings__status='completed')
+            ),
+        )
+
+class ClassTypeQuerySet(models.QuerySet):
+    def with_detail_stats(self):
+        """Annotate the aggregates read by ClassTypeDetailSerializer"""
+        return self.annotate(
+            upcoming_classes_count=models.Count(
+                'classes',
+                filter=models.Q(classes__datetime__gte=timezone.now(), classes__status='scheduled'),
+                distinct=True
+            ),
+            total_bookings=models.Count(
+                'classes__bookings',
+                filter=models.Q(classes__bookings__status__in=['confirmed', 'completed']),
+                distinct=True
+            ),
+        )
+
+class FitnessClassQuerySet(models.QuerySet):
+    def with_related(self):
+        """
+        Load class_type by join and instructors through one annotated prefetch,
+        so FitnessClassSerializer renders without per-row queries
+        """
+        return self.select_related('class_type').prefetch_related(
+            models.Prefetch('instructor', queryset=Instructor.objects.with_class_counts())
+        )
+
+    def with_availability(self):
+        """
+        Annotate seats_left and bookable, the SQL forms of available_slots and
+        is_bookable, so availability can be read without building instances
+        """
+        seats_left = models.F('max_capacity') - models.F('current_bookings')
+        return self.annotate(
+            seats_left=models.Case(
+                models.When(current_bookings__lt=models.F('max_capacity'), then=seats_left),
+                default=models.Value(0),
+                output_field=models.IntegerField()
+            ),
+            bookable=models.ExpressionWrapper(
+                models.Q(
+                    status='scheduled',
+                    datetime__gt=FitnessClass.booking_cutoff(),
+                    current_bookings__lt=models.F('max_capacity')
+                ),
+                output_field=models.BooleanField()
+            )
+        )
 
 class Instructor(models.Model):
     """Model for fitness instructors"""
@@ -17,6 +92,8 @@ class Instructor(models.Model):
     is_active = models.BooleanField(default=True)
     created_at = models.DateTimeField(auto_now_add=True)
     
+    objects = InstructorQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} ({', '.join(self.specializations)})"
     
@@ -40,6 +117,8 @@ class ClassType(models.Model):
     equipment_needed = models.JSONField(default=list)
     is_active = models.BooleanField(default=True)
     
+    objects = ClassTypeQuerySet.as_manager()
+    
     def __str__(self):
         return f"{self.name} ({self.difficulty_level})"
     
@@ -61,6 +140,8 @@ class FitnessClass(models.Model):
     datetime = models.DateTimeField()
     max_capacity = models.PositiveIntegerField(validators=[MinValueValidator(1), MaxValueValidator(50)])
     current_bookings = models.PositiveIntegerField(default=0)
+    # Last waitlist position handed out; positions are never reused
+    waitlist_sequence = models.PositiveIntegerField(default=0, editable=False)
     price = models.DecimalField(max_digits=8, decimal_places=2, default=0.00)
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='scheduled')
     location = models.CharField(max_length=100, default="Studio 1")
@@ -68,30 +149,104 @@ class FitnessClass(models.Model):
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
+    objects = FitnessClassQuerySet.as_manager()
+    
     @property
     def available_slots(self):
         return max(0, self.max_capacity - self.current_bookings)
     
+    @staticmethod
+    def booking_cutoff():
+        """Classes starting before this moment can no longer be booked"""
+        return timezone.now() + timedelta(hours=2)
+    
+    @property
+    def is_open_for_booking(self):
+        """Scheduled and far enough ahead to book or join the waitlist"""
+        return self.status == 'scheduled' and self.datetime > self.booking_cutoff()
+    
     @property
     def is_bookable(self):
-        now = timezone.now()
-        min_booking_time = now + timedelta(hours=2)
-        return (
-            self.status == 'scheduled' and
-            self.datetime > min_booking_time and
-            self.available_slots > 0
-        )
+        return self.is_open_for_booking and self.available_slots > 0
     
     @property
     def is_past(self):
         return self.datetime < timezone.now()
-    
+
+    def reserve_seat(self):
+        """Atomically claim one seat; returns False when the class is full or no longer scheduled"""
+        claimed = FitnessClass.objects.filter(
+            pk=self.pk,
+            status='scheduled',
+            current_bookings__lt=models.F('max_capacity')
+        ).update(
+            current_bookings=models.F('current_bookings') + 1,
+            updated_at=timezone.now()
+        )
+        if claimed:
+            self.current_bookings += 1
+            invalidate_class_listings(self.datetime, class_type_ids=[self.class_type_id])
+            announce_availability(self.pk)
+        return bool(claimed)
+
+    def release_seat(self):
+        """Atomically give one seat back without letting the counter go negative"""
+        released = FitnessClass.objects.filter(
+            pk=self.pk,
+            current_bookings__gt=0
+        ).update(
+            current_bookings=models.F('current_bookings') - 1,
+            updated_at=timezone.now()
+        )
+        if released:
+            self.current_bookings = max(0, self.current_bookings - 1)
+            invalidate_class_listings(self.datetime, class_type_ids=[self.class_type_id])
+            announce_availability(self.pk)
+        return bool(released)
+
+    def next_waitlist_position(self):
+        """Hand out the next place at the tail of this class's waitlist"""
+        with transaction.atomic(savepoint=False):
+            # The UPDATE locks the row, so the value read back is ours alone
+            FitnessClass.objects.filter(pk=self.pk).update(
+                waitlist_sequence=models.F('waitlist_sequence') + 1
+            )
+            self.waitlist_sequence = FitnessClass.objects.filter(pk=self.pk).values_list(
+                'waitlist_sequence', flat=True
+            ).get()
+        return self.waitlist_sequence
+
+    def waitlist_head(self):
+        """Longest-waiting booking, read from the front of the waitlist index"""
+        return self.bookings.filter(status='waitlisted').order_by('waitlist_position').first()
+
+    def promote_from_waitlist(self):
+        """
+        Give a free seat to the head of the waitlist. Returns the promoted
+        booking, or None when nobody is waiting or no seat is free.
+        """
+        if self.status != 'scheduled' or self.is_past:
+            return None
+        with transaction.atomic(savepoint=False):
+            while True:
+                head = self.waitlist_head()
+                if head is None or not self.reserve_seat():
+                    return None
+                if head.transition_to('confirmed'):
+                    return head
+                # The head left the queue concurrently; hand the seat back and retry
+                self.release_seat()
+
     def __str__(self):
         return f"{self.class_type.name} - {self.datetime.strftime('%Y-%m-%d %H:%M')} with {self.instructor.name}"
     
     class Meta:
         ordering = ['datetime']
         unique_together = ['instructor', 'datetime']
+        indexes = [
+            # Upcoming scheduled classes (class listing, availability)
+            models.Index(fields=['status', 'datetime'], name='class_status_datetime_idx'),
+        ]
 
 class Client(models.Model):
     """Model for clients/users"""
@@ -136,21 +291,242 @@ class Booking(models.Model):
     feedback_rating = models.PositiveIntegerField(null=True, blank=True,
                                                 validators=[MinValueValidator(1), MaxValueValidator(5)])
     feedback_comment = models.TextField(blank=True)
+    # Order on the class waitlist; only meaningful while status is waitlisted
+    waitlist_position = models.PositiveIntegerField(null=True, blank=True)
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember what was loaded so save() can tell which transition happened
+        instance._loaded_values = {
+            name: value for name, value in zip(field_names, values)
+            if name in ('status', 'feedback_rating')
+        }
+        return instance
+    
+    @staticmethod
+    def generate_reference():
+        return f"FB{timezone.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:6].upper()}"
     
     def save(self, *args, **kwargs):
         if not self.booking_reference:
-            self.booking_reference = f"FB{timezone.now().strftime('%Y%m%d')}{str(uuid.uuid4())[:6].upper()}"
-        super().save(*args, **kwargs)
+            self.booking_reference = self.generate_reference()
+        
+        adding = self._state.adding
+        loaded = getattr(self, '_loaded_values', {})
+        with transaction.atomic(savepoint=False):
+            super().save(*args, **kwargs)
+            
+            # Keep the client's materialized counters in the same transaction
+            if adding:
+                ClientStats.record_transition(self.client_id, None, self.status)
+            elif 'status' in loaded and loaded['status'] != self.status:
+                ClientStats.record_transition(self.client_id, loaded['status'], self.status)
+            
+            if 'feedback_rating' in loaded and loaded['feedback_rating'] != self.feedback_rating:
+                ClientStats.record_feedback(self.client_id, self.feedback_rating, loaded['feedback_rating'])
+        
+        self._loaded_values = {'status': self.status, 'feedback_rating': self.feedback_rating}
+    
+    def transition_to(self, new_status):
+        """
+        Move the booking to new_status only if nobody else changed it first.
+        Returns False when the row was no longer in the status we loaded.
+        """
+        with transaction.atomic(savepoint=False):
+            changed = Booking.objects.filter(pk=self.pk, status=self.status).update(status=new_status)
+            if changed:
+                ClientStats.record_transition(self.client_id, self.status, new_status)
+        
+        if changed:
+            self.status = new_status
+            self._loaded_values = {'status': new_status, 'feedback_rating': self.feedback_rating}
+            invalidate_client_stats(self.client_id)
+        return bool(changed)
     
     @property
     def can_cancel(self):
         now = timezone.now()
         cancellation_deadline = self.fitness_class.datetime - timedelta(hours=4)
-        return now < cancellation_deadline and self.status == 'confirmed'
+        return now < cancellation_deadline and self.status in ('confirmed', 'waitlisted')
+    
+    def waitlist_rank(self):
+        """1-based place in the queue among bookings still waiting, or None"""
+        if self.status != 'waitlisted':
+            return None
+        return Booking.objects.filter(
+            fitness_class_id=self.fitness_class_id,
+            status='waitlisted',
+            waitlist_position__lt=self.waitlist_position
+        ).count() + 1
     
     def __str__(self):
         return f"{self.client.name} - {self.fitness_class} ({self.status})"
     
     class Meta:
         ordering = ['-booking_datetime']
-        unique_together = ['fitness_class', 'client']
\ No newline at end of file
+        unique_together = ['fitness_class', 'client']
+        indexes = [
+            # A client's booking history, newest first
+            models.Index(fields=['client', '-booking_datetime'], name='booking_client_recent_idx'),
+            # Confirmed / waitlisted counts per class, and the waitlist in queue order
+            models.Index(fields=['fitness_class', 'status', 'waitlist_position'],
+                         name='booking_class_waitlist_idx'),
+            # Duplicate-booking check
+            models.Index(fields=['fitness_class', 'client', 'status'], name='booking_class_client_st_idx'),
+        ]
+
+class ClientStats(models.Model):
+    """
+    Per-client booking counters, maintained in the same transaction as every
+    booking state transition so reads are a single primary-key lookup
+    """
+    STATUS_COUNTERS = {
+        'confirmed': 'confirmed_bookings',
+        'waitlisted': 'waitlisted_bookings',
+        'cancelled': 'cancelled_bookings',
+        'completed': 'completed_bookings',
+        'no_show': 'no_show_bookings',
+    }
+    
+    client = models.OneToOneField(Client, on_delete=models.CASCADE, primary_key=True, related_name='stats')
+    total_bookings = models.PositiveIntegerField(default=0)
+    confirmed_bookings = models.PositiveIntegerField(default=0)
+    waitlisted_bookings = models.PositiveIntegerField(default=0)
+    cancelled_bookings = models.PositiveIntegerField(default=0)
+    completed_bookings = models.PositiveIntegerField(default=0)
+    no_show_bookings = models.PositiveIntegerField(default=0)
+    feedback_count = models.PositiveIntegerField(default=0)
+    feedback_rating_sum = models.PositiveIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    @property
+    def average_rating_given(self):
+        if not self.feedback_count:
+            return None
+        return round(self.feedback_rating_sum / self.feedback_count, 2)
+    
+    @classmethod
+    def apply_deltas(cls, client_id, deltas):
+        """
+        Add deltas to a client's counters. Call after the bookings changed:
+        a client without a row gets one counted from the Booking table,
+        which already includes the change.
+        """
+        deltas = {field: delta for field, delta in deltas.items() if delta}
+        if not deltas:
+            return
+        
+        updates = {field: models.F(field) + delta for field, delta in deltas.items()}
+        if cls.objects.filter(client_id=client_id).update(updated_at=timezone.now(), **updates):
+            return
+        
+        if cls.create_missing([client_id]):
+            # Another transaction created the row first, without our change
+            cls.objects.filter(client_id=client_id).update(updated_at=timezone.now(), **updates)
+    
+    @classmethod
+    def record_transition(cls, client_id, from_status, to_status, count=1):
+        """Account for count bookings moving from from_status (None when created) to to_status"""
+        deltas = {}
+        if from_status is None:
+            deltas['total_bookings'] = count
+        else:
+            deltas[cls.STATUS_COUNTERS[from_status]] = -count
+        field = cls.STATUS_COUNTERS[to_status]
+        deltas[field] = deltas.get(field, 0) + count
+        cls.apply_deltas(client_id, deltas)
+    
+    @classmethod
+    def record_feedback(cls, client_id, rating, previous_rating=None):
+        """Account for a feedback rating being added, changed or removed"""
+        cls.apply_deltas(client_id, {
+            'feedback_count': (rating is not None) - (previous_rating is not None),
+            'feedback_rating_sum': (rating or 0) - (previous_rating or 0),
+        })
+    
+    @classmethod
+    def counts_from_bookings(cls, client_ids):
+        """Counter values per client computed from the Booking table"""
+        aggregates = {
+            field: models.Count('id', filter=models.Q(status=status))
+            for status, field in cls.STATUS_COUNTERS.items()
+        }
+        rows = Booking.objects.filter(client_id__in=client_ids).values('client_id').annotate(
+            total_bookings=models.Count('id'),
+            feedback_count=models.Count('feedback_rating'),
+            feedback_rating_sum=Coalesce(models.Sum('feedback_rating'), 0),
+            **aggregates
+        )
+        return {row.pop('client_id'): row for row in rows}
+    
+    @classmethod
+    def create_missing(cls, client_ids):
+        """
+        Create rows, counted from the Booking table, for clients that have
+        none. Returns the clients whose row another transaction created
+        first; changes the caller has not counted yet still apply to those.
+        """
+        stats_by_client = cls.counts_from_bookings(client_ids)
+        conflicted = []
+        for client_id in client_ids:
+            try:
+                with transaction.atomic():
+                    cls.objects.create(client_id=client_id, **stats_by_client.get(client_id, {}))
+            except IntegrityError:
+                conflicted.append(client_id)
+        return conflicted
+    
+    @classmethod
+    def rebuild(cls, client_ids):
+        """Recompute the rows for these clients from the Booking table"""
+        with transaction.atomic():
+            # Counted inside the transaction, so no booking change slips in
+            # between the count and the write
+            stats_by_client = cls.counts_from_bookings(client_ids)
+            cls.objects.filter(client_id__in=client_ids).delete()
+            # A concurrent rebuild (two first reads of the same client) may
+            # insert a row after our delete; it was computed the same way
+            cls.objects.bulk_create([
+                cls(client_id=client_id, **stats_by_client.get(client_id, {}))
+                for client_id in client_ids
+            ], ignore_conflicts=True)
+        rows = cls.objects.in_bulk(client_ids)
+        return [rows[client_id] for client_id in client_ids]
+    
+    def __str__(self):
+        return f"Stats for {self.client_id}"
+    
+    class Meta:
+        verbose_name_plural = 'client stats'
+
+class OutboxMessage(models.Model):
+    """
+    Side effect (e.g. a confirmation email) recorded in the same transaction
+    as the change that caused it and delivered later by the drain_outbox worker
+    """
+    STATUS_CHOICES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('sent', 'Sent'),
+        ('failed', 'Failed'),
+    ]
+    
+    topic = models.CharField(max_length=50)
+    payload = models.JSONField(default=dict)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='pending')
+    attempts = models.PositiveIntegerField(default=0)
+    available_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+    
+    def __str__(self):
+        return f"{self.topic} #{self.pk} ({self.status})"
+    
+    class Meta:
+        ordering = ['available_at']
+        indexes = [
+            # Worker polling for due messages
+            models.Index(fields=['status', 'available_at'], name='outbox_status_available_idx'),
+        ]
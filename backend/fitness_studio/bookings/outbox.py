@@ -0,0 +1,137 @@
+import logging
+import random
+from datetime import timedelta
+from django.db.models import Q
+from django.utils import timezone
+from .models import OutboxMessage, Booking
+from .utils import send_booking_confirmation, send_class_cancellation
+
+logger = logging.getLogger('booking')
+
+HANDLERS = {}
+
+# Seconds a claimed message stays invisible to other workers
+LEASE_SECONDS = 60
+
+def handler(topic):
+    """Register the function that delivers messages for a topic"""
+    def register(func):
+        HANDLERS[topic] = func
+        return func
+    return register
+
+def enqueue(topic, payload):
+    """Record a side effect inside the caller's transaction"""
+    return OutboxMessage.objects.create(topic=topic, payload=payload)
+
+def enqueue_many(topic, payloads):
+    """Record many side effects with a single INSERT batch"""
+    return OutboxMessage.objects.bulk_create(
+        [OutboxMessage(topic=topic, payload=payload) for payload in payloads]
+    )
+
+def backoff_delay(attempts, base_seconds=5, max_seconds=3600):
+    """Exponential backoff with jitter for the given number of failed attempts"""
+    delay = min(max_seconds, base_seconds * 2 ** (attempts - 1))
+    return delay * random.uniform(0.5, 1.0)
+
+def claim_batch(batch_size):
+    """
+    Claim up to batch_size due messages. Each claim is a conditional UPDATE,
+    so concurrent workers never deliver the same message twice; a claim is a
+    lease, and messages from crashed workers become due again when it expires.
+    """
+    now = timezone.now()
+    due_ids = list(
+        OutboxMessage.objects.filter(
+            Q(status='pending') | Q(status='processing'),
+            available_at__lte=now
+        ).order_by('available_at').values_list('id', flat=True)[:batch_size]
+    )
+    
+    claimed = []
+    for message_id in due_ids:
+        if OutboxMessage.objects.filter(
+            id=message_id,
+            status__in=['pending', 'processing'],
+            available_at__lte=now
+        ).update(status='processing', available_at=now + timedelta(seconds=LEASE_SECONDS)):
+            claimed.append(message_id)
+    return list(OutboxMessage.objects.filter(id__in=claimed).order_by('id'))
+
+def finish(message, **fields):
+    """
+    Record a claimed message's outcome, but only while this worker still holds
+    its lease. The lease expiry written by claim_batch doubles as the lease
+    token: a worker that took the message over after the lease ran out wrote a
+    later one, so a late update from the first worker matches nothing.
+    """
+    if OutboxMessage.objects.filter(
+        id=message.id,
+        status='processing',
+        available_at=message.available_at
+    ).update(**fields):
+        return True
+    logger.warning(f"Outbox message {message.id} lease expired before its outcome was recorded")
+    return False
+
+def deliver(message, max_attempts):
+    """Run one message's handler and record the outcome"""
+    try:
+        func = HANDLERS.get(message.topic)
+        if func is None:
+            raise LookupError(f"No outbox handler for topic '{message.topic}'")
+        func(message.payload)
+    except Exception as e:
+        attempts = message.attempts + 1
+        if attempts >= max_attempts:
+            if finish(message, status='failed', attempts=attempts, last_error=str(e)):
+                logger.error(f"Outbox message {message.id} failed permanently: {e}")
+        else:
+            if finish(
+                message,
+                status='pending',
+                attempts=attempts,
+                last_error=str(e),
+                available_at=timezone.now() + timedelta(seconds=backoff_delay(attempts))
+            ):
+                logger.warning(f"Outbox message {message.id} failed (attempt {attempts}): {e}")
+        return False
+    
+    finish(message, status='sent', attempts=message.attempts + 1, sent_at=timezone.now(), last_error='')
+    return True
+
+def drain(batch_size=100, max_attempts=5):
+    """Deliver one batch of due messages; returns (sent, failed)"""
+    sent = failed = 0
+    for message in claim_batch(batch_size):
+        if deliver(message, max_attempts):
+            sent += 1
+        else:
+            failed += 1
+    return sent, failed
+
+@handler('booking_confirmation')
+def deliver_booking_confirmation(payload):
+    booking = Booking.objects.select_related(
+        'client', 'fitness_class__class_type', 'fitness_class__instructor'
+    ).get(id=payload['booking_id'])
+    if booking.status != 'confirmed':
+        # Cancelled (or otherwise moved on) before the worker got here;
+        # the message is done with nothing to send
+        logger.info(f"Confirmation for {booking.booking_reference} skipped: booking is {booking.status}")
+        return
+    if not send_booking_confirmation(booking):
+        raise RuntimeError(f"Confirmation for {booking.booking_reference} was not sent")
+
+@handler('class_cancelled')
+def deliver_class_cancellation(payload):
+    bookings = Booking.objects.select_related(
+        'client', 'fitness_class__class_type'
+    ).filter(id__in=payload['booking_ids'])
+    unsent = [
+        booking.booking_reference for booking in bookings
+        if not send_class_cancellation(booking, payload.get('reason', ''))
+    ]
+    if unsent:
+        raise RuntimeError(f"Cancellation notices not sent for {', '.join(unsent)}")
@@ -0,0 +1,20 @@
+from django.conf import settings
+from rest_framework.pagination import CursorPagination
+
+def ordering_columns(pagination_class):
+    """Columns a cursor paginator reads from its page to build the links"""
+    return [name.lstrip('-') for name in pagination_class.ordering]
+
+class ClassCursorPagination(CursorPagination):
+    """Keyset pagination over (datetime, id) for class listings"""
+    ordering = ('datetime', 'id')
+    page_size = settings.BOOKING_SETTINGS.get('CLASS_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+
+class BookingCursorPagination(CursorPagination):
+    """Keyset pagination over (booking_datetime, id), newest first, for booking history"""
+    ordering = ('-booking_datetime', '-id')
+    page_size = settings.BOOKING_SETTINGS.get('BOOKING_PAGE_SIZE', 50)
+    page_size_query_param = 'page_size'
+    max_page_size = 200
@@ -1,10 +1,13 @@
 from rest_framework import serializers
 from django.utils import timezone
 from django.conf import settings
+from django.db import models
 from datetime import timedelta
-import pytz
 from .models import FitnessClass, Booking, Client, Instructor, ClassType
-from django.db.models import Avg
+from .loaders import BookingLoader
+from .utils import resolve_timezone, local_time_payload, local_time_payloads
+from .batch import MAX_BATCH_BOOKINGS, MODES, ALL_OR_NOTHING
+from .fieldsets import Fieldset, SparseFieldsetMixin, nested_serializers, split_param
 
 class InstructorSerializer(serializers.ModelSerializer):
     total_classes = serializers.SerializerMethodField()
@@ -13,18 +16,55 @@ class InstructorSerializer(serializers.ModelSerializer):
         model = Instructor
         fields = ['id', 'name', 'email', 'specializations', 'bio', 'experience_years', 
                  'rating', 'total_classes', 'is_active']
+        field_sources = {'total_classes': []}
+        sideload_as = 'instructors'
+    
+    def related_queryset(self):
+        """Embedded instructors are prefetched with their class counts annotated"""
+        return Instructor.objects.with_class_counts()
     
     def get_total_classes(self, obj):
-        """Get total number of completed classes for this instructor"""
-        return obj.classes.filter(status='completed').count()
+        """Completed classes, annotated by Instructor.objects.with_class_counts()"""
+        return getattr(obj, 'total_classes', None)
 
 class ClassTypeSerializer(serializers.ModelSerializer):
     class Meta:
         model = ClassType
         fields = ['id', 'name', 'description', 'duration_minutes', 'difficulty_level', 
                  'calories_burn_estimate', 'equipment_needed', 'is_active']
+        sideload_as = 'class_types'
+
+def local_time_context(context):
+    """
+    Per-response memo of rendered local times (shared by nested serializers
+    through the root context) and the requester's timezone
+    """
+    request = context.get('request')
+    tz = None
+    if request is not None and hasattr(request, 'user_timezone'):
+        tz = resolve_timezone(request.user_timezone)
+    return context.setdefault('local_times', {}), tz
 
-class FitnessClassSerializer(serializers.ModelSerializer):
+def prepare_local_times(context, datetimes):
+    """Render every start time not yet in the context's memo, each distinct one once"""
+    local_times, tz = local_time_context(context)
+    pending = set(datetimes) - local_times.keys()
+    local_times.update(local_time_payloads(pending, tz))
+
+class LocalTimeListSerializer(serializers.ListSerializer):
+    """
+    Renders the local start time of every row in one pass, converting each
+    distinct start time once, before the rows are serialized. The child
+    names the start times to render through local_datetimes(rows).
+    """
+    
+    def to_representation(self, data):
+        rows = data.all() if isinstance(data, models.Manager) else data
+        rows = list(rows)
+        prepare_local_times(self.context, self.child.local_datetimes(rows))
+        return super().to_representation(rows)
+
+class FitnessClassSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     instructor = InstructorSerializer(read_only=True)
     class_type = ClassTypeSerializer(read_only=True)
     available_slots = serializers.ReadOnlyField()
@@ -39,23 +79,27 @@ class FitnessClassSerializer(serializers.ModelSerializer):
                  'booking_deadline', 'max_capacity', 'current_bookings', 'available_slots', 
                  'price', 'status', 'location', 'special_notes', 'is_bookable', 'is_past',
                  'created_at', 'updated_at']
+        list_serializer_class = LocalTimeListSerializer
+        field_sources = {
+            'datetime_local': ['datetime'],
+            'booking_deadline': ['datetime'],
+            'available_slots': ['max_capacity', 'current_bookings'],
+            'is_bookable': ['status', 'datetime', 'max_capacity', 'current_bookings'],
+            'is_past': ['datetime'],
+        }
     
     def get_datetime_local(self, obj):
         """Convert datetime to user's preferred timezone"""
-        request = self.context.get('request')
-        if request and hasattr(request, 'user_timezone'):
-            user_tz = pytz.timezone(request.user_timezone)
-            local_time = obj.datetime.astimezone(user_tz)
-            return {
-                'datetime': local_time.isoformat(),
-                'timezone': str(user_tz),
-                'formatted': local_time.strftime('%Y-%m-%d %H:%M %Z')
-            }
-        return {
-            'datetime': obj.datetime.isoformat(),
-            'timezone': 'UTC',
-            'formatted': obj.datetime.strftime('%Y-%m-%d %H:%M UTC')
-        }
+        local_times, tz = local_time_context(self.context)
+        payload = local_times.get(obj.datetime)
+        if payload is None:
+            payload = local_times[obj.datetime] = local_time_payload(obj.datetime, tz)
+        return payload
+    
+    def local_datetimes(self, classes):
+        if 'datetime_local' not in self.fields:
+            return ()
+        return (obj.datetime for obj in classes)
     
     def get_booking_deadline(self, obj):
         """Get the booking deadline (2 hours before class)"""
@@ -69,22 +113,29 @@ class BookingCreateSerializer(serializers.Serializer):
     phone = serializers.CharField(max_length=20, required=False, allow_blank=True)
     special_requests = serializers.CharField(required=False, allow_blank=True)
     timezone = serializers.CharField(default='Asia/Kolkata')
+    join_waitlist = serializers.BooleanField(default=True)
+    
+    @property
+    def loader(self):
+        """Identity map shared with the view for the lifetime of the request"""
+        if 'loader' not in self.context:
+            request = self.context.get('request')
+            self.context['loader'] = BookingLoader.for_request(request) if request else BookingLoader()
+        return self.context['loader']
     
     def validate_class_id(self, value):
-        try:
-            fitness_class = FitnessClass.objects.get(id=value)
-            if not fitness_class.is_bookable:
-                if fitness_class.available_slots <= 0:
-                    raise serializers.ValidationError("This class is fully booked.")
-                elif fitness_class.status != 'scheduled':
-                    raise serializers.ValidationError("This class is not available for booking.")
-                elif fitness_class.is_past:
-                    raise serializers.ValidationError("Cannot book past classes.")
-                else:
-                    raise serializers.ValidationError("This class cannot be booked at this time.")
-            return value
-        except FitnessClass.DoesNotExist:
+        fitness_class = self.loader.get_fitness_class(value)
+        if fitness_class is None:
             raise serializers.ValidationError("Class not found.")
+        # Seat availability is checked in validate(), where join_waitlist is known
+        if not fitness_class.is_open_for_booking:
+            if fitness_class.status != 'scheduled':
+                raise serializers.ValidationError("This class is not available for booking.")
+            elif fitness_class.is_past:
+                raise serializers.ValidationError("Cannot book past classes.")
+            else:
+                raise serializers.ValidationError("This class cannot be booked at this time.")
+        return value
     
     def validate_client_email(self, value):
         """Validate email format and check for basic patterns"""
@@ -94,24 +145,138 @@ class BookingCreateSerializer(serializers.Serializer):
     
     def validate(self, data):
         # Check if client already has a booking for this class
-        try:
-            fitness_class = FitnessClass.objects.get(id=data['class_id'])
-            client_email = data['client_email']
-            
-            existing_booking = Booking.objects.filter(
-                fitness_class=fitness_class,
-                client__email=client_email,
-                status__in=['confirmed', 'waitlisted']
-            ).exists()
-            
-            if existing_booking:
-                raise serializers.ValidationError("You already have a booking for this class.")
-                
-        except FitnessClass.DoesNotExist:
-            pass
+        if self.loader.has_active_booking(data['class_id'], data['client_email']):
+            raise serializers.ValidationError("You already have a booking for this class.")
+        
+        fitness_class = self.loader.get_fitness_class(data['class_id'])
+        if fitness_class.available_slots <= 0 and not data['join_waitlist']:
+            raise serializers.ValidationError({'class_id': "This class is fully booked."})
             
         return data
 
+class RecurrenceSerializer(serializers.Serializer):
+    """Weekly series, e.g. every Tuesday at 07:00 for 8 weeks"""
+    class_type = serializers.CharField(max_length=100)
+    weekday = serializers.IntegerField(min_value=0, max_value=6, help_text="Monday is 0")
+    time = serializers.TimeField()
+    weeks = serializers.IntegerField(min_value=1, max_value=MAX_BATCH_BOOKINGS)
+    start_date = serializers.DateField(required=False)
+    instructor = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+class BatchBookingSerializer(serializers.Serializer):
+    client_name = serializers.CharField(max_length=100)
+    client_email = serializers.EmailField()
+    phone = serializers.CharField(max_length=20, required=False, allow_blank=True)
+    special_requests = serializers.CharField(required=False, allow_blank=True)
+    timezone = serializers.CharField(default='Asia/Kolkata')
+    class_ids = serializers.ListField(
+        child=serializers.UUIDField(), required=False, allow_empty=False,
+        max_length=MAX_BATCH_BOOKINGS
+    )
+    recurrence = RecurrenceSerializer(required=False)
+    mode = serializers.ChoiceField(choices=MODES, default=ALL_OR_NOTHING)
+    
+    def validate_client_email(self, value):
+        return value.lower()
+    
+    def validate_timezone(self, value):
+        if resolve_timezone(value) is None:
+            raise serializers.ValidationError("Unknown timezone.")
+        return value
+    
+    def validate_class_ids(self, value):
+        # Repeated ids would only claim the same seat twice
+        return list(dict.fromkeys(value))
+    
+    def validate(self, data):
+        if ('class_ids' in data) == ('recurrence' in data):
+            raise serializers.ValidationError("Provide either class_ids or recurrence.")
+        return data
+
+class ClassCancellationSerializer(serializers.Serializer):
+    """Classes to cancel, by id or by an inclusive date range"""
+    class_ids = serializers.ListField(child=serializers.UUIDField(), required=False, allow_empty=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    reason = serializers.CharField(max_length=500, required=False, allow_blank=True, default='')
+    
+    def validate(self, data):
+        has_range = 'date_from' in data or 'date_to' in data
+        if ('class_ids' in data) == has_range:
+            raise serializers.ValidationError("Provide either class_ids or date_from and date_to.")
+        if has_range:
+            if 'date_from' not in data or 'date_to' not in data:
+                raise serializers.ValidationError("Both date_from and date_to are required.")
+            if data['date_to'] < data['date_from']:
+                raise serializers.ValidationError("date_to must not be before date_from.")
+        return data
+
+class AvailabilityQuerySerializer(serializers.Serializer):
+    """Date range for the availability snapshot; defaults to the coming week"""
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+    
+    def validate(self, data):
+        data.setdefault('date_from', timezone.localdate())
+        data.setdefault('date_to', data['date_from'] + timedelta(days=6))
+        if data['date_to'] < data['date_from']:
+            raise serializers.ValidationError("date_to must not be before date_from.")
+        max_days = settings.BOOKING_SETTINGS.get('MAX_BOOKING_DAYS_AHEAD', 30)
+        if (data['date_to'] - data['date_from']).days > max_days:
+            raise serializers.ValidationError(f"The range may span at most {max_days} days.")
+        return data
+
+class AvailabilityStreamSerializer(serializers.Serializer):
+    """Comma-separated class ids and/or dates to follow on the availability stream"""
+    classes = serializers.CharField(required=False, default='')
+    dates = serializers.CharField(required=False, default='')
+
+    def _split(self, value, field):
+        values = []
+        for item in filter(None, (part.strip() for part in value.split(','))):
+            values.append(field.run_validation(item))
+        return values
+
+    def validate_classes(self, value):
+        return self._split(value, serializers.UUIDField())
+
+    def validate_dates(self, value):
+        return self._split(value, serializers.DateField())
+
+    def validate(self, data):
+        topics = len(data['classes']) + len(data['dates'])
+        if not topics:
+            raise serializers.ValidationError("Subscribe to at least one class or date.")
+        max_topics = settings.BOOKING_SETTINGS.get('MAX_STREAM_TOPICS', 50)
+        if topics > max_topics:
+            raise serializers.ValidationError(f"At most {max_topics} classes and dates per stream.")
+        return data
+
+class FieldsetQuerySerializer(serializers.Serializer):
+    """
+    ?fields=, ?expand= and ?normalize= for a list rendered by
+    context['serializer_class']; validated_data['fieldset'] is the Fieldset
+    to pass in its context
+    """
+    fields = serializers.CharField(required=False, allow_blank=True)
+    expand = serializers.CharField(required=False, allow_blank=True)
+    normalize = serializers.BooleanField(required=False, default=False)
+    
+    def validate(self, data):
+        serializer = self.context['serializer_class'](context={})
+        fields = expand = None
+        if 'fields' in data:
+            fields = split_param(data['fields'])
+            unknown = sorted(set(fields) - set(serializer.fields))
+            if unknown:
+                raise serializers.ValidationError({'fields': f"Unknown fields: {', '.join(unknown)}."})
+        if 'expand' in data:
+            expand = split_param(data['expand'])
+            unknown = sorted(set(expand) - {path for path, _ in nested_serializers(serializer)})
+            if unknown:
+                raise serializers.ValidationError({'expand': f"Cannot expand: {', '.join(unknown)}."})
+        return {'fieldset': Fieldset(fields, expand, data['normalize'])}
+
 class ClientSerializer(serializers.ModelSerializer):
     class Meta:
         model = Client
@@ -136,7 +301,7 @@ class ClientCreateUpdateSerializer(serializers.ModelSerializer):
             raise serializers.ValidationError("Fitness goals must be provided as a list.")
         return value
 
-class BookingSerializer(serializers.ModelSerializer):
+class BookingSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
     fitness_class = FitnessClassSerializer(read_only=True)
     client = ClientSerializer(read_only=True)
     can_cancel = serializers.ReadOnlyField()
@@ -148,6 +313,17 @@ class BookingSerializer(serializers.ModelSerializer):
                  'booking_reference', 'special_requests', 'payment_status', 
                  'can_cancel', 'feedback_rating', 'feedback_comment', 'reminder_sent',
                  'time_until_class']
+        list_serializer_class = LocalTimeListSerializer
+        field_sources = {
+            'can_cancel': ['status', 'fitness_class__datetime'],
+            'time_until_class': ['fitness_class__datetime'],
+        }
+    
+    def local_datetimes(self, bookings):
+        fitness_class = self.fields.get('fitness_class')
+        if not isinstance(fitness_class, FitnessClassSerializer):
+            return ()
+        return fitness_class.local_datetimes(obj.fitness_class for obj in bookings)
     
     def get_time_until_class(self, obj):
         """Get time remaining until the class starts"""
@@ -191,24 +367,16 @@ class InstructorDetailSerializer(serializers.ModelSerializer):
                  'total_completed_classes', 'average_rating']
     
     def get_upcoming_classes(self, obj):
-        """Get count of upcoming classes for this instructor"""
-        return obj.classes.filter(
-            datetime__gte=timezone.now(),
-            status='scheduled'
-        ).count()
+        """Upcoming classes, annotated by Instructor.objects.with_detail_stats()"""
+        return getattr(obj, 'upcoming_classes', None)
     
     def get_total_completed_classes(self, obj):
-        """Get total completed classes"""
-        return obj.classes.filter(status='completed').count()
+        """Completed classes, annotated by Instructor.objects.with_detail_stats()"""
+        return getattr(obj, 'total_completed_classes', None)
     
     def get_average_rating(self, obj):
-        """Calculate average rating from completed bookings"""
-        avg_rating = Booking.objects.filter(
-            fitness_class__instructor=obj,
-            status='completed',
-            feedback_rating__isnull=False
-        ).aggregate(avg_rating=Avg('feedback_rating'))['avg_rating']
-        
+        """Average completed-booking rating, annotated by Instructor.objects.with_detail_stats()"""
+        avg_rating = getattr(obj, 'average_rating', None)
         return round(avg_rating, 2) if avg_rating else None
 
 class ClassTypeDetailSerializer(serializers.ModelSerializer):
@@ -223,18 +391,12 @@ class ClassTypeDetailSerializer(serializers.ModelSerializer):
                  'upcoming_classes_count', 'total_bookings']
     
     def get_upcoming_classes_count(self, obj):
-        """Get count of upcoming classes for this class type"""
-        return obj.classes.filter(
-            datetime__gte=timezone.now(),
-            status='scheduled'
-        ).count()
+        """Upcoming classes, annotated by ClassType.objects.with_detail_stats()"""
+        return getattr(obj, 'upcoming_classes_count', None)
     
     def get_total_bookings(self, obj):
-        """Get total bookings for this class type"""
-        return Booking.objects.filter(
-            fitness_class__class_type=obj,
-            status__in=['confirmed', 'completed']
-        ).count()
+        """Confirmed and completed bookings, annotated by ClassType.objects.with_detail_stats()"""
+        return getattr(obj, 'total_bookings', None)
 
 class BookingStatsSerializer(serializers.Serializer):
     """Serializer for booking statistics"""
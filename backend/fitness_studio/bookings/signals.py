@@ -0,0 +1,82 @@
+from django.conf import settings
+from django.db.models.signals import post_init, post_save, post_delete
+from django.dispatch import receiver
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from .models import FitnessClass, Booking, ClassType, Client, ClientStats, Instructor
+from .cache import invalidate_class_listings, invalidate_class_types, invalidate_client_stats
+from .authentication import invalidate_token
+from .streaming import announce_availability
+
+@receiver(post_init, sender=FitnessClass)
+def remember_class_datetime(sender, instance, **kwargs):
+    """Keep the loaded date and type so a changed class invalidates the old ones too"""
+    instance._original_datetime = instance.__dict__.get('datetime')
+    instance._original_class_type_id = instance.__dict__.get('class_type_id')
+
+@receiver(post_save, sender=FitnessClass)
+@receiver(post_delete, sender=FitnessClass)
+def fitness_class_changed(sender, instance, **kwargs):
+    invalidate_class_listings(
+        instance.datetime, getattr(instance, '_original_datetime', None),
+        class_type_ids=[instance.class_type_id, getattr(instance, '_original_class_type_id', None)]
+    )
+    instance._original_datetime = instance.datetime
+    instance._original_class_type_id = instance.class_type_id
+    if kwargs.get('signal') is post_save:
+        announce_availability(instance.pk)
+
+@receiver(post_save, sender=Client)
+def client_created(sender, instance, created, raw=False, **kwargs):
+    """A new client has no bookings: start its counters at zero, so updates never miss the row"""
+    if created and not raw:
+        ClientStats.objects.create(client=instance)
+
+@receiver(post_save, sender=Booking)
+@receiver(post_delete, sender=Booking)
+def booking_changed(sender, instance, **kwargs):
+    invalidate_class_listings(
+        instance.fitness_class.datetime, class_type_ids=[instance.fitness_class.class_type_id]
+    )
+    invalidate_client_stats(instance.client_id)
+
+def invalidate_listings_of(classes):
+    """Bump the namespaces of the upcoming classes in this queryset"""
+    rows = list(classes.filter(datetime__gte=timezone.now()).values_list('datetime', 'class_type_id'))
+    if rows:
+        invalidate_class_listings(
+            *(class_datetime for class_datetime, _ in rows),
+            class_type_ids={class_type_id for _, class_type_id in rows}
+        )
+
+@receiver(post_save, sender=ClassType)
+@receiver(post_delete, sender=ClassType)
+def class_type_changed(sender, instance, created=False, **kwargs):
+    # Deleting cascades to the classes, whose own signals bump their dates
+    invalidate_class_types(instance.pk)
+    if kwargs.get('signal') is post_save and not created:
+        invalidate_listings_of(instance.classes.all())
+
+@receiver(post_save, sender=Instructor)
+def instructor_changed(sender, instance, created, **kwargs):
+    """Listings embed the instructor, so a rename shows in every listing of their classes"""
+    if not created:
+        invalidate_listings_of(instance.classes.all())
+
+@receiver(post_save, sender=Token)
+@receiver(post_delete, sender=Token)
+def token_changed(sender, instance, created=False, **kwargs):
+    """Logout and token rotation delete the token; a new token has nothing cached"""
+    if not created:
+        invalidate_token(instance.key)
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_changed(sender, instance, created, update_fields=None, **kwargs):
+    """Cached tokens carry their user, so any change (deactivation included) drops them"""
+    # Logging in only stamps last_login; revoking then would push every
+    # request in the next REVOKED_TTL seconds to the database
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    if not created:
+        for key in Token.objects.filter(user_id=instance.pk).values_list('key', flat=True):
+            invalidate_token(key)
@@ -0,0 +1,189 @@
+import abc
+import asyncio
+import json
+import logging
+import threading
+import time
+from functools import lru_cache
+from django.conf import settings
+from django.db import transaction
+from django.utils.module_loading import import_string
+from .cache import date_scope
+
+logger = logging.getLogger('booking')
+
+# Events buffered per subscriber before the oldest are dropped; seat counts
+# are absolute values, so a slow client only ever misses superseded states
+SUBSCRIBER_BUFFER = 100
+
+# Comment lines sent while idle keep proxies from closing the connection
+STREAM_KEEPALIVE_SECONDS = settings.BOOKING_SETTINGS.get('STREAM_KEEPALIVE_SECONDS', 15)
+STREAM_MAX_SECONDS = settings.BOOKING_SETTINGS.get('STREAM_MAX_SECONDS', 60 * 10)
+
+def class_topic(class_id):
+    return f"class:{class_id}"
+
+# Every class on one calendar date, named like the listing cache namespace
+date_topic = date_scope
+
+class Subscription:
+    """One listener's queue, owned by the event loop that created it"""
+
+    def __init__(self, hub, topics, loop, maxsize=SUBSCRIBER_BUFFER):
+        self.hub = hub
+        self.topics = frozenset(topics)
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=maxsize)
+
+    def deliver(self, event):
+        """Called on the subscriber's loop; keeps the newest events when full"""
+        if self.queue.full():
+            self.queue.get_nowait()
+        self.queue.put_nowait(event)
+
+    async def get(self, timeout=None):
+        """Next event, or None once timeout seconds pass without one"""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def close(self):
+        self.hub.unsubscribe(self)
+
+class BroadcastHub(abc.ABC):
+    """
+    Transport for availability events. Subclasses decide how an event published
+    in one place reaches subscriptions that may live in other processes.
+    """
+
+    @abc.abstractmethod
+    def subscribe(self, topics):
+        """A new Subscription to the given topics on the running event loop"""
+
+    @abc.abstractmethod
+    def unsubscribe(self, subscription):
+        """Stop delivering to subscription"""
+
+    @abc.abstractmethod
+    def publish(self, topics, event):
+        """Deliver event to every subscription of any of the topics"""
+
+    def has_subscribers(self):
+        """Whether publishing could reach anyone; lets publishers skip the lookup query"""
+        return True
+
+class InProcessHub(BroadcastHub):
+    """
+    Single-node hub. Publishing is thread-safe: bookings commit on worker
+    threads while subscriptions are served by the ASGI event loop, so events
+    are handed to each subscriber's own loop.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._topics = {}
+
+    def subscribe(self, topics):
+        subscription = Subscription(self, topics, asyncio.get_running_loop())
+        with self._lock:
+            for topic in subscription.topics:
+                self._topics.setdefault(topic, set()).add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for topic in subscription.topics:
+                listeners = self._topics.get(topic)
+                if listeners is not None:
+                    listeners.discard(subscription)
+                    if not listeners:
+                        del self._topics[topic]
+
+    def publish(self, topics, event):
+        with self._lock:
+            targets = set().union(*(self._topics.get(topic, ()) for topic in topics))
+        for subscription in targets:
+            try:
+                subscription.loop.call_soon_threadsafe(subscription.deliver, event)
+            except RuntimeError:
+                # The subscriber's loop has shut down; forget it
+                self.unsubscribe(subscription)
+
+    def has_subscribers(self):
+        return bool(self._topics)
+
+@lru_cache(maxsize=None)
+def get_hub():
+    """The configured hub, BOOKING_SETTINGS['BROADCAST_HUB'] (a dotted path)"""
+    path = settings.BOOKING_SETTINGS.get('BROADCAST_HUB', 'bookings.streaming.InProcessHub')
+    return import_string(path)()
+
+def availability_events(classes):
+    """(event, topics) for the current availability of a FitnessClass queryset, in one query"""
+    rows = classes.with_availability().order_by('datetime', 'id').values_list(
+        'id', 'seats_left', 'bookable', 'status', 'datetime'
+    )
+    for class_id, seats_left, bookable, class_status, class_datetime in rows:
+        event = {
+            'id': str(class_id),
+            'available_slots': seats_left,
+            'is_bookable': bool(bookable),
+            'status': class_status,
+        }
+        yield event, (class_topic(class_id), date_topic(class_datetime))
+
+def announce_availability(*class_ids):
+    """
+    Publish the new availability of these classes once the surrounding
+    transaction commits, so listeners never see seats that get rolled back
+    """
+    class_ids = [class_id for class_id in class_ids if class_id is not None]
+    if not class_ids:
+        return
+
+    def publish():
+        from .models import FitnessClass
+
+        hub = get_hub()
+        if not hub.has_subscribers():
+            return
+        try:
+            for event, topics in availability_events(FitnessClass.objects.filter(id__in=class_ids)):
+                hub.publish(topics, event)
+        except Exception as e:
+            # Streaming is best-effort; never fail the commit that triggered it
+            logger.error(f"Availability broadcast failed: {e}")
+
+    transaction.on_commit(publish)
+
+class EventStream:
+    """
+    Server-sent events for one subscription: the snapshot, then every event
+    published to it, with keepalive comments while idle. Closing the stream
+    (the response does on disconnect) unsubscribes.
+    """
+
+    def __init__(self, subscription, snapshot):
+        self.subscription = subscription
+        self.snapshot = snapshot
+
+    async def __aiter__(self):
+        try:
+            yield f"retry: {STREAM_KEEPALIVE_SECONDS * 1000}\n\n"
+            yield format_event({'classes': await self.snapshot()}, name='snapshot')
+            # Streams end after a while and the browser reconnects, so a
+            # connection whose client vanished is never held for long
+            deadline = time.monotonic() + STREAM_MAX_SECONDS
+            while time.monotonic() < deadline:
+                event = await self.subscription.get(timeout=STREAM_KEEPALIVE_SECONDS)
+                yield format_event(event) if event is not None else ": keepalive\n\n"
+        finally:
+            self.close()
+
+    def close(self):
+        self.subscription.close()
+
+def format_event(event, name='availability'):
+    """Server-sent events wire format"""
+    return f"event: {name}\ndata: {json.dumps(event, separators=(',', ':'))}\n\n"
@@ -0,0 +1,351 @@
+import bisect
+import itertools
+import math
+import random
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta, time
+from django.core.cache import cache
+from django.db import connection, transaction
+from django.db.models import Count, Max, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from .models import (
+    Instructor, ClassType, FitnessClass, Client, Booking, ClientStats, OutboxMessage
+)
+
+# Relative demand by hour of day: early-morning and after-work peaks
+HOUR_DEMAND = {
+    6: 1.2, 7: 1.6, 8: 1.3, 9: 0.9, 10: 0.6, 11: 0.5, 12: 0.7, 13: 0.6,
+    14: 0.4, 15: 0.4, 16: 0.6, 17: 1.2, 18: 1.8, 19: 1.6, 20: 1.0, 21: 0.6,
+}
+CLASS_HOURS = sorted(HOUR_DEMAND)
+
+LOCATIONS = ['Studio 1', 'Studio 2', 'Outdoor Deck', 'Rooftop']
+SPECIAL_REQUESTS = [
+    '', '', '', 'First time, please guide', 'Back injury - low impact please',
+    'Prefer front row', 'Need modifications'
+]
+
+# (status, weight) for bookings by whether the class has already happened
+PAST_STATUSES = [('completed', 85), ('no_show', 7), ('cancelled', 8)]
+FUTURE_STATUSES = [('confirmed', 90), ('cancelled', 10)]
+SEAT_STATUSES = {'confirmed', 'completed', 'no_show'}
+
+# Column order of the value tuples built for the raw booking insert
+BOOKING_COLUMNS = (
+    'id', 'fitness_class', 'client', 'status', 'booking_datetime', 'booking_reference',
+    'special_requests', 'payment_status', 'feedback_rating', 'feedback_comment',
+    'reminder_sent', 'waitlist_position',
+)
+
+def _uuid(rng):
+    return uuid.UUID(int=rng.getrandbits(128), version=4)
+
+def _weighted_picker(rng, choices):
+    statuses = [status for status, _ in choices]
+    cum_weights = list(itertools.accumulate(weight for _, weight in choices))
+    return lambda: rng.choices(statuses, cum_weights=cum_weights)[0]
+
+@contextmanager
+def explicit_timestamps(*fields):
+    """Let bulk_create keep generated values for auto_now_add fields"""
+    previous = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, previous):
+            field.auto_now_add = value
+
+@contextmanager
+def fast_bulk_load():
+    """Relax SQLite durability for the duration of a bulk load"""
+    # SQLite refuses to change the safety level inside a transaction
+    if connection.vendor != 'sqlite' or connection.in_atomic_block:
+        yield
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('PRAGMA synchronous')
+        synchronous = cursor.fetchone()[0]
+        cursor.execute('PRAGMA synchronous = OFF')
+    try:
+        yield
+    finally:
+        with connection.cursor() as cursor:
+            cursor.execute(f'PRAGMA synchronous = {int(synchronous)}')
+
+def clear_dataset():
+    """Remove all studio data with plain DELETEs (no per-row signal dispatch)"""
+    with transaction.atomic(), connection.cursor() as cursor:
+        for model in (OutboxMessage, ClientStats, Booking, FitnessClass, Client, Instructor, ClassType):
+            cursor.execute(f'DELETE FROM {connection.ops.quote_name(model._meta.db_table)}')
+    cache.clear()
+
+class SyntheticDataGenerator:
+    """
+    Deterministic bulk generator for load-testing datasets.
+
+    Class popularity follows a skewed (log-normal) distribution weighted by
+    class type and hour of day, member activity follows a Pareto distribution,
+    and booking lead times are exponential. Rows are streamed to the database
+    with bulk_create, and derived counters are recomputed set-based at the end.
+    """
+
+    def __init__(self, classes, clients, bookings, seed=42, days=28, batch_size=5000,
+                 instructors=None, class_types=None, instructor_templates=(),
+                 class_type_templates=(), client_templates=(), log=None):
+        self.rng = random.Random(seed)
+        self.classes = classes
+        self.clients = clients
+        self.bookings = bookings
+        self.days = max(1, days)
+        self.batch_size = batch_size
+        self.instructor_templates = list(instructor_templates)
+        self.class_type_templates = list(class_type_templates)
+        self.client_templates = list(client_templates)
+        self.class_types = max(class_types or 0, len(self.class_type_templates), 1)
+        # Every instructor teaches at most one class per slot
+        slots = self.days * len(CLASS_HOURS)
+        self.instructors = max(instructors or 0, len(self.instructor_templates),
+                               math.ceil(classes / slots), 1)
+        self.log = log or (lambda message: None)
+        self.now = timezone.now()
+
+    def run(self):
+        with fast_bulk_load(), explicit_timestamps(Client._meta.get_field('created_at')):
+            instructor_ids = self.create_instructors()
+            class_type_ids, type_demand = self.create_class_types()
+            schedule = self.create_classes(instructor_ids, class_type_ids, type_demand)
+            client_ids, client_cum_weights = self.create_clients()
+            created = self.create_bookings(schedule, client_ids, client_cum_weights)
+        refresh_counters(batch_size=self.batch_size)
+        cache.clear()
+        return created
+
+    def _bulk_insert(self, model, rows):
+        with transaction.atomic():
+            model.objects.bulk_create(rows, batch_size=self.batch_size)
+
+    def _insert_rows(self, model, field_names, rows):
+        """
+        Insert plain value tuples with a single prepared statement. Used for
+        bookings, where compiling a bulk_create per batch dominates the load time.
+        """
+        fields = [model._meta.get_field(name) for name in field_names]
+        prepare = [field.get_db_prep_save for field in fields]
+        quote = connection.ops.quote_name
+        sql = 'INSERT INTO {} ({}) VALUES ({})'.format(
+            quote(model._meta.db_table),
+            ', '.join(quote(field.column) for field in fields),
+            ', '.join(['%s'] * len(fields)),
+        )
+        params = [
+            [prep(value, connection) for prep, value in zip(prepare, row)]
+            for row in rows
+        ]
+        with transaction.atomic(), connection.cursor() as cursor:
+            cursor.executemany(sql, params)
+
+    def create_instructors(self):
+        rows = []
+        for i in range(self.instructors):
+            if i < len(self.instructor_templates):
+                data = dict(self.instructor_templates[i])
+            else:
+                data = {
+                    'name': f'Instructor {i + 1}',
+                    'email': f'instructor{i + 1}@fitstudio.example',
+                    'specializations': self.rng.sample(['Yoga', 'HIIT', 'Pilates', 'Zumba', 'Kickboxing'], 2),
+                    'experience_years': self.rng.randint(1, 15),
+                    'rating': round(self.rng.uniform(3.8, 5.0), 2),
+                }
+            rows.append(Instructor(id=_uuid(self.rng), **data))
+        self._bulk_insert(Instructor, rows)
+        self.log(f'Created {len(rows)} instructors')
+        return [row.id for row in rows]
+
+    def create_class_types(self):
+        rows = []
+        for i in range(self.class_types):
+            if i < len(self.class_type_templates):
+                data = dict(self.class_type_templates[i])
+            else:
+                template = self.class_type_templates[i % len(self.class_type_templates)] \
+                    if self.class_type_templates else {}
+                data = {
+                    'name': f"{template.get('name', 'Class Type')} {i + 1}",
+                    'description': template.get('description', 'Synthetic class type'),
+                    'duration_minutes': template.get('duration_minutes', 60),
+                    'difficulty_level': template.get('difficulty_level', 'beginner'),
+                    'calories_burn_estimate': template.get('calories_burn_estimate', 300),
+                    'equipment_needed': template.get('equipment_needed', []),
+                }
+            rows.append(ClassType(id=_uuid(self.rng), **data))
+        self._bulk_insert(ClassType, rows)
+        self.log(f'Created {len(rows)} class types')
+        demand = [self.rng.lognormvariate(0, 0.6) for _ in rows]
+        return [row.id for row in rows], demand
+
+    def create_classes(self, instructor_ids, class_type_ids, type_demand):
+        """Insert classes and return the per-class facts needed to place bookings"""
+        start_day = timezone.localdate(self.now) - timedelta(days=self.days // 2)
+        slots = [
+            (day, hour) for day in range(self.days) for hour in CLASS_HOURS
+        ]
+
+        per_slot = math.ceil(self.classes / len(slots))
+
+        schedule = []
+        rows = []
+        for index in range(self.classes):
+            # Spread classes evenly over the whole schedule; classes sharing a
+            # slot are consecutive, so index % per_slot picks distinct instructors
+            day, hour = slots[index * len(slots) // self.classes]
+            instructor_id = instructor_ids[index % per_slot]
+            type_index = self.rng.randrange(len(class_type_ids))
+            class_datetime = timezone.make_aware(
+                timezone.datetime.combine(start_day + timedelta(days=day), time(hour, 0))
+            )
+            capacity = self.rng.randint(15, 25)
+            class_id = _uuid(self.rng)
+            rows.append(FitnessClass(
+                id=class_id,
+                class_type_id=class_type_ids[type_index],
+                instructor_id=instructor_id,
+                datetime=class_datetime,
+                max_capacity=capacity,
+                price=self.rng.randrange(500, 1500, 50),
+                location=self.rng.choice(LOCATIONS),
+                status='completed' if class_datetime < self.now else 'scheduled',
+            ))
+            popularity = type_demand[type_index] * HOUR_DEMAND[hour] * self.rng.lognormvariate(0, 0.5)
+            schedule.append((class_id, class_datetime, capacity, popularity))
+
+            if len(rows) >= self.batch_size:
+                self._bulk_insert(FitnessClass, rows)
+                rows = []
+        if rows:
+            self._bulk_insert(FitnessClass, rows)
+        self.log(f'Created {self.classes} fitness classes')
+        return schedule
+
+    def create_clients(self):
+        client_ids = []
+        rows = []
+        for i in range(self.clients):
+            if i < len(self.client_templates):
+                data = dict(self.client_templates[i])
+            else:
+                data = {
+                    'name': f'Member {i + 1}',
+                    'email': f'member{i + 1}@example.com',
+                    'membership_tier': 'premium' if self.rng.random() < 0.2 else 'basic',
+                }
+            data['created_at'] = self.now - timedelta(days=self.rng.randint(30, 1000))
+            client_id = _uuid(self.rng)
+            client_ids.append(client_id)
+            rows.append(Client(id=client_id, **data))
+            if len(rows) >= self.batch_size:
+                self._bulk_insert(Client, rows)
+                rows = []
+        if rows:
+            self._bulk_insert(Client, rows)
+        self.log(f'Created {self.clients} clients')
+
+        # A few regulars book far more often than casual members
+        activity = (self.rng.paretovariate(1.5) for _ in range(self.clients))
+        return client_ids, list(itertools.accumulate(activity))
+
+    def create_bookings(self, schedule, client_ids, client_cum_weights):
+        # Scale demand so the capped per-class counts still add up to the target
+        total_popularity = sum(entry[3] for entry in schedule) or 1
+        caps = [min(len(client_ids), capacity * 2) for _, _, capacity, _ in schedule]
+        scale = self.bookings / total_popularity
+        for _ in range(8):
+            placed = sum(min(cap, entry[3] * scale) for cap, entry in zip(caps, schedule))
+            if not placed or placed >= self.bookings * 0.999:
+                break
+            scale *= self.bookings / placed
+        past_status = _weighted_picker(self.rng, PAST_STATUSES)
+        future_status = _weighted_picker(self.rng, FUTURE_STATUSES)
+        client_total = client_cum_weights[-1] if client_cum_weights else 0
+
+        rows = []
+        created = batches = 0
+        for (class_id, class_datetime, capacity, popularity), cap in zip(schedule, caps):
+            expected = min(cap, popularity * scale)
+            wanted = int(expected) + (self.rng.random() < expected % 1)
+            is_past = class_datetime < self.now
+
+            chosen = set()
+            attempts = 0
+            while len(chosen) < wanted and attempts < wanted * 4:
+                pick = bisect.bisect_left(client_cum_weights, self.rng.random() * client_total)
+                chosen.add(min(pick, len(client_ids) - 1))
+                attempts += 1
+
+            seats_taken = queued = 0
+            for client_index in chosen:
+                status = past_status() if is_past else future_status()
+                position = None
+                if status in SEAT_STATUSES:
+                    if seats_taken >= capacity:
+                        status = 'cancelled' if is_past else 'waitlisted'
+                    else:
+                        seats_taken += 1
+                if status == 'waitlisted':
+                    queued += 1
+                    position = queued
+
+                lead = timedelta(hours=2 + min(self.rng.expovariate(1 / 60), 24 * 21))
+                booked_at = min(class_datetime - lead,
+                                self.now - timedelta(minutes=self.rng.randint(1, 600)))
+                rating = None
+                if status == 'completed' and self.rng.random() < 0.4:
+                    rating = self.rng.choices([3, 4, 5], weights=[2, 5, 6])[0]
+
+                rows.append((
+                    _uuid(self.rng), class_id, client_ids[client_index], status, booked_at,
+                    f'FBX{created:017d}', self.rng.choice(SPECIAL_REQUESTS),
+                    'paid' if status != 'cancelled' else 'refunded', rating, '', False, position,
+                ))
+                created += 1
+
+            if len(rows) >= self.batch_size:
+                self._insert_rows(Booking, BOOKING_COLUMNS, rows)
+                rows = []
+                batches += 1
+                if batches % 20 == 0:
+                    self.log(f'  ... {created} bookings')
+        if rows:
+            self._insert_rows(Booking, BOOKING_COLUMNS, rows)
+        self.log(f'Created {created} bookings')
+        return created
+
+def _aggregate_per(outer_field, aggregate, **filters):
+    """Correlated aggregate over bookings grouped by one foreign key, for set-based UPDATEs"""
+    values = (Booking.objects.filter(**{outer_field: OuterRef('pk')}, **filters)
+              .order_by().values(outer_field).annotate(n=aggregate).values('n'))
+    return Coalesce(Subquery(values), 0)
+
+def _count_per(outer_field, **filters):
+    return _aggregate_per(outer_field, Count('id'), **filters)
+
+def refresh_counters(batch_size=1000):
+    """Recompute denormalized counters after a bulk load with set-based UPDATEs"""
+    with transaction.atomic():
+        FitnessClass.objects.update(
+            current_bookings=_count_per('fitness_class', status__in=sorted(SEAT_STATUSES)),
+            waitlist_sequence=_aggregate_per('fitness_class', Max('waitlist_position')),
+        )
+        Client.objects.update(total_bookings=_count_per('client'))
+
+    client_ids = list(Client.objects.order_by('id').values_list('id', flat=True))
+    for start in range(0, len(client_ids), batch_size):
+        ClientStats.rebuild(client_ids[start:start + batch_size])
+
+def generate_dataset(classes, clients, bookings, seed=42, **options):
+    """Generate a synthetic dataset; see SyntheticDataGenerator for the options"""
+    return SyntheticDataGenerator(classes, clients, bookings, seed=seed, **options).run()
@@ -0,0 +1,48 @@
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+class TestRunner(DiscoverRunner):
+    """
+    Runs the suite with throttle counters in the (per-test-cleared) default
+    cache instead of the SQLite file real workers share
+    """
+    
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self.throttle_store = override_settings(BOOKING_SETTINGS={
+            **settings.BOOKING_SETTINGS,
+            'THROTTLE_STORE': 'bookings.throttling.CacheThrottleStore',
+        })
+        self.throttle_store.enable()
+    
+    def teardown_test_environment(self, **kwargs):
+        self.throttle_store.disable()
+        super().teardown_test_environment(**kwargs)
+
+class QueryBudgetMixin:
+    """
+    Test mixin for per-endpoint SQL budgets.
+    Declare ``query_budgets = {'class-list': 3, ...}`` on the test case and call
+    ``assertWithinQueryBudget(response)`` on responses that went through
+    QueryInstrumentationMiddleware.
+    """
+    query_budgets = {}
+    
+    def assertWithinQueryBudget(self, response, budget=None):
+        stats = getattr(response, 'query_stats', None)
+        if stats is None:
+            self.fail("Response has no query_stats; is QueryInstrumentationMiddleware installed?")
+        
+        url_name = stats['url_name']
+        if budget is None:
+            if url_name not in self.query_budgets:
+                self.fail(f"No query budget declared for endpoint '{url_name}'")
+            budget = self.query_budgets[url_name]
+        
+        if stats['query_count'] > budget:
+            self.fail(
+                f"Endpoint '{url_name}' ran {stats['query_count']} queries, "
+                f"over its budget of {budget} (slowest: {stats['slowest_query']})"
+            )
+        return stats
@@ -1,17 +1,52 @@
 from django.test import TestCase
 
 # Create your tests here.
-from django.test import TestCase
+from django.test import TestCase, TransactionTestCase, RequestFactory
 from django.urls import reverse
 from django.utils import timezone
-from datetime import timedelta
+from datetime import timedelta, time
 from rest_framework.test import APITestCase
 from rest_framework import status
-from .models import Instructor, ClassType, FitnessClass, Client, Booking
+from rest_framework.renderers import JSONRenderer
+import asyncio
+import importlib
+import json
+import pytz
+import tempfile
+import time as time_module
+from unittest import mock
+from asgiref.sync import sync_to_async
+from io import StringIO
+from django.contrib.auth.models import User
+from rest_framework.authtoken.models import Token
+from django.core.management import call_command
+from django.conf import settings
+from django.apps import apps as django_apps
+from django.core.cache import cache, caches
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from .models import Instructor, ClassType, FitnessClass, Client, Booking, ClientStats, OutboxMessage
+from . import outbox
+from .testing import QueryBudgetMixin
+from .cache import class_list_cache_key, class_list_ttl, query_fingerprint, CLASS_LIST_TTL
+from .cache_backends import TwoTierCache
+from django.http import QueryDict
+from .utils import generate_booking_stats, resolve_timezone
+from .batch import BatchBooking, recurrence_datetimes
+from .cancellation import cancel_classes
+from .serializers import FitnessClassSerializer
+from .fast_serializers import fitness_class_renderer
+from .fieldsets import Fieldset, sideloaded_entities
+from .middleware import TimezoneMiddleware
+from .streaming import BroadcastHub, InProcessHub, get_hub, class_topic, date_topic
+from .throttling import SQLiteThrottleStore, BookingRateThrottle
+from .authentication import check_token_cache
 
 class BookingAPITestCase(APITestCase):
     
     def setUp(self):
+        cache.clear()
+        
         # Create test data
         self.instructor = Instructor.objects.create(
             name='Test Instructor',
@@ -55,6 +90,41 @@ class BookingAPITestCase(APITestCase):
         self.assertIn('metadata', response.data)
         self.assertEqual(len(response.data['results']), 1)
     
+    def test_get_classes_counts_come_from_one_aggregate(self):
+        """Test instructor totals are annotated instead of counted per row"""
+        for day in range(2, 7):
+            instructor = Instructor.objects.create(
+                name=f'Instructor {day}',
+                email=f'instructor{day}@test.com',
+                specializations=['HIIT']
+            )
+            FitnessClass.objects.create(
+                class_type=self.class_type,
+                instructor=instructor,
+                datetime=timezone.now() + timedelta(days=day),
+                max_capacity=20
+            )
+            FitnessClass.objects.create(
+                class_type=self.class_type,
+                instructor=instructor,
+                datetime=timezone.now() - timedelta(days=day),
+                max_capacity=20,
+                status='completed'
+            )
+        
+        cache.clear()
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(reverse('class-list'))
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data['results']), 6)
+        totals = {row['instructor']['name']: row['instructor']['total_classes']
+                  for row in response.data['results']}
+        self.assertEqual(totals['Instructor 3'], 1)
+        self.assertEqual(totals['Test Instructor'], 0)
+        count_queries = [q for q in ctx.captured_queries if 'COUNT(' in q['sql']]
+        self.assertEqual(len(count_queries), 1)
+    
     def test_book_class_success(self):
         """Test successful class booking"""
         url = reverse('book-class')
@@ -89,7 +159,7 @@ class BookingAPITestCase(APITestCase):
         self.fitness_class.save()
         
         url = reverse('book-class')
-        response = self.client.post(url, self.client_data, format='json')
+        response = self.client.post(url, {**self.client_data, 'join_waitlist': False}, format='json')
         
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertFalse(response.data['success'])
@@ -233,4 +303,1620 @@ class ModelTestCase(TestCase):
         )
         
         self.assertIsNotNone(booking.booking_reference)
-        self.assertTrue(booking.booking_reference.startswith('FB'))
\ No newline at end of file
+        self.assertTrue(booking.booking_reference.startswith('FB'))
+    def test_reserve_seat_stops_at_capacity(self):
+        """Test reserve_seat never oversells the last seat"""
+        fitness_class = FitnessClass.objects.create(
+            class_type=self.class_type,
+            instructor=self.instructor,
+            datetime=timezone.now() + timedelta(days=1),
+            max_capacity=2,
+            current_bookings=1
+        )
+        
+        self.assertTrue(fitness_class.reserve_seat())
+        # A stale copy of the row must not be able to claim a seat either
+        stale_copy = FitnessClass.objects.get(id=fitness_class.id)
+        stale_copy.current_bookings = 0
+        self.assertFalse(stale_copy.reserve_seat())
+        
+        fitness_class.refresh_from_db()
+        self.assertEqual(fitness_class.current_bookings, 2)
+    
+    def test_release_seat_never_negative(self):
+        """Test release_seat stops at zero"""
+        fitness_class = FitnessClass.objects.create(
+            class_type=self.class_type,
+            instructor=self.instructor,
+            datetime=timezone.now() + timedelta(days=1),
+            max_capacity=20,
+            current_bookings=1
+        )
+        
+        self.assertTrue(fitness_class.release_seat())
+        self.assertFalse(fitness_class.release_seat())
+        
+        fitness_class.refresh_from_db()
+        self.assertEqual(fitness_class.current_bookings, 0)
+
+    def test_booking_stats_single_aggregate_and_ranked_favorites(self):
+        """Test client stats use two queries, rank favourites and are cached"""
+        cache.clear()
+        client = Client.objects.create(name='Test Client', email='client@test.com')
+        hiit = ClassType.objects.create(
+            name='HIIT',
+            description='Test HIIT class',
+            duration_minutes=45,
+            difficulty_level='advanced',
+            calories_burn_estimate=400
+        )
+        for day, (class_type, booking_status) in enumerate([
+            (self.class_type, 'confirmed'),
+            (hiit, 'confirmed'),
+            (hiit, 'completed'),
+            (hiit, 'cancelled'),
+        ]):
+            fitness_class = FitnessClass.objects.create(
+                class_type=class_type,
+                instructor=self.instructor,
+                datetime=timezone.now() + timedelta(days=day + 1),
+                max_capacity=20
+            )
+            Booking.objects.create(fitness_class=fitness_class, client=client, status=booking_status)
+        
+        with self.assertNumQueries(3):
+            stats = generate_booking_stats(client)
+        
+        self.assertEqual(stats['total_bookings'], 4)
+        self.assertEqual(stats['confirmed_bookings'], 2)
+        self.assertEqual(stats['completed_bookings'], 1)
+        self.assertEqual(stats['cancelled_bookings'], 1)
+        self.assertEqual(stats['upcoming_bookings'], 2)
+        self.assertEqual(stats['favorite_class_types'], ['HIIT', 'Test Yoga'])
+        
+        # Counters are a primary-key lookup; the derived part comes from cache
+        with self.assertNumQueries(1):
+            self.assertEqual(generate_booking_stats(client), stats)
+    
+    def test_client_stats_follow_booking_transitions(self):
+        """Test ClientStats is maintained on create, cancel, complete, no-show and feedback"""
+        client = Client.objects.create(name='Test Client', email='client@test.com')
+        bookings = []
+        for day in range(1, 5):
+            fitness_class = FitnessClass.objects.create(
+                class_type=self.class_type,
+                instructor=self.instructor,
+                datetime=timezone.now() + timedelta(days=day),
+                max_capacity=20
+            )
+            bookings.append(Booking.objects.create(fitness_class=fitness_class, client=client))
+        
+        stale_copy = Booking.objects.get(id=bookings[0].id)
+        self.assertTrue(bookings[0].transition_to('cancelled'))
+        # A concurrent request holding the old status must not count twice
+        self.assertFalse(stale_copy.transition_to('cancelled'))
+        bookings[1].status = 'completed'
+        bookings[1].save()
+        bookings[1].feedback_rating = 4
+        bookings[1].save()
+        self.assertTrue(Booking.objects.get(id=bookings[2].id).transition_to('no_show'))
+        
+        stats = ClientStats.objects.get(client=client)
+        self.assertEqual(stats.total_bookings, 4)
+        self.assertEqual(stats.confirmed_bookings, 1)
+        self.assertEqual(stats.cancelled_bookings, 1)
+        self.assertEqual(stats.completed_bookings, 1)
+        self.assertEqual(stats.no_show_bookings, 1)
+        self.assertEqual(stats.feedback_count, 1)
+        self.assertEqual(stats.average_rating_given, 4)
+        
+        # A from-scratch rebuild agrees with the incremental counters
+        ClientStats.objects.all().delete()
+        call_command('rebuild_client_stats', chunk_size=1, stdout=StringIO())
+        rebuilt = ClientStats.objects.get(client=client)
+        for field in ClientStats.STATUS_COUNTERS.values():
+            self.assertEqual(getattr(rebuilt, field), getattr(stats, field))
+        self.assertEqual(rebuilt.total_bookings, stats.total_bookings)
+        self.assertEqual(rebuilt.feedback_rating_sum, stats.feedback_rating_sum)
+    
+    def test_stats_of_client_without_row_start_from_its_bookings(self):
+        """Test the backfill and a first counter update count existing bookings, not just the change"""
+        client = Client.objects.create(name='Test Client', email='client@test.com')
+        bookings = [
+            Booking.objects.create(fitness_class=FitnessClass.objects.create(
+                class_type=self.class_type,
+                instructor=self.instructor,
+                datetime=timezone.now() + timedelta(days=day),
+                max_capacity=20
+            ), client=client)
+            for day in range(1, 5)
+        ]
+        # Bookings made before ClientStats existed
+        ClientStats.objects.all().delete()
+        backfill = importlib.import_module('bookings.migrations.0002_clientstats').backfill_client_stats
+        backfill(django_apps, None)
+        stats = ClientStats.objects.get(client=client)
+        self.assertEqual((stats.total_bookings, stats.confirmed_bookings), (4, 4))
+        
+        ClientStats.objects.all().delete()
+        self.assertTrue(bookings[0].transition_to('cancelled'))
+        self.assertTrue(bookings[1].transition_to('cancelled'))
+        stats = ClientStats.objects.get(client=client)
+        self.assertEqual(
+            (stats.total_bookings, stats.confirmed_bookings, stats.cancelled_bookings), (4, 2, 2)
+        )
+    
+    def test_concurrent_first_reads_of_stats_do_not_conflict(self):
+        """Test a stats row inserted by a concurrent first read is reused, not an IntegrityError"""
+        client = Client.objects.create(name='Test Client', email='client@test.com')
+        Booking.objects.create(fitness_class=FitnessClass.objects.create(
+            class_type=self.class_type,
+            instructor=self.instructor,
+            datetime=timezone.now() + timedelta(days=1),
+            max_capacity=20
+        ), client=client)
+        ClientStats.objects.all().delete()
+        real_rebuild = ClientStats.rebuild
+        
+        def racing_rebuild(client_ids):
+            # The other request's row lands after our delete, before our insert
+            with mock.patch('django.db.models.QuerySet.delete', return_value=(0, {})):
+                ClientStats.objects.create(client=client, total_bookings=1, confirmed_bookings=1)
+                return real_rebuild(client_ids)
+        
+        with mock.patch.object(ClientStats, 'rebuild', side_effect=racing_rebuild):
+            stats = generate_booking_stats(client)
+        self.assertEqual(stats['total_bookings'], 1)
+        self.assertEqual(ClientStats.objects.filter(client=client).count(), 1)
+
+class SeatReservationAPITestCase(APITestCase):
+    
+    def setUp(self):
+        self.user = User.objects.create_user(username='member', password='pass12345')
+        self.client.force_authenticate(user=self.user)
+        
+        self.instructor = Instructor.objects.create(
+            name='Test Instructor',
+            email='instructor@test.com',
+            specializations=['Yoga'],
+            experience_years=5
+        )
+        
+        self.class_type = ClassType.objects.create(
+            name='Test Yoga',
+            description='Test yoga class',
+            duration_minutes=60,
+            difficulty_level='beginner',
+            calories_burn_estimate=200
+        )
+        
+        self.fitness_class = FitnessClass.objects.create(
+            class_type=self.class_type,
+            instructor=self.instructor,
+            datetime=timezone.now() + timedelta(days=2),
+            max_capacity=1,
+            price=1000
+        )
+    
+    def book(self, email):
+        return self.client.post(reverse('book-class'), {
+            'class_id': str(self.fitness_class.id),
+            'client_name': 'Test Client',
+            'client_email': email
+        }, format='json')
+    
+    def test_booking_and_cancellation_update_seat_counter(self):
+        """Test book/cancel round trip keeps current_bookings in sync"""
+        response = self.book('first@test.com')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertTrue(OutboxMessage.objects.filter(topic='booking_confirmation').exists())
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.current_bookings, 1)
+        self.assertEqual(Client.objects.get(email='first@test.com').total_bookings, 1)
+        
+        booking = Booking.objects.get(client__email='first@test.com')
+        response = self.client.post(reverse('cancel-booking', args=[booking.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.current_bookings, 0)
+        
+        # Cancelling twice must not release a second seat
+        response = self.client.post(reverse('cancel-booking', args=[booking.id]))
+        self.assertNotEqual(response.status_code, status.HTTP_200_OK)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.current_bookings, 0)
+    
+    def test_concurrent_duplicate_booking_is_rejected_without_claiming_a_seat(self):
+        """Test a duplicate that slips past validation gets the 'already booked' 400, not a 500"""
+        self.fitness_class.max_capacity = 2
+        self.fitness_class.save()
+        self.assertEqual(self.book('first@test.com').status_code, status.HTTP_201_CREATED)
+        
+        # The other request's booking lands after this one was validated
+        with mock.patch('bookings.loaders.BookingLoader.has_active_booking', return_value=False):
+            response = self.book('first@test.com')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertFalse(response.data['success'])
+        self.assertIn('non_field_errors', response.data['errors'])
+        self.assertEqual(Booking.objects.filter(client__email='first@test.com').count(), 1)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.current_bookings, 1)
+    
+    def test_class_cancelled_after_validation_is_not_waitlisted(self):
+        """Test a failed seat claim on a cancelled class refuses the booking instead of queueing it"""
+        reserve_seat = FitnessClass.reserve_seat
+        
+        def cancel_first(fitness_class):
+            # The class is cancelled between validation and the seat claim
+            FitnessClass.objects.filter(pk=fitness_class.pk).update(status='cancelled')
+            return reserve_seat(fitness_class)
+        
+        with mock.patch.object(FitnessClass, 'reserve_seat', autospec=True, side_effect=cancel_first):
+            response = self.book('first@test.com')
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertFalse(Booking.objects.filter(client__email='first@test.com').exists())
+    
+    def test_full_class_queues_and_promotes_in_order(self):
+        """Test a full class waitlists new bookings and cancellations promote the head"""
+        self.assertEqual(self.book('first@test.com').status_code, status.HTTP_201_CREATED)
+        second = self.book('second@test.com')
+        third = self.book('third@test.com')
+        self.assertEqual(second.status_code, status.HTTP_202_ACCEPTED)
+        self.assertEqual(second.data['booking']['status'], 'waitlisted')
+        self.assertEqual(second.data['booking']['waitlist_position'], 1)
+        self.assertEqual(third.data['booking']['waitlist_position'], 2)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.current_bookings, 1)
+        
+        first = Booking.objects.get(client__email='first@test.com')
+        response = self.client.post(reverse('cancel-booking', args=[first.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        promoted = Booking.objects.get(client__email='second@test.com')
+        self.assertEqual(promoted.status, 'confirmed')
+        self.assertTrue(OutboxMessage.objects.filter(payload={'booking_id': str(promoted.id)}).exists())
+        self.assertEqual(Booking.objects.get(client__email='third@test.com').waitlist_rank(), 1)
+        self.assertEqual(ClientStats.objects.get(client=promoted.client).confirmed_bookings, 1)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.current_bookings, 1)
+    
+    def test_leaving_waitlist_keeps_seat_taken(self):
+        """Test cancelling a waitlisted booking neither frees a seat nor promotes anyone"""
+        self.book('first@test.com')
+        self.book('second@test.com')
+        self.book('third@test.com')
+        
+        second = Booking.objects.get(client__email='second@test.com')
+        response = self.client.post(reverse('cancel-booking', args=[second.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        self.assertEqual(Booking.objects.get(client__email='first@test.com').status, 'confirmed')
+        third = Booking.objects.get(client__email='third@test.com')
+        self.assertEqual(third.status, 'waitlisted')
+        self.assertEqual(third.waitlist_rank(), 1)
+        self.fitness_class.refresh_from_db()
+        self.assertEqual(self.fitness_class.current_bookings, 1)
+    
+    def test_full_class_can_refuse_waitlist(self):
+        """Test join_waitlist=false rejects a booking for a full class"""
+        self.book('first@test.com')
+        response = self.client.post(reverse('book-class'), {
+            'class_id': str(self.fitness_class.id),
+            'client_name': 'Test Client',
+            'client_email': 'second@test.com',
+            'join_waitlist': False
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('class_id', response.data['errors'])
+        self.assertFalse(Booking.objects.filter(client__email='second@test.com').exists())
+    
+    def test_waitlist_head_uses_index(self):
+        """Test the promotion head lookup is an index search, not a scan"""
+        plan = self.fitness_class.bookings.filter(status='waitlisted').order_by('waitlist_position')[:1].explain()
+        self.assertIn('booking_class_waitlist_idx', plan)
+        self.assertNotIn('TEMP B-TREE', plan)
+    
+    def test_booking_invalidates_cached_listing_for_its_date_only(self):
+        """Test class list cache is bumped on commit, scoped to the class date"""
+        cache.clear()
+        other_class = FitnessClass.objects.create(
+            class_type=self.class_type,
+            instructor=self.instructor,
+            datetime=self.fitness_class.datetime + timedelta(days=3),
+            max_capacity=5
+        )
+        class_date = timezone.localtime(self.fitness_class.datetime).date().isoformat()
+        other_date = timezone.localtime(other_class.datetime).date().isoformat()
+        url = reverse('class-list')
+        
+        self.client.get(url)
+        self.client.get(url, {'date': class_date})
+        self.client.get(url, {'date': other_date})
+        other_key = class_list_cache_key({'date': other_date})
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book('first@test.com')
+        
+        for params in ({}, {'date': class_date}):
+            response = self.client.get(url, params)
+            row = next(r for r in response.data['results'] if r['id'] == str(self.fitness_class.id))
+            self.assertEqual(row['available_slots'], 0)
+            self.assertFalse(row['is_bookable'])
+        # Listings for unrelated dates keep their namespace
+        self.assertEqual(class_list_cache_key({'date': other_date}), other_key)
+    
+    def test_listing_expires_when_a_class_passes_the_booking_cutoff(self):
+        """Test a cached listing lives only until one of its classes stops being bookable or starts"""
+        now = timezone.now()
+        with mock.patch('django.utils.timezone.now', return_value=now):
+            self.assertEqual(class_list_ttl([now + timedelta(days=2)]), CLASS_LIST_TTL)
+            self.assertEqual(class_list_ttl([now + timedelta(hours=2, seconds=30)]), 30)
+            # Past the cutoff, the class still leaves the listing when it starts
+            self.assertEqual(class_list_ttl([now + timedelta(seconds=90)]), 90)
+            self.assertEqual(class_list_ttl([]), CLASS_LIST_TTL)
+    
+    def test_instructor_and_class_type_edits_invalidate_listings(self):
+        """Test listings embedding an instructor or class type are bumped when those change"""
+        cache.clear()
+        class_date = timezone.localtime(self.fitness_class.datetime).date().isoformat()
+        self.client.get(reverse('class-list'))
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.instructor.name = 'Renamed Instructor'
+            self.instructor.save()
+        row = self.client.get(reverse('class-list')).data['results'][0]
+        self.assertEqual(row['instructor']['name'], 'Renamed Instructor')
+        
+        date_key = class_list_cache_key({'date': class_date})
+        with self.captureOnCommitCallbacks(execute=True):
+            self.class_type.description = 'Slower flow'
+            self.class_type.save()
+        self.assertNotEqual(class_list_cache_key({'date': class_date}), date_key)
+    
+    def test_booking_invalidates_listings_of_its_class_type_only(self):
+        """Test undated listings filtered by type are bumped only for the booked class's type"""
+        cache.clear()
+        other_type = ClassType.objects.create(
+            name='Spin', description='Indoor cycling', duration_minutes=45,
+            difficulty_level='advanced', calories_burn_estimate=400
+        )
+        own_type = {'type': self.class_type.name}
+        other_key = class_list_cache_key({'type': 'spin'})
+        own_key = class_list_cache_key(own_type)
+        self.client.get(reverse('class-list'), own_type)
+        
+        with self.captureOnCommitCallbacks(execute=True):
+            self.book('first@test.com')
+        
+        self.assertEqual(class_list_cache_key({'type': 'spin'}), other_key)
+        self.assertNotEqual(class_list_cache_key(own_type), own_key)
+        row = self.client.get(reverse('class-list'), own_type).data['results'][0]
+        self.assertEqual(row['available_slots'], 0)
+        
+        # Renaming a type changes what the filters match
+        with self.captureOnCommitCallbacks(execute=True):
+            other_type.name = 'Spin Cycle'
+            other_type.save()
+        self.assertNotEqual(class_list_cache_key({'type': 'spin'}), other_key)
+    
+    def test_booking_loads_class_and_duplicate_check_once(self):
+        """Test the booking path fetches the class and checks duplicates only once"""
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.book('first@test.com')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        
+        selects = [q['sql'] for q in ctx.captured_queries if q['sql'].startswith('SELECT')]
+        class_selects = [sql for sql in selects if 'FROM "bookings_fitnessclass"' in sql]
+        booking_selects = [sql for sql in selects if 'FROM "bookings_booking"' in sql]
+        self.assertEqual(len(class_selects), 1)
+        self.assertIn('"bookings_instructor"', class_selects[0])
+        self.assertIn('"bookings_classtype"', class_selects[0])
+        self.assertEqual(len(booking_selects), 1)
+
+class QueryBudgetTestCase(QueryBudgetMixin, APITestCase):
+    query_budgets = {
+        # A cold type= or difficulty= listing also resolves the matching class types
+        'class-list': 3,
+        'class-detail': 5,
+        'book-class': 16,
+        'get-bookings': 6,
+        'cancel-booking': 8,
+    }
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='member', password='pass12345')
+        self.client.force_authenticate(user=self.user)
+        
+        self.class_type = ClassType.objects.create(
+            name='Test Yoga',
+            description='Test yoga class',
+            duration_minutes=60,
+            difficulty_level='beginner',
+            calories_burn_estimate=200
+        )
+        self.classes = []
+        for i in range(5):
+            instructor = Instructor.objects.create(
+                name=f'Instructor {i}',
+                email=f'instructor{i}@test.com',
+                specializations=['Yoga']
+            )
+            self.classes.append(FitnessClass.objects.create(
+                class_type=self.class_type,
+                instructor=instructor,
+                datetime=timezone.now() + timedelta(days=i + 1),
+                max_capacity=20
+            ))
+    
+    def test_read_endpoints_stay_within_budget(self):
+        """Test class list, class detail and booking history query budgets"""
+        client = Client.objects.create(name='Test Client', email='client@test.com')
+        for fitness_class in self.classes:
+            Booking.objects.create(fitness_class=fitness_class, client=client)
+        
+        self.assertWithinQueryBudget(self.client.get(reverse('class-list')))
+        self.assertWithinQueryBudget(
+            self.client.get(reverse('class-detail', args=[self.classes[0].id]))
+        )
+        self.assertWithinQueryBudget(
+            self.client.get(reverse('get-bookings'), {'email': 'client@test.com'})
+        )
+    
+    def test_write_endpoints_stay_within_budget(self):
+        """Test booking and cancellation query budgets"""
+        response = self.client.post(reverse('book-class'), {
+            'class_id': str(self.classes[-1].id),
+            'client_name': 'Test Client',
+            'client_email': 'client@test.com'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertWithinQueryBudget(response)
+        
+        booking = Booking.objects.get(client__email='client@test.com')
+        response = self.client.post(reverse('cancel-booking', args=[booking.id]))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertWithinQueryBudget(response)
+    
+    def test_class_list_cursor_pagination(self):
+        """Test class list pages are stable, ordered and keep the metadata block"""
+        url = reverse('class-list')
+        response = self.client.get(url, {'page_size': 2})
+        self.assertIn('metadata', response.data)
+        self.assertEqual(response.data['metadata']['page_count'], 2)
+        self.assertNotIn('total_available_classes', response.data['metadata'])
+        
+        seen = [row['id'] for row in response.data['results']]
+        while response.data['next']:
+            response = self.client.get(response.data['next'])
+            seen.extend(row['id'] for row in response.data['results'])
+        
+        self.assertEqual(seen, [str(c.id) for c in self.classes])
+    
+    def test_booking_history_cursor_pagination(self):
+        """Test booking history is paginated newest first"""
+        client = Client.objects.create(name='Test Client', email='client@test.com')
+        for fitness_class in self.classes:
+            Booking.objects.create(fitness_class=fitness_class, client=client)
+        
+        url = reverse('get-bookings')
+        response = self.client.get(url, {'email': 'client@test.com', 'page_size': 3})
+        self.assertEqual(len(response.data['bookings']), 3)
+        self.assertIsNotNone(response.data['pagination']['next'])
+        self.assertWithinQueryBudget(response)
+        
+        second = self.client.get(response.data['pagination']['next'])
+        self.assertEqual(len(second.data['bookings']), 2)
+        self.assertIsNone(second.data['pagination']['next'])
+        ids = [b['id'] for b in response.data['bookings'] + second.data['bookings']]
+        expected = Booking.objects.order_by('-booking_datetime', '-id').values_list('id', flat=True)
+        self.assertEqual(ids, [str(i) for i in expected])
+    
+    def test_budget_overrun_fails(self):
+        """Test the helper fails when an endpoint goes over its budget"""
+        response = self.client.get(reverse('class-list'))
+        with self.assertRaises(AssertionError):
+            self.assertWithinQueryBudget(response, budget=0)
+
+class OutboxTestCase(TestCase):
+    
+    def setUp(self):
+        instructor = Instructor.objects.create(
+            name='Test Instructor',
+            email='instructor@test.com',
+            specializations=['Yoga']
+        )
+        class_type = ClassType.objects.create(
+            name='Test Yoga',
+            description='Test yoga class',
+            duration_minutes=60,
+            difficulty_level='beginner',
+            calories_burn_estimate=200
+        )
+        fitness_class = FitnessClass.objects.create(
+            class_type=class_type,
+            instructor=instructor,
+            datetime=timezone.now() + timedelta(days=1),
+            max_capacity=20
+        )
+        client = Client.objects.create(name='Test Client', email='client@test.com')
+        self.booking = Booking.objects.create(fitness_class=fitness_class, client=client)
+    
+    def test_drain_delivers_confirmation(self):
+        """Test queued confirmations are delivered by the worker"""
+        message = outbox.enqueue('booking_confirmation', {'booking_id': str(self.booking.id)})
+        
+        self.assertEqual(outbox.drain(), (1, 0))
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'sent')
+        self.assertIsNotNone(message.sent_at)
+        # Nothing left to claim
+        self.assertEqual(outbox.drain(), (0, 0))
+    
+    def test_confirmation_skipped_for_booking_cancelled_before_delivery(self):
+        """Test a booking cancelled while its confirmation was queued gets no confirmation"""
+        message = outbox.enqueue('booking_confirmation', {'booking_id': str(self.booking.id)})
+        self.assertTrue(self.booking.transition_to('cancelled'))
+        
+        with mock.patch('bookings.outbox.send_booking_confirmation') as send:
+            self.assertEqual(outbox.drain(), (1, 0))
+        send.assert_not_called()
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'sent')
+    
+    def test_failed_delivery_backs_off_then_gives_up(self):
+        """Test failures are retried with backoff and eventually marked failed"""
+        message = outbox.enqueue('unknown_topic', {})
+        
+        self.assertEqual(outbox.drain(max_attempts=2), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'pending')
+        self.assertEqual(message.attempts, 1)
+        self.assertGreater(message.available_at, timezone.now())
+        
+        # Not due yet, so the worker leaves it alone
+        self.assertEqual(outbox.drain(max_attempts=2), (0, 0))
+        
+        OutboxMessage.objects.filter(id=message.id).update(available_at=timezone.now())
+        self.assertEqual(outbox.drain(max_attempts=2), (0, 1))
+        message.refresh_from_db()
+        self.assertEqual(message.status, 'failed')
+    
+    def test_worker_with_expired_lease_does_not_overwrite_the_new_owner(self):
+        """Test a late outcome from a worker whose lease ran out is dropped"""
+        outbox.enqueue('booking_confirmation', {'booking_id': str(self.booking.id)})
+        [stale] = outbox.claim_batch(10)
+        
+        # The lease runs out and a second worker takes the message over and sends it
+        OutboxMessage.objects.filter(id=stale.id).update(available_at=timezone.now())
+        [current] = outbox.claim_batch(10)
+        self.assertTrue(outbox.deliver(current, max_attempts=5))
+        
+        # The first worker's handler finally fails; its result must not stick
+        with mock.patch('bookings.outbox.send_booking_confirmation', return_value=False):
+            self.assertFalse(outbox.deliver(stale, max_attempts=5))
+        current.refresh_from_db()
+        self.assertEqual(current.status, 'sent')
+        self.assertEqual(current.attempts, 1)
+
+class EndpointBenchmarkTestCase(TestCase):
+    
+    def test_benchmark_covers_every_endpoint_and_rolls_back(self):
+        """Test the endpoint benchmark reports each scenario without keeping its writes"""
+        call_command('seed_data', classes=40, clients=30, bookings=120, stdout=StringIO())
+        counts = (Booking.objects.count(), Client.objects.count(), User.objects.count())
+        output = StringIO()
+        
+        with tempfile.NamedTemporaryFile(suffix='.json') as report_file:
+            call_command(
+                'benchmark_endpoints', iterations=2, warmup=0, profile_iterations=1,
+                output=report_file.name, stdout=output
+            )
+            report = json.load(report_file)
+        
+        endpoints = report['endpoints']
+        self.assertEqual(len([name for name in endpoints if name.startswith('class-list')]), 32)
+        for name in ('class-detail', 'get-bookings', 'book-class', 'cancel-booking',
+                     'auth-register', 'auth-login', 'auth-profile', 'auth-logout'):
+            self.assertIn(name, endpoints)
+        for name, result in endpoints.items():
+            self.assertTrue(all(200 <= code < 400 for code in result['status_codes']), name)
+            self.assertGreaterEqual(result['p99_ms'], result['p50_ms'])
+            self.assertIn('queries_per_request', result)
+            self.assertIn('alloc_peak_kb', result)
+        self.assertEqual(
+            (Booking.objects.count(), Client.objects.count(), User.objects.count()), counts
+        )
+
+class BatchBookingAPITestCase(APITestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username='member', password='pass12345')
+        self.client.force_authenticate(user=self.user)
+        instructor = Instructor.objects.create(
+            name='Test Instructor',
+            email='instructor@test.com',
+            specializations=['Yoga']
+        )
+        class_type = ClassType.objects.create(
+            name='Vinyasa',
+            description='Vinyasa flow',
+            duration_minutes=60,
+            difficulty_level='intermediate',
+            calories_burn_estimate=250
+        )
+        self.start_date = timezone.localdate() + timedelta(days=2)
+        self.series = recurrence_datetimes(1, time(7, 0), 4, 'Asia/Kolkata', self.start_date)
+        self.classes = [
+            FitnessClass.objects.create(
+                class_type=class_type,
+                instructor=instructor,
+                datetime=start,
+                max_capacity=10
+            )
+            for start in self.series
+        ]
+        self.url = reverse('book-batch')
+    
+    def book(self, class_ids=None, **extra):
+        data = {'client_name': 'Series Client', 'client_email': 'series@test.com', **extra}
+        if class_ids is not None:
+            data['class_ids'] = [str(class_id) for class_id in class_ids]
+        return self.client.post(self.url, data, format='json')
+    
+    def test_books_every_class_in_one_request(self):
+        """Test a batch books each class and keeps every counter in step"""
+        response = self.book([c.id for c in self.classes[:3]])
+        
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([r['status'] for r in response.data['results']], ['booked'] * 3)
+        client = Client.objects.get(email='series@test.com')
+        self.assertEqual(client.total_bookings, 3)
+        self.assertEqual(ClientStats.objects.get(client=client).confirmed_bookings, 3)
+        self.assertEqual(OutboxMessage.objects.filter(topic='booking_confirmation').count(), 3)
+        self.assertEqual(
+            [FitnessClass.objects.get(id=c.id).current_bookings for c in self.classes],
+            [1, 1, 1, 0]
+        )
+    
+    def test_all_or_nothing_books_nothing_when_one_class_is_full(self):
+        """Test one unavailable class rolls back the whole all_or_nothing batch"""
+        FitnessClass.objects.filter(id=self.classes[1].id).update(current_bookings=10)
+        
+        response = self.book([c.id for c in self.classes[:3]])
+        
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual([r['status'] for r in response.data['results']], ['skipped', 'failed', 'skipped'])
+        self.assertEqual(response.data['results'][1]['reason'], 'This class is fully booked.')
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(FitnessClass.objects.get(id=self.classes[0].id).current_bookings, 0)
+    
+    def test_best_effort_books_what_is_available(self):
+        """Test best_effort books the available classes and reports the rest"""
+        FitnessClass.objects.filter(id=self.classes[1].id).update(current_bookings=10)
+        
+        response = self.book([c.id for c in self.classes[:3]], mode='best_effort')
+        
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([r['status'] for r in response.data['results']], ['booked', 'failed', 'booked'])
+        self.assertEqual(Booking.objects.filter(status='confirmed').count(), 2)
+    
+    def test_recurrence_resolves_weekly_series(self):
+        """Test a weekly pattern books each matching class and reports missing weeks"""
+        response = self.book(mode='best_effort', recurrence={
+            'class_type': 'vinyasa',
+            'weekday': 1,
+            'time': '07:00',
+            'weeks': 5,
+            'start_date': self.start_date.isoformat()
+        })
+        
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        results = response.data['results']
+        self.assertEqual([r['class_id'] for r in results[:4]], [str(c.id) for c in self.classes])
+        self.assertEqual(results[4]['status'], 'failed')
+        self.assertEqual(response.data['booked'], 4)
+    
+    def test_recurrence_with_missing_week_books_nothing_by_default(self):
+        """Test an all_or_nothing series is aborted when any week has no matching class"""
+        response = self.book(recurrence={
+            'class_type': 'vinyasa',
+            'weekday': 1,
+            'time': '07:00',
+            'weeks': 5,
+            'start_date': self.start_date.isoformat()
+        })
+        
+        self.assertEqual(response.status_code, status.HTTP_409_CONFLICT)
+        self.assertEqual([r['status'] for r in response.data['results']], ['skipped'] * 4 + ['failed'])
+        self.assertFalse(Booking.objects.exists())
+        self.assertEqual(sum(FitnessClass.objects.values_list('current_bookings', flat=True)), 0)
+    
+    def test_query_count_does_not_grow_with_batch_size(self):
+        """Test booking four classes costs the same queries as booking two"""
+        with CaptureQueriesContext(connection) as small:
+            self.book([c.id for c in self.classes[:2]])
+        Booking.objects.all().delete()
+        with CaptureQueriesContext(connection) as large:
+            self.book([c.id for c in self.classes], client_email='other@test.com')
+        self.assertEqual(len(small.captured_queries), len(large.captured_queries))
+    
+    def test_seat_lost_after_check_falls_back_per_class(self):
+        """Test a class filled between check and claim is reported, not overbooked"""
+        batch = BatchBooking(
+            {'name': 'Series Client', 'email': 'series@test.com'},
+            [(c.id, None, None) for c in self.classes[:3]],
+            mode='best_effort'
+        )
+        pending = batch.check()
+        FitnessClass.objects.filter(id=self.classes[1].id).update(current_bookings=10)
+        
+        claimed = batch.claim_seats(pending)
+        
+        self.assertEqual([c.id for c in claimed], [self.classes[0].id, self.classes[2].id])
+        self.assertEqual(batch.failures, {self.classes[1].id: 'This class is fully booked.'})
+        self.assertEqual(FitnessClass.objects.get(id=self.classes[1].id).current_bookings, 10)
+        self.assertEqual(FitnessClass.objects.get(id=self.classes[0].id).current_bookings, 1)
+
+class ClassCancellationTestCase(APITestCase):
+    
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username='admin', password='pass12345')
+        self.client.force_authenticate(user=self.admin)
+        self.instructor = Instructor.objects.create(
+            name='Sick Instructor',
+            email='instructor@test.com',
+            specializations=['Yoga']
+        )
+        self.class_type = ClassType.objects.create(
+            name='Test Yoga',
+            description='Test yoga class',
+            duration_minutes=60,
+            difficulty_level='beginner',
+            calories_burn_estimate=200
+        )
+        self.members = [
+            Client.objects.create(name=f'Member {i}', email=f'member{i}@test.com') for i in range(3)
+        ]
+    
+    def create_class(self, days, capacity=2):
+        return FitnessClass.objects.create(
+            class_type=self.class_type,
+            instructor=self.instructor,
+            datetime=timezone.now() + timedelta(days=days),
+            max_capacity=capacity
+        )
+    
+    def fill(self, fitness_class):
+        """Two confirmed bookings (one paid) and one waitlisted booking"""
+        for member, booking_status, payment in zip(
+            self.members, ['confirmed', 'confirmed', 'waitlisted'], ['paid', 'pending', 'pending']
+        ):
+            Booking.objects.create(
+                fitness_class=fitness_class, client=member,
+                status=booking_status, payment_status=payment
+            )
+        fitness_class.current_bookings = 2
+        fitness_class.save()
+    
+    def test_cancel_classes_cancels_and_notifies_every_booking(self):
+        """Test cancelling classes updates bookings, seats and stats and queues notices"""
+        classes = [self.create_class(days) for days in (1, 2)]
+        for fitness_class in classes:
+            self.fill(fitness_class)
+        
+        response = self.client.post(reverse('cancel-classes'), {
+            'class_ids': [str(c.id) for c in classes],
+            'reason': 'Instructor unwell'
+        }, format='json')
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual((response.data['classes_cancelled'], response.data['bookings_cancelled']), (2, 6))
+        self.assertEqual(set(FitnessClass.objects.values_list('status', 'current_bookings')), {('cancelled', 0)})
+        self.assertEqual(set(Booking.objects.values_list('status', flat=True)), {'cancelled'})
+        self.assertEqual(Booking.objects.filter(payment_status='refunded').count(), 2)
+        stats = ClientStats.objects.get(client=self.members[2])
+        self.assertEqual((stats.waitlisted_bookings, stats.cancelled_bookings), (0, 2))
+        stats = ClientStats.objects.get(client=self.members[0])
+        self.assertEqual((stats.confirmed_bookings, stats.cancelled_bookings), (0, 2))
+        # One notification message per class, naming each affected booking
+        messages = OutboxMessage.objects.filter(topic='class_cancelled')
+        self.assertEqual(messages.count(), 2)
+        self.assertEqual(sum(len(m.payload['booking_ids']) for m in messages), 6)
+        self.assertEqual(messages.first().payload['reason'], 'Instructor unwell')
+        self.assertEqual(outbox.drain(), (2, 0))
+    
+    def test_cancellation_counts_clients_without_stats_row(self):
+        """Test clients whose counters row is missing end up with counts from their bookings"""
+        fitness_class = self.create_class(1)
+        self.fill(fitness_class)
+        ClientStats.objects.filter(client=self.members[0]).delete()
+        
+        cancel_classes(FitnessClass.objects.filter(id=fitness_class.id), 'Instructor unwell')
+        
+        stats = ClientStats.objects.get(client=self.members[0])
+        self.assertEqual(
+            (stats.total_bookings, stats.confirmed_bookings, stats.cancelled_bookings), (1, 0, 1)
+        )
+        stats = ClientStats.objects.get(client=self.members[1])
+        self.assertEqual((stats.confirmed_bookings, stats.cancelled_bookings), (0, 1))
+    
+    def test_query_count_does_not_grow_with_fan_out(self):
+        """Test a week of classes is cancelled with the same statements as one class"""
+        single = self.create_class(1)
+        self.fill(single)
+        week = [self.create_class(days) for days in range(2, 9)]
+        for fitness_class in week:
+            self.fill(fitness_class)
+        
+        with CaptureQueriesContext(connection) as one:
+            cancel_classes(FitnessClass.objects.filter(id=single.id))
+        with CaptureQueriesContext(connection) as many:
+            cancel_classes(FitnessClass.objects.filter(id__in=[c.id for c in week]))
+        self.assertEqual(len(one.captured_queries), len(many.captured_queries))
+        self.assertEqual(Booking.objects.exclude(status='cancelled').count(), 0)
+    
+    def test_date_range_skips_classes_that_are_not_scheduled(self):
+        """Test a date range only cancels scheduled classes inside it"""
+        inside = self.create_class(1)
+        finished = self.create_class(2)
+        FitnessClass.objects.filter(id=finished.id).update(status='completed')
+        outside = self.create_class(10)
+        day = timezone.localdate(inside.datetime)
+        
+        response = self.client.post(reverse('cancel-classes'), {
+            'date_from': day.isoformat(),
+            'date_to': (day + timedelta(days=3)).isoformat()
+        }, format='json')
+        
+        self.assertEqual(response.data['classes_cancelled'], 1)
+        statuses = dict(FitnessClass.objects.values_list('id', 'status'))
+        self.assertEqual(
+            [statuses[inside.id], statuses[finished.id], statuses[outside.id]],
+            ['cancelled', 'completed', 'scheduled']
+        )
+        # A cancelled class can no longer hand out seats
+        self.assertFalse(FitnessClass.objects.get(id=inside.id).reserve_seat())
+    
+    def test_cancel_classes_requires_staff(self):
+        """Test members cannot cancel classes"""
+        member = User.objects.create_user(username='member', password='pass12345')
+        self.client.force_authenticate(user=member)
+        fitness_class = self.create_class(1)
+        response = self.client.post(reverse('cancel-classes'), {'class_ids': [str(fitness_class.id)]}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_403_FORBIDDEN)
+        self.assertEqual(FitnessClass.objects.get(id=fitness_class.id).status, 'scheduled')
+    
+    def test_admin_action_cancels_selected_classes(self):
+        """Test the admin action runs the same set-based cancellation"""
+        fitness_class = self.create_class(1)
+        self.fill(fitness_class)
+        self.client.force_login(self.admin)
+        
+        self.client.post(reverse('admin:bookings_fitnessclass_changelist'), {
+            'action': 'cancel_and_notify',
+            '_selected_action': [str(fitness_class.id)]
+        })
+        
+        self.assertEqual(FitnessClass.objects.get(id=fitness_class.id).status, 'cancelled')
+        self.assertEqual(len(OutboxMessage.objects.get(topic='class_cancelled').payload['booking_ids']), 3)
+
+class AvailabilitySnapshotTestCase(QueryBudgetMixin, APITestCase):
+    query_budgets = {'class-availability': 1}
+    
+    def setUp(self):
+        instructor = Instructor.objects.create(
+            name='Test Instructor',
+            email='instructor@test.com',
+            specializations=['Yoga']
+        )
+        class_type = ClassType.objects.create(
+            name='Test Yoga',
+            description='Test yoga class',
+            duration_minutes=60,
+            difficulty_level='beginner',
+            calories_burn_estimate=200
+        )
+        self.fitness_class = FitnessClass.objects.create(
+            class_type=class_type,
+            instructor=instructor,
+            datetime=timezone.now() + timedelta(days=1),
+            max_capacity=1
+        )
+        self.url = reverse('class-availability')
+    
+    def test_snapshot_is_compact_and_single_query(self):
+        """Test the snapshot carries only seat fields and costs one query"""
+        response = self.client.get(self.url)
+        
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertWithinQueryBudget(response)
+        self.assertEqual(response.data['classes'], [{
+            'id': str(self.fitness_class.id),
+            'available_slots': 1,
+            'is_bookable': True,
+            'status': 'scheduled',
+        }])
+        self.assertTrue(response['ETag'].startswith('"'))
+    
+    def test_matching_etag_returns_304_until_seats_change(self):
+        """Test polls revalidate to 304 until a returned value changes"""
+        etag = self.client.get(self.url)['ETag']
+        
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b'')
+        self.assertEqual(response['ETag'], etag)
+        
+        # Fields outside the snapshot do not change the ETag
+        FitnessClass.objects.filter(id=self.fitness_class.id).update(special_notes='Bring a mat')
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=etag).status_code, status.HTTP_304_NOT_MODIFIED)
+        
+        self.fitness_class.reserve_seat()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['classes'][0]['available_slots'], 0)
+        self.assertFalse(response.data['classes'][0]['is_bookable'])
+    
+    def test_rejects_inverted_range(self):
+        """Test date_to before date_from is a 400"""
+        response = self.client.get(self.url, {'date_from': '2030-01-10', 'date_to': '2030-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class AvailabilityStreamTestCase(TestCase):
+    def setUp(self):
+        instructor = Instructor.objects.create(
+            name='Test Instructor',
+            email='instructor@test.com',
+            specializations=['Yoga']
+        )
+        class_type = ClassType.objects.create(
+            name='Test Yoga',
+            description='Test yoga class',
+            duration_minutes=60,
+            difficulty_level='beginner',
+            calories_burn_estimate=200
+        )
+        self.fitness_class = FitnessClass.objects.create(
+            class_type=class_type,
+            instructor=instructor,
+            datetime=timezone.now() + timedelta(days=1),
+            max_capacity=1
+        )
+        self.url = reverse('availability-stream')
+    
+    def reserve(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.fitness_class.reserve_seat()
+    
+    def test_partial_hub_fails_when_created(self):
+        """Test a hub missing part of the transport cannot be instantiated"""
+        class SubscribeOnlyHub(BroadcastHub):
+            def subscribe(self, topics):
+                return None
+        
+        with self.assertRaises(TypeError):
+            SubscribeOnlyHub()
+    
+    def test_hub_delivers_across_threads_to_matching_topics(self):
+        """Test events published on another thread reach only matching subscribers"""
+        hub = InProcessHub()
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        
+        async def subscribe(*topics):
+            return hub.subscribe(topics)
+        
+        following = loop.run_until_complete(subscribe('class:a', 'date:2030-01-01'))
+        elsewhere = loop.run_until_complete(subscribe('class:b'))
+        hub.publish(['class:a', 'date:2030-01-01'], {'id': 'a'})
+        
+        self.assertEqual(loop.run_until_complete(following.get(timeout=1)), {'id': 'a'})
+        self.assertIsNone(loop.run_until_complete(following.get(timeout=0.01)))
+        self.assertIsNone(loop.run_until_complete(elsewhere.get(timeout=0.01)))
+        
+        following.close()
+        elsewhere.close()
+        self.assertFalse(hub.has_subscribers())
+    
+    def test_committed_seat_change_is_published(self):
+        """Test a reserved seat is pushed to class and date subscribers on commit"""
+        loop = asyncio.new_event_loop()
+        self.addCleanup(loop.close)
+        
+        async def subscribe(topic):
+            return get_hub().subscribe([topic])
+        
+        by_class = loop.run_until_complete(subscribe(class_topic(self.fitness_class.id)))
+        by_date = loop.run_until_complete(subscribe(date_topic(self.fitness_class.datetime)))
+        self.addCleanup(by_class.close)
+        self.addCleanup(by_date.close)
+        
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.fitness_class.reserve_seat()
+        # Nothing is sent before the transaction commits
+        self.assertIsNone(loop.run_until_complete(by_class.get(timeout=0.01)))
+        for callback in callbacks:
+            callback()
+        
+        expected = {
+            'id': str(self.fitness_class.id),
+            'available_slots': 0,
+            'is_bookable': False,
+            'status': 'scheduled',
+        }
+        self.assertEqual(loop.run_until_complete(by_class.get(timeout=1)), expected)
+        self.assertEqual(loop.run_until_complete(by_date.get(timeout=1)), expected)
+    
+    async def test_stream_sends_snapshot_then_changes(self):
+        """Test the stream opens with a snapshot and then relays committed changes"""
+        response = await self.async_client.get(self.url, {'classes': str(self.fitness_class.id)})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(b'retry:'))
+        snapshot = await anext(events)
+        self.assertTrue(snapshot.startswith(b'event: snapshot\n'))
+        self.assertIn(b'"available_slots":1', snapshot)
+        
+        await sync_to_async(self.reserve)()
+        change = await asyncio.wait_for(anext(events), timeout=1)
+        self.assertTrue(change.startswith(b'event: availability\n'))
+        self.assertIn(b'"available_slots":0', change)
+        
+        response.close()
+        self.assertFalse(get_hub().has_subscribers())
+    
+    async def test_stream_requires_a_valid_subscription(self):
+        """Test missing or malformed topics are rejected before streaming"""
+        self.assertEqual((await self.async_client.get(self.url)).status_code, 400)
+        self.assertEqual((await self.async_client.get(self.url, {'classes': 'not-a-uuid'})).status_code, 400)
+        self.assertEqual((await self.async_client.get(self.url, {'dates': '2030-13-01'})).status_code, 400)
+    
+    def test_stream_is_not_served_over_wsgi(self):
+        """Test a WSGI request is refused instead of buffering the stream and subscribing"""
+        response = self.client.get(self.url, {'classes': str(self.fitness_class.id)})
+        self.assertEqual(response.status_code, 501)
+        self.assertFalse(response.streaming)
+        self.assertFalse(get_hub().has_subscribers())
+
+
+class AsyncReadViewsTestCase(QueryBudgetMixin, TestCase):
+    query_budgets = QueryBudgetTestCase.query_budgets
+    
+    def setUp(self):
+        cache.clear()
+        instructor = Instructor.objects.create(
+            name='Test Instructor',
+            email='instructor@test.com',
+            specializations=['Yoga']
+        )
+        class_type = ClassType.objects.create(
+            name='Test Yoga',
+            description='Test yoga class',
+            duration_minutes=60,
+            difficulty_level='beginner',
+            calories_burn_estimate=200
+        )
+        self.classes = [
+            FitnessClass.objects.create(
+                class_type=class_type,
+                instructor=instructor,
+                datetime=timezone.now() + timedelta(days=day),
+                max_capacity=10
+            )
+            for day in range(1, 4)
+        ]
+        client = Client.objects.create(name='Test Client', email='client@test.com')
+        for fitness_class in self.classes:
+            Booking.objects.create(fitness_class=fitness_class, client=client)
+    
+    def payload(self, response):
+        data = response.json()
+        data.get('metadata', {}).pop('generated_at', None)
+        return data
+    
+    async def test_async_views_match_sync_views(self):
+        """Test the ASGI routes return the DRF views' payloads within the same budgets"""
+        requests = [
+            (reverse('class-list'), {'page_size': 2}),
+            (reverse('class-detail', args=[self.classes[0].id]), {}),
+            (reverse('get-bookings'), {'email': 'client@test.com'}),
+            (reverse('get-bookings'), {'email': 'client@test.com', 'status': 'cancelled'}),
+            (reverse('class-list'), {'fields': 'id,datetime,instructor', 'expand': ''}),
+            (reverse('get-bookings'), {'email': 'client@test.com', 'expand': 'fitness_class'}),
+            (reverse('get-bookings'), {'email': 'client@test.com', 'fields': 'nope'}),
+            (reverse('class-list'), {'normalize': 'true'}),
+            (reverse('class-list'), {'type': 'yoga', 'difficulty': 'beginner'}),
+            (reverse('get-bookings'), {'email': 'client@test.com', 'normalize': 'true'}),
+            (reverse('get-bookings'), {'email': 'nobody@test.com'}),
+            (reverse('get-bookings'), {}),
+        ]
+        for url, params in requests:
+            cache.clear()
+            expected = await sync_to_async(self.client.get)(url, params)
+            cache.clear()
+            with self.settings(ROOT_URLCONF='fitness_studio.asgi_urls'):
+                response = await self.async_client.get(url, params)
+            
+            self.assertEqual(response.status_code, expected.status_code, url)
+            self.assertEqual(self.payload(response), self.payload(expected), url)
+            if response.status_code == status.HTTP_200_OK:
+                self.assertWithinQueryBudget(response)
+                self.assertEqual(response.query_stats['query_count'], expected.query_stats['query_count'])
+
+
+class ServerBenchmarkTestCase(TransactionTestCase):
+    
+    def test_compares_wsgi_and_asgi_for_each_read_endpoint(self):
+        """Test the server benchmark drives both handlers and reports every endpoint"""
+        call_command('seed_data', classes=10, clients=5, bookings=20, stdout=StringIO())
+        
+        with tempfile.NamedTemporaryFile(suffix='.json') as report_file:
+            call_command(
+                'benchmark_servers', requests=4, concurrency=2, workers=2, client_delay_ms=0,
+                output=report_file.name, stdout=StringIO()
+            )
+            report = json.load(report_file)
+        
+        self.assertEqual(set(report['endpoints']), {'class-list', 'class-detail', 'get-bookings'})
+        for name, servers in report['endpoints'].items():
+            for server in ('wsgi', 'asgi'):
+                self.assertEqual(servers[server]['status_codes'], [200], (name, server))
+                self.assertEqual(servers[server]['iterations'], 4)
+                self.assertGreater(servers[server]['throughput_rps'], 0)
+
+
+class LocalTimeRenderingTestCase(TestCase):
+    def setUp(self):
+        class_type = ClassType.objects.create(
+            name='Test Yoga',
+            description='Test yoga class',
+            duration_minutes=60,
+            difficulty_level='beginner',
+            calories_burn_estimate=200
+        )
+        start = (timezone.now() + timedelta(days=1)).replace(minute=0, second=0, microsecond=0)
+        # Two instructors teaching in the same slot, a third an hour later
+        for number, offset in enumerate([0, 0, 1]):
+            FitnessClass.objects.create(
+                class_type=class_type,
+                instructor=Instructor.objects.create(
+                    name=f'Instructor {number}',
+                    email=f'instructor{number}@test.com',
+                    specializations=['Yoga']
+                ),
+                datetime=start + timedelta(hours=offset),
+                max_capacity=10
+            )
+    
+    def serialize(self, timezone_name):
+        request = RequestFactory().get('/')
+        request.user_timezone = timezone_name
+        classes = FitnessClass.objects.with_related().order_by('datetime', 'id')
+        return FitnessClassSerializer(classes, many=True, context={'request': request}).data
+    
+    def test_listing_renders_requester_local_time(self):
+        """Test listed start times are shown in the requester's timezone"""
+        tz = pytz.timezone('America/New_York')
+        for row in self.serialize('America/New_York'):
+            local_time = FitnessClass.objects.get(id=row['id']).datetime.astimezone(tz)
+            self.assertEqual(row['datetime_local'], {
+                'datetime': local_time.isoformat(),
+                'timezone': 'America/New_York',
+                'formatted': local_time.strftime('%Y-%m-%d %H:%M %Z')
+            })
+    
+    def test_unknown_timezone_header_falls_back_to_default(self):
+        """Test the middleware keeps valid X-Timezone values and replaces unknown ones"""
+        middleware = TimezoneMiddleware(lambda request: None)
+        for header, expected in (('Europe/London', 'Europe/London'), ('Mars/Olympus_Mons', 'Asia/Kolkata')):
+            request = RequestFactory().get('/', HTTP_X_TIMEZONE=header)
+            middleware.process_request(request)
+            self.assertEqual(request.user_timezone, expected)
+    
+    def test_each_distinct_start_time_is_rendered_once(self):
+        """Test a listing converts shared start times once and caches zone lookups"""
+        resolve_timezone.cache_clear()
+        rows = self.serialize('Europe/London')
+        
+        self.assertIs(rows[0]['datetime_local'], rows[1]['datetime_local'])
+        self.assertIsNot(rows[1]['datetime_local'], rows[2]['datetime_local'])
+        self.assertEqual(resolve_timezone.cache_info().misses, 1)
+
+
+class FastClassSerializerTestCase(TestCase):
+    def setUp(self):
+        call_command('seed_data', classes=30, clients=10, bookings=40, stdout=StringIO())
+        cache.clear()
+    
+    def render_both(self, timezone_name):
+        request = RequestFactory().get('/')
+        request.user_timezone = timezone_name
+        classes = list(FitnessClass.objects.with_related().order_by('datetime', 'id'))
+        drf = FitnessClassSerializer(classes, many=True, context={'request': request}).data
+        compiled = fitness_class_renderer.render(classes, {'request': request})
+        return JSONRenderer().render(drf), JSONRenderer().render(compiled)
+    
+    def test_compiled_output_is_byte_identical(self):
+        """Test the fast path renders exactly the JSON DRF does"""
+        for timezone_name in ('Asia/Kolkata', 'America/New_York', 'UTC'):
+            drf, compiled = self.render_both(timezone_name)
+            self.assertEqual(compiled, drf, timezone_name)
+    
+    def test_normalized_output_is_byte_identical(self):
+        """Test the fast path sideloads the same objects and ids as DRF"""
+        classes = list(FitnessClass.objects.with_related().order_by('datetime', 'id'))
+        outputs = []
+        for render in (
+            lambda context: FitnessClassSerializer(classes, many=True, context=context).data,
+            lambda context: fitness_class_renderer.render(classes, context),
+        ):
+            context = {'request': RequestFactory().get('/'), 'fieldset': Fieldset(normalize=True)}
+            rows = render(context)
+            outputs.append(JSONRenderer().render({'results': rows, **sideloaded_entities(context)}))
+        
+        self.assertIn(b'"instructors"', outputs[0])
+        self.assertEqual(outputs[1], outputs[0])
+    
+    def test_listing_payload_unchanged_when_switched_off(self):
+        """Test the class listing returns the same payload with or without the fast path"""
+        url = reverse('class-list')
+        fast = self.client.get(url).json()
+        cache.clear()
+        booking_settings = {**settings.BOOKING_SETTINGS, 'FAST_CLASS_SERIALIZER': False}
+        with self.settings(BOOKING_SETTINGS=booking_settings):
+            slow = self.client.get(url).json()
+        
+        self.assertTrue(fast['results'])
+        self.assertEqual(fast['results'], slow['results'])
+    
+    def test_benchmark_reports_speedup(self):
+        """Test the serializer benchmark checks parity and reports both timings"""
+        with tempfile.NamedTemporaryFile(suffix='.json') as report_file:
+            call_command('benchmark_serializers', classes=10, iterations=2, warmup=0,
+                         output=report_file.name, stdout=StringIO())
+            report = json.load(report_file)
+        
+        self.assertEqual(report['classes'], 10)
+        self.assertEqual(set(report['serializers']), {'drf', 'compiled'})
+        self.assertGreater(report['speedup_p50'], 0)
+
+
+class SparseFieldsetTestCase(QueryBudgetMixin, APITestCase):
+    query_budgets = QueryBudgetTestCase.query_budgets
+    
+    def setUp(self):
+        cache.clear()
+        self.instructor = Instructor.objects.create(
+            name='Test Instructor',
+            email='instructor@test.com',
+            specializations=['Yoga'],
+            bio='A long biography'
+        )
+        class_type = ClassType.objects.create(
+            name='Test Yoga',
+            description='Test yoga class',
+            duration_minutes=60,
+            difficulty_level='beginner',
+            calories_burn_estimate=200
+        )
+        client = Client.objects.create(name='Test Client', email='client@test.com')
+        for day in range(1, 4):
+            fitness_class = FitnessClass.objects.create(
+                class_type=class_type,
+                instructor=self.instructor,
+                datetime=timezone.now() + timedelta(days=day),
+                max_capacity=10,
+                special_notes='Bring a mat'
+            )
+            Booking.objects.create(fitness_class=fitness_class, client=client)
+    
+    def get_with_queries(self, url, params):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertWithinQueryBudget(response)
+        return response.json(), ' '.join(query['sql'] for query in queries.captured_queries)
+    
+    def test_class_list_renders_and_loads_only_requested_fields(self):
+        """Test ?fields= trims rows and the SELECT, and skipped nested objects are not joined"""
+        data, sql = self.get_with_queries(reverse('class-list'), {'fields': 'id,datetime,available_slots'})
+        
+        for row in data['results']:
+            self.assertEqual(set(row), {'id', 'datetime', 'available_slots'})
+        self.assertNotIn('special_notes', sql)
+        self.assertNotIn('bookings_instructor', sql)
+        self.assertNotIn('bookings_classtype', sql)
+    
+    def test_unexpanded_objects_render_as_ids(self):
+        """Test nested objects left out of ?expand= become ids without being loaded"""
+        data, sql = self.get_with_queries(reverse('class-list'), {'expand': 'class_type'})
+        
+        row = data['results'][0]
+        self.assertEqual(row['instructor'], str(self.instructor.id))
+        self.assertEqual(row['class_type']['name'], 'Test Yoga')
+        self.assertNotIn('bookings_instructor', sql)
+    
+    def test_booking_history_expands_nested_paths(self):
+        """Test dotted expand paths embed objects below the booking, collapsing the rest"""
+        params = {'email': 'client@test.com', 'fields': 'id,fitness_class,can_cancel',
+                  'expand': 'fitness_class.instructor'}
+        data, sql = self.get_with_queries(reverse('get-bookings'), params)
+        
+        booking = data['bookings'][0]
+        self.assertEqual(set(booking), {'id', 'fitness_class', 'can_cancel'})
+        self.assertEqual(booking['fitness_class']['instructor']['bio'], 'A long biography')
+        self.assertIsInstance(booking['fitness_class']['class_type'], str)
+        self.assertNotIn('special_requests', sql)
+        self.assertNotIn('JOIN "bookings_client"', sql)
+    
+    def test_unknown_fields_are_rejected(self):
+        """Test unknown field names and expand paths are reported as bad requests"""
+        for url, params in (
+            (reverse('class-list'), {'fields': 'id,bogus'}),
+            (reverse('class-list'), {'expand': 'client'}),
+            (reverse('get-bookings'), {'email': 'client@test.com', 'expand': 'fitness_class.room'}),
+        ):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST, params)
+            self.assertFalse(response.json()['success'])
+    
+    def test_normalized_class_list_carries_each_entity_once(self):
+        """Test ?normalize=true replaces embedded instructors and class types with ids and maps"""
+        embedded, _ = self.get_with_queries(reverse('class-list'), {})
+        cache.clear()
+        normalized, _ = self.get_with_queries(reverse('class-list'), {'normalize': 'true'})
+        
+        instructor_id = str(self.instructor.id)
+        for row in normalized['results']:
+            self.assertNotIn('instructor', row)
+            self.assertEqual(row['instructor_id'], instructor_id)
+        self.assertEqual(list(normalized['instructors']), [instructor_id])
+        self.assertEqual(normalized['instructors'][instructor_id], embedded['results'][0]['instructor'])
+        class_type = embedded['results'][0]['class_type']
+        self.assertEqual(normalized['class_types'], {class_type['id']: class_type})
+    
+    def test_normalized_booking_history(self):
+        """Test normalizing bookings sideloads the entities nested under each class"""
+        data, _ = self.get_with_queries(
+            reverse('get-bookings'), {'email': 'client@test.com', 'normalize': 'true'}
+        )
+        
+        fitness_class = data['bookings'][0]['fitness_class']
+        self.assertEqual(fitness_class['instructor_id'], str(self.instructor.id))
+        self.assertIn(fitness_class['class_type_id'], data['class_types'])
+        self.assertEqual(len(data['instructors']), 1)
+
+
+class CachedTokenAuthenticationTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(
+            username='member', email='member@test.com', password='Str0ng-Passw0rd!'
+        )
+        self.token = Token.objects.create(user=self.user)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+    
+    def get_profile(self):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('user-profile'))
+        auth_queries = [query for query in queries.captured_queries if 'authtoken_token' in query['sql']]
+        return response, auth_queries
+    
+    def test_cache_hit_skips_the_token_query(self):
+        """Test only the first request resolves the token in the database"""
+        response, auth_queries = self.get_profile()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(auth_queries), 1)
+        
+        response, auth_queries = self.get_profile()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.json()['user']['username'], 'member')
+        self.assertEqual(auth_queries, [])
+    
+    def test_login_does_not_revoke_the_new_token(self):
+        """Test requests right after logging in are served from the cache"""
+        self.client.credentials()
+        response = self.client.post(reverse('login'), {
+            'username': 'member', 'password': 'Str0ng-Passw0rd!'
+        }, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.client.logout()
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {response.json()['token']}")
+        
+        self.get_profile()
+        response, auth_queries = self.get_profile()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(auth_queries, [])
+    
+    def test_deploy_check_warns_about_a_per_process_token_cache(self):
+        """Test check --deploy flags a local-memory token cache, whose revocations stay in one worker"""
+        self.assertEqual([warning.id for warning in check_token_cache(None)], ['bookings.W001'])
+        with self.settings(CACHES={
+            **settings.CACHES, 'shared': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}
+        }):
+            self.assertEqual(check_token_cache(None), [])
+    
+    def test_logout_revokes_cached_token(self):
+        """Test a logged-out token stops working although it was cached"""
+        self.get_profile()
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(reverse('logout'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        
+        response, _ = self.get_profile()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+    
+    def test_deactivation_and_rotation_revoke_cached_token(self):
+        """Test saving the user or replacing the token takes effect on the next request"""
+        self.get_profile()
+        self.user.first_name = 'Renamed'
+        self.user.save()
+        response, auth_queries = self.get_profile()
+        self.assertEqual(response.json()['user']['first_name'], 'Renamed')
+        self.assertEqual(len(auth_queries), 1)
+        
+        self.user.is_active = False
+        self.user.save()
+        response, _ = self.get_profile()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        
+        self.user.is_active = True
+        self.user.save()
+        self.token.delete()
+        rotated = Token.objects.create(user=self.user)
+        response, _ = self.get_profile()
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {rotated.key}')
+        response, _ = self.get_profile()
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+
+class ThrottlingTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+    
+    def test_sqlite_store_counts_across_workers_and_rolls_windows(self):
+        """Test separate store instances share counters, and windows roll over to previous"""
+        with tempfile.TemporaryDirectory() as directory:
+            booking_settings = {**settings.BOOKING_SETTINGS, 'THROTTLE_STORE_PATH': f'{directory}/throttle.sqlite3'}
+            with self.settings(BOOKING_SETTINGS=booking_settings):
+                workers = [SQLiteThrottleStore(), SQLiteThrottleStore()]
+                hits = [workers[number % 2].hit('throttle_anon_1.2.3.4', 100, 60) for number in range(3)]
+                self.assertEqual(hits, [(1, 0), (2, 0), (3, 0)])
+                self.assertEqual(workers[1].hit('throttle_anon_1.2.3.4', 101, 60), (1, 3))
+                self.assertEqual(workers[0].hit('throttle_anon_1.2.3.4', 103, 60), (1, 0))
+                self.assertEqual(workers[0].hit('throttle_user_7', 103, 60), (1, 0))
+                workers[1].release('throttle_user_7', 103)
+                self.assertEqual(workers[0].hit('throttle_user_7', 103, 60), (1, 0))
+    
+    def test_booking_endpoints_have_their_own_budget(self):
+        """Test booking requests exhaust the booking scope without touching other endpoints"""
+        self.client.force_authenticate(User.objects.create_user(username='member', password='x'))
+        rates = {**BookingRateThrottle.THROTTLE_RATES, 'booking': '2/hour'}
+        with mock.patch.object(BookingRateThrottle, 'THROTTLE_RATES', rates):
+            codes = [self.client.post(reverse('book-class'), {}, format='json').status_code for _ in range(3)]
+            batch = self.client.post(reverse('book-batch'), {}, format='json')
+            listing = self.client.get(reverse('class-list'))
+        
+        self.assertEqual(codes, [status.HTTP_400_BAD_REQUEST] * 2 + [status.HTTP_429_TOO_MANY_REQUESTS])
+        self.assertEqual(batch.status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+        self.assertGreater(int(batch['Retry-After']), 0)
+        self.assertEqual(listing.status_code, status.HTTP_200_OK)
+    
+    def test_refused_retries_do_not_extend_the_lockout(self):
+        """Test a client retrying while throttled gets in once the window passes, as Retry-After said"""
+        self.client.force_authenticate(User.objects.create_user(username='member', password='x'))
+        rates = {**BookingRateThrottle.THROTTLE_RATES, 'booking': '2/min'}
+        start = 60.0 * 100000
+        
+        def book_at(seconds):
+            with mock.patch.object(BookingRateThrottle, 'timer', mock.Mock(return_value=start + seconds)):
+                return self.client.post(reverse('book-class'), {}, format='json')
+        
+        with mock.patch.object(BookingRateThrottle, 'THROTTLE_RATES', rates):
+            self.assertEqual([book_at(0).status_code, book_at(0).status_code], [status.HTTP_400_BAD_REQUEST] * 2)
+            refused = book_at(1)
+            for second in range(2, 60, 5):
+                self.assertEqual(book_at(second).status_code, status.HTTP_429_TOO_MANY_REQUESTS)
+            
+            retry_after = int(refused['Retry-After'])
+            self.assertEqual(book_at(1 + retry_after).status_code, status.HTTP_400_BAD_REQUEST)
+
+class TwoTierCacheTestCase(APITestCase):
+    def setUp(self):
+        cache.clear()
+        cache.reset_stats()
+    
+    def tier(self, **options):
+        # A private L1 (its own LOCATION key) over the shared L2
+        two_tier = TwoTierCache('shared', {'OPTIONS': options})
+        two_tier.layer = type(two_tier.layer)()
+        return two_tier
+    
+    def test_query_fingerprint_ignores_parameter_order(self):
+        """Test the listing key depends on the parameters, not on their order or the process"""
+        first = QueryDict('date=2030-01-06&fields=id,name&expand=')
+        second = QueryDict('expand=&fields=id,name&date=2030-01-06')
+        self.assertEqual(query_fingerprint(first), query_fingerprint(second))
+        # The views read a repeated parameter's last value, so its order matters
+        self.assertNotEqual(
+            query_fingerprint(QueryDict('available_only=true&available_only=false')),
+            query_fingerprint(QueryDict('available_only=false&available_only=true'))
+        )
+        self.assertEqual(
+            query_fingerprint(QueryDict('a=1&a=2&b=3')), query_fingerprint(QueryDict('b=3&a=1&a=2'))
+        )
+        self.assertEqual(query_fingerprint(first), query_fingerprint({'fields': 'id,name', 'date': '2030-01-06', 'expand': ''}))
+        self.assertNotEqual(query_fingerprint(first), query_fingerprint(QueryDict('date=2030-01-06&fields=id,name')))
+        self.assertEqual(class_list_cache_key(first), class_list_cache_key(second))
+    
+    def test_reads_fill_l1_and_writes_reach_l2(self):
+        """Test L1 serves repeated reads, and writes and increments never leave it behind L2"""
+        two_tier = self.tier()
+        two_tier.set('probe', {'seats': 3})
+        self.assertEqual(two_tier.l2.get('probe'), {'seats': 3})
+        with mock.patch.object(type(two_tier.l2), 'get', side_effect=AssertionError('L2 read')):
+            self.assertEqual(two_tier.get('probe'), {'seats': 3})
+        
+        two_tier.l2.set('counter', 1)
+        self.assertEqual(two_tier.get('counter'), 1)
+        self.assertEqual(two_tier.incr('counter'), 2)
+        self.assertEqual(two_tier.get('counter'), 2)
+        two_tier.delete('probe')
+        self.assertIsNone(two_tier.get('probe'))
+        self.assertEqual(two_tier.stats(), {
+            'l1_hits': 1, 'l1_misses': 3, 'l2_hits': 2, 'l2_misses': 1, 'l1_entries': 1
+        })
+    
+    def test_l1_is_bounded_and_short_lived(self):
+        """Test L1 evicts its least recently used entry and expires entries after L1_TIMEOUT"""
+        two_tier = self.tier(L1_MAX_ENTRIES=2, L1_TIMEOUT=5)
+        for key in ('a', 'b'):
+            two_tier.set(key, key)
+        two_tier.get('a')
+        two_tier.set('c', 'c')
+        self.assertEqual([key.split(':')[-1] for key in two_tier.layer.entries], ['a', 'c'])
+        
+        two_tier.l2.set('a', 'changed elsewhere')
+        self.assertEqual(two_tier.get('a'), 'a')
+        with mock.patch('bookings.cache_backends.time.monotonic', return_value=time_module.monotonic() + 6):
+            self.assertEqual(two_tier.get('a'), 'changed elsewhere')
+    
+    def test_version_bump_by_another_worker_shows_at_once(self):
+        """Test namespace versions are read from the shared tier, not from this process's L1"""
+        key = class_list_cache_key({})
+        self.assertEqual(class_list_cache_key({}), key)
+        # Another worker bumps the shared counter directly
+        caches['shared'].incr('cache_version:all')
+        self.assertNotEqual(class_list_cache_key({}), key)
+    
+    def test_has_key_and_touch_agree_across_tiers(self):
+        """Test a stored None counts as present, and touch() never leaves L1 outliving L2"""
+        two_tier = self.tier()
+        two_tier.set('nothing', None)
+        self.assertTrue(two_tier.has_key('nothing'))
+        self.assertFalse(two_tier.has_key('absent'))
+        
+        two_tier.set('probe', 'value')
+        self.assertTrue(two_tier.touch('probe', 0))
+        self.assertIsNone(two_tier.get('probe'))
+        self.assertFalse(two_tier.has_key('probe'))
+    
+    def test_stats_endpoint_is_for_staff(self):
+        """Test the counters are reported to admins only"""
+        self.client.get(reverse('class-list'))
+        self.client.get(reverse('class-list'))
+        self.client.force_authenticate(User.objects.create_user(username='member', password='x'))
+        self.assertEqual(self.client.get(reverse('cache-stats')).status_code, status.HTTP_403_FORBIDDEN)
+        
+        self.client.force_authenticate(User.objects.create_user(username='admin', password='x', is_staff=True))
+        response = self.client.get(reverse('cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertGreater(response.data['stats']['l1_hits'], 0)
@@ -0,0 +1,170 @@
+"""
+Request throttles on sliding-window counters in a store shared by workers.
+
+DRF's throttles keep every request timestamp of a client in the default
+cache, which is per process unless CACHES says otherwise. These keep two
+counters per client (this window and the previous one) in the store named
+by BOOKING_SETTINGS['THROTTLE_STORE'] and estimate the rate over the last
+window as previous * (share of it still in range) + current.
+
+Each check is a single atomic increment; a rejected attempt then gives its
+count back, so a client retrying while throttled is not locked out for longer.
+"""
+import os
+import sqlite3
+import threading
+from functools import lru_cache
+from django.conf import settings
+from django.core.cache import caches
+from django.core.signals import setting_changed
+from django.dispatch import receiver
+from django.utils.module_loading import import_string
+from rest_framework import throttling
+
+class ThrottleStore:
+    """Counters for throttle keys, one pair per key"""
+
+    def hit(self, key, window, duration):
+        """
+        Count a request for key in the window'th window of `duration`
+        seconds; returns (requests this window, requests last window)
+        """
+        raise NotImplementedError
+
+    def release(self, key, window):
+        """Take back a hit counted in window, for a request that was refused"""
+        raise NotImplementedError
+
+class SQLiteThrottleStore(ThrottleStore):
+    """
+    Counters in a SQLite file, shared by every worker process on the host.
+    Each hit is one upsert; rows of idle keys are pruned now and then.
+    """
+    PRUNE_EVERY = 1000
+
+    def __init__(self):
+        self.path = str(settings.BOOKING_SETTINGS.get('THROTTLE_STORE_PATH', 'throttle.sqlite3'))
+        self.local = threading.local()
+
+    def connection(self):
+        # One connection per thread, reopened in forked workers
+        if getattr(self.local, 'pid', None) != os.getpid():
+            connection = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            connection.execute('PRAGMA journal_mode=WAL')
+            connection.execute('PRAGMA synchronous=NORMAL')
+            connection.execute(
+                'CREATE TABLE IF NOT EXISTS throttle_counters ('
+                ' key TEXT PRIMARY KEY, window INTEGER NOT NULL,'
+                ' current INTEGER NOT NULL, previous INTEGER NOT NULL,'
+                ' expires REAL NOT NULL)'
+            )
+            self.local.connection, self.local.pid, self.local.hits = connection, os.getpid(), 0
+        return self.local.connection
+
+    def hit(self, key, window, duration):
+        connection = self.connection()
+        # SET expressions read the row as it was, so the window rolls over
+        # (current becomes previous) in the same statement that counts
+        current, previous = connection.execute(
+            'INSERT INTO throttle_counters (key, window, current, previous, expires)'
+            ' VALUES (:key, :window, 1, 0, :expires)'
+            ' ON CONFLICT (key) DO UPDATE SET'
+            '  current = CASE WHEN window = :window THEN current + 1 ELSE 1 END,'
+            '  previous = CASE WHEN window = :window THEN previous'
+            '   WHEN window = :window - 1 THEN current ELSE 0 END,'
+            '  window = :window, expires = :expires'
+            ' RETURNING current, previous',
+            {'key': key, 'window': window, 'expires': (window + 2) * duration}
+        ).fetchone()
+
+        self.local.hits += 1
+        if self.local.hits % self.PRUNE_EVERY == 0:
+            connection.execute('DELETE FROM throttle_counters WHERE expires < ?', (window * duration,))
+        return current, previous
+
+    def release(self, key, window):
+        self.connection().execute(
+            'UPDATE throttle_counters SET current = current - 1'
+            ' WHERE key = ? AND window = ? AND current > 0',
+            (key, window)
+        )
+
+class CacheThrottleStore(ThrottleStore):
+    """
+    Counters in a Django cache: shared with a networked backend, or the
+    in-process stand-in with LocMemCache (as in tests)
+    """
+
+    def __init__(self):
+        self.cache = caches[settings.BOOKING_SETTINGS.get('THROTTLE_CACHE', 'default')]
+
+    def hit(self, key, window, duration):
+        current_key = f'{key}:{window}'
+        self.cache.add(current_key, 0, duration * 2)
+        try:
+            current = self.cache.incr(current_key)
+        except ValueError:
+            # Evicted since the add(), or a cache that stores nothing
+            self.cache.set(current_key, 1, duration * 2)
+            current = 1
+        return current, self.cache.get(f'{key}:{window - 1}', 0)
+
+    def release(self, key, window):
+        try:
+            self.cache.decr(f'{key}:{window}')
+        except ValueError:
+            pass
+
+@lru_cache(maxsize=None)
+def get_store():
+    """The configured ThrottleStore, built once per process"""
+    return import_string(settings.BOOKING_SETTINGS.get(
+        'THROTTLE_STORE', 'bookings.throttling.SQLiteThrottleStore'
+    ))()
+
+@receiver(setting_changed)
+def reset_store(setting, **kwargs):
+    if setting == 'BOOKING_SETTINGS':
+        get_store.cache_clear()
+
+class SlidingWindowMixin:
+    """allow_request() and wait() for SimpleRateThrottle subclasses"""
+
+    def allow_request(self, request, view):
+        if self.rate is None:
+            return True
+
+        self.key = self.get_cache_key(request, view)
+        if self.key is None:
+            return True
+
+        window, offset = divmod(self.timer(), self.duration)
+        store = get_store()
+        self.current, self.previous = store.hit(self.key, int(window), self.duration)
+        self.elapsed = offset / self.duration
+        if self.previous * (1 - self.elapsed) + self.current <= self.num_requests:
+            return True
+        # Only allowed requests use up the budget
+        store.release(self.key, int(window))
+        self.current -= 1
+        return False
+
+    def wait(self):
+        """Seconds until the estimate leaves room for one more request"""
+        room = self.num_requests - 1
+        if self.current <= room:
+            # Only the previous window's share has to fade
+            fade = 1 - (room - self.current) / self.previous if self.previous else 0
+            return max(0, fade - self.elapsed) * self.duration
+        # This window's count has to move into the past and fade as well
+        return ((1 - self.elapsed) + (1 - room / self.current)) * self.duration
+
+class AnonRateThrottle(SlidingWindowMixin, throttling.AnonRateThrottle):
+    pass
+
+class UserRateThrottle(SlidingWindowMixin, throttling.UserRateThrottle):
+    pass
+
+class BookingRateThrottle(UserRateThrottle):
+    """Booking endpoints' own budget, per user (or per address when anonymous)"""
+    scope = 'booking'
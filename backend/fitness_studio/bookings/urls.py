@@ -4,10 +4,15 @@ from . import views
 urlpatterns = [
     # Existing booking endpoints
     path('classes/', views.ClassListView.as_view(), name='class-list'),
+    path('classes/availability/', views.get_class_availability, name='class-availability'),
+    path('classes/availability/stream/', views.stream_class_availability, name='availability-stream'),
+    path('classes/cancel/', views.cancel_fitness_classes, name='cancel-classes'),
     path('classes/<uuid:class_id>/', views.get_class_details, name='class-detail'),
     path('book/', views.book_class, name='book-class'),
+    path('book/batch/', views.book_batch, name='book-batch'),
     path('bookings/', views.get_bookings, name='get-bookings'),
     path('bookings/<uuid:booking_id>/cancel/', views.cancel_booking, name='cancel-booking'),
+    path('cache/stats/', views.get_cache_stats, name='cache-stats'),
     
     # Authentication endpoints (add these)
     path('auth/register/', views.register_user, name='register'),
@@ -1,8 +1,17 @@
 from django.core.mail import send_mail
 from django.conf import settings
+from django.core.cache import cache
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Count
 from django.utils import timezone
-from datetime import timedelta
+from datetime import datetime, timedelta
+from functools import lru_cache
+import hashlib
+import json
 import logging
+import pytz
+from asgiref.sync import sync_to_async
+from .cache import client_stats_cache_key, aclient_stats_cache_key, CLIENT_STATS_TTL
 
 logger = logging.getLogger('booking')
 
@@ -35,25 +44,151 @@ def send_booking_confirmation(booking):
         logger.error(f"Failed to send confirmation email: {e}")
         return False
 
-def generate_booking_stats(client):
-    """Generate booking statistics for a client"""
-    from .models import Booking
-    
+def send_class_cancellation(booking, reason=''):
+    """Tell a client the studio cancelled their class (mock implementation)"""
+    try:
+        subject = f"Class Cancelled - {booking.fitness_class.class_type.name}"
+        message = f"""
+        Hi {booking.client.name},
+        
+        Unfortunately your class has been cancelled{f': {reason}' if reason else '.'}
+        
+        Class: {booking.fitness_class.class_type.name}
+        Date & Time: {booking.fitness_class.datetime.strftime('%Y-%m-%d %H:%M')}
+        Booking Reference: {booking.booking_reference}
+        
+        Any payment will be refunded. We hope to see you at another class soon.
+        
+        Best regards,
+        FitStudio Team
+        """
+        
+        # In a real application, you would send actual emails
+        logger.info(f"Cancellation email sent to {booking.client.email}")
+        return True
+        
+    except Exception as e:
+        logger.error(f"Failed to send cancellation email: {e}")
+        return False
+
+def _derived_stats_queries(client, favorites_limit):
+    """Querysets behind the cached part of the statistics: (upcoming, favourites)"""
     bookings = client.bookings.all()
-    
+    upcoming = bookings.filter(
+        status='confirmed',
+        fitness_class__datetime__gte=timezone.now()
+    )
+    # Top-N class types ranked by how often the client booked them
+    favorites = (
+        bookings.values('fitness_class__class_type__name')
+        .annotate(times_booked=Count('id'))
+        .order_by('-times_booked', 'fitness_class__class_type__name')
+        .values_list('fitness_class__class_type__name', flat=True)[:favorites_limit]
+    )
+    return upcoming, favorites
+
+def _booking_stats(client, client_stats, derived):
     return {
-        'total_bookings': bookings.count(),
-        'confirmed_bookings': bookings.filter(status='confirmed').count(),
-        'completed_bookings': bookings.filter(status='completed').count(),
-        'cancelled_bookings': bookings.filter(status='cancelled').count(),
-        'upcoming_bookings': bookings.filter(
-            status='confirmed',
-            fitness_class__datetime__gte=timezone.now()
-        ).count(),
-        'favorite_class_types': list(
-            bookings.values_list('fitness_class__class_type__name', flat=True)
-            .distinct()[:3]
-        ),
+        'total_bookings': client_stats.total_bookings,
+        'confirmed_bookings': client_stats.confirmed_bookings,
+        'completed_bookings': client_stats.completed_bookings,
+        'cancelled_bookings': client_stats.cancelled_bookings,
+        **derived,
         'member_since': client.created_at.strftime('%Y-%m-%d'),
         'membership_tier': client.membership_tier
     }
+
+def generate_booking_stats(client, favorites_limit=3):
+    """
+    Generate booking statistics for a client.
+    Counters are read from the ClientStats row (a primary-key lookup). The
+    time-dependent upcoming count and the favourites ranking are computed
+    and cached per client until one of the client's bookings changes.
+    """
+    from .models import ClientStats
+    
+    client_stats = ClientStats.objects.filter(client_id=client.id).first()
+    if client_stats is None:
+        # Client predates the materialization; build its row on first read
+        client_stats, = ClientStats.rebuild([client.id])
+    
+    cache_key = client_stats_cache_key(client.id)
+    derived = cache.get(cache_key)
+    
+    if derived is None:
+        upcoming, favorites = _derived_stats_queries(client, favorites_limit)
+        derived = {
+            'upcoming_bookings': upcoming.count(),
+            'favorite_class_types': list(favorites),
+        }
+        cache.set(cache_key, derived, CLIENT_STATS_TTL)
+    
+    return _booking_stats(client, client_stats, derived)
+
+async def agenerate_booking_stats(client, favorites_limit=3):
+    """generate_booking_stats for async views, through the async ORM and cache APIs"""
+    from .models import ClientStats
+    
+    client_stats = await ClientStats.objects.filter(client_id=client.id).afirst()
+    if client_stats is None:
+        client_stats, = await sync_to_async(ClientStats.rebuild)([client.id])
+    
+    cache_key = await aclient_stats_cache_key(client.id)
+    derived = await cache.aget(cache_key)
+    
+    if derived is None:
+        upcoming, favorites = _derived_stats_queries(client, favorites_limit)
+        derived = {
+            'upcoming_bookings': await upcoming.acount(),
+            'favorite_class_types': [name async for name in favorites],
+        }
+        await cache.aset(cache_key, derived, CLIENT_STATS_TTL)
+    
+    return _booking_stats(client, client_stats, derived)
+
+@lru_cache(maxsize=256)
+def resolve_timezone(name):
+    """
+    tzinfo for an IANA name, or None when unknown. Bounded so arbitrary
+    X-Timezone headers cannot grow the cache without limit.
+    """
+    try:
+        return pytz.timezone(name)
+    except pytz.exceptions.UnknownTimeZoneError:
+        return None
+
+def local_time_payload(value, tz=None):
+    """The datetime_local block for an aware datetime shown in tz (UTC when None)"""
+    if tz is None:
+        return {
+            'datetime': value.isoformat(),
+            'timezone': 'UTC',
+            'formatted': value.strftime('%Y-%m-%d %H:%M UTC')
+        }
+    local_time = value.astimezone(tz)
+    return {
+        'datetime': local_time.isoformat(),
+        'timezone': str(tz),
+        'formatted': local_time.strftime('%Y-%m-%d %H:%M %Z')
+    }
+
+def local_time_payloads(values, tz=None):
+    """
+    local_time_payload for many datetimes in one pass. Classes start on a
+    handful of distinct slots, so each distinct value is converted once.
+    """
+    return {value: local_time_payload(value, tz) for value in set(values)}
+
+def date_range_bounds(date_from, date_to):
+    """
+    Aware [start, end) datetimes covering whole days date_from..date_to, so
+    range filters compare the raw column and can use the datetime indexes
+    """
+    start = timezone.make_aware(datetime.combine(date_from, datetime.min.time()))
+    end = timezone.make_aware(datetime.combine(date_to + timedelta(days=1), datetime.min.time()))
+    return start, end
+
+def strong_etag(data):
+    """Quoted ETag derived from the canonical JSON encoding of data"""
+    encoded = json.dumps(data, sort_keys=True, separators=(',', ':'), cls=DjangoJSONEncoder)
+    return '"%s"' % hashlib.sha256(encoded.encode()).hexdigest()[:32]
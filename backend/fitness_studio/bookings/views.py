@@ -1,18 +1,23 @@
 from rest_framework import generics, status
 from rest_framework.decorators import api_view, throttle_classes
 from rest_framework.response import Response
-from rest_framework.throttling import AnonRateThrottle
+from .throttling import AnonRateThrottle, BookingRateThrottle
 from django.utils import timezone
-from django.db import transaction
+from django.db import IntegrityError, transaction
 from django.shortcuts import get_object_or_404
 from django.core.cache import cache
+from django.utils.cache import patch_cache_control
+from django.utils.http import parse_etags
+from django.http import JsonResponse, StreamingHttpResponse, HttpResponseNotAllowed
+from django.core.handlers.asgi import ASGIRequest
+from asgiref.sync import sync_to_async
 from datetime import timedelta
 from django.contrib.auth import authenticate, login, logout
 from django.contrib.auth.models import User
 from rest_framework.authtoken.models import Token
 from rest_framework.permissions import AllowAny
 from rest_framework.decorators import api_view, permission_classes
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import IsAuthenticated, IsAdminUser
 from django.contrib.auth.password_validation import validate_password
 from django.core.exceptions import ValidationError
 from django.db import models
@@ -20,108 +25,184 @@ import json
 import logging
 from .models import FitnessClass, Booking, Client, Instructor, ClassType
 from .serializers import (
-    FitnessClassSerializer, BookingCreateSerializer, 
-    BookingSerializer, ClientSerializer
+    FitnessClassSerializer, BookingCreateSerializer, BatchBookingSerializer,
+    BookingSerializer, ClientSerializer, ClassCancellationSerializer,
+    AvailabilityQuerySerializer, AvailabilityStreamSerializer, FieldsetQuerySerializer
 )
-from .utils import send_booking_confirmation, generate_booking_stats
+from .utils import generate_booking_stats, date_range_bounds, strong_etag
+from .outbox import enqueue
+from .loaders import BookingLoader
+from .batch import BatchBooking, DUPLICATE_BOOKING, recurrence_datetimes, resolve_recurrence
+from .cancellation import cancel_classes
+from .cache import class_list_cache_key, class_list_ttl
+from .streaming import (
+    get_hub, availability_events, class_topic, date_topic, EventStream
+)
+from .pagination import ClassCursorPagination, BookingCursorPagination, ordering_columns
+from .fieldsets import load_fields, sideloaded_entities
+from .fast_serializers import serialize_classes
 
 logger = logging.getLogger('booking')
 
+def upcoming_classes(params, serializer):
+    """
+    Upcoming scheduled classes narrowed by the class listing's query
+    parameters, loading only what the bound serializer renders
+    """
+    queryset = FitnessClass.objects.filter(
+        datetime__gte=timezone.now(),
+        status='scheduled'
+    )
+    
+    # Filtering
+    class_type = params.get('type')
+    instructor = params.get('instructor')
+    date = params.get('date')
+    difficulty = params.get('difficulty')
+    available_only = params.get('available_only', 'false').lower() == 'true'
+    
+    if class_type:
+        queryset = queryset.filter(class_type__name__icontains=class_type)
+    
+    if instructor:
+        queryset = queryset.filter(instructor__name__icontains=instructor)
+        
+    if date:
+        queryset = queryset.filter(datetime__date=date)
+        
+    if difficulty:
+        queryset = queryset.filter(class_type__difficulty_level=difficulty)
+        
+    if available_only:
+        queryset = queryset.filter(current_bookings__lt=models.F('max_capacity'))
+    
+    return load_fields(queryset, serializer, ordering_columns(ClassCursorPagination))
+
+def class_list_metadata(params, results_count):
+    # Listings are cursor-paginated, so only the length of this page is known;
+    # 'page_count' replaces 'total_available_classes' rather than reusing it
+    return {
+        'page_count': results_count,
+        'generated_at': timezone.now().isoformat(),
+        'filters_applied': {
+            'type': params.get('type'),
+            'instructor': params.get('instructor'),
+            'date': params.get('date'),
+            'difficulty': params.get('difficulty'),
+            'available_only': params.get('available_only', 'false')
+        }
+    }
+
+def booking_history(client, params, serializer):
+    """A client's bookings, newest first, loaded for the bound BookingSerializer"""
+    bookings = Booking.objects.filter(client=client).order_by('-booking_datetime')
+    
+    # Filter by status if requested
+    status_filter = params.get('status')
+    if status_filter:
+        bookings = bookings.filter(status=status_filter)
+    return load_fields(bookings, serializer, ordering_columns(BookingCursorPagination))
+
+def invalid_fieldset(query):
+    return {
+        'success': False,
+        'message': 'Invalid fields or expand parameter',
+        'errors': query.errors
+    }
+
+def recent_booking_details(bookings):
+    return [
+        {
+            'client_name': booking.client.name, 
+            'booking_time': booking.booking_datetime.isoformat(),
+            'booking_reference': booking.booking_reference
+        }
+        for booking in bookings
+    ]
+
 class ClassListView(generics.ListAPIView):
     """
     GET /api/classes
     Returns upcoming fitness classes with filtering and search
     """
     serializer_class = FitnessClassSerializer
+    pagination_class = ClassCursorPagination
+    fieldset = None
+    serializer_context = None
+    listed = ()
+    
+    def get_serializer_context(self):
+        # One context per request: the queryset's serializer and the page's
+        # share the local time memo and the sideloaded objects
+        if self.serializer_context is None:
+            self.serializer_context = super().get_serializer_context()
+            self.serializer_context['fieldset'] = self.fieldset
+        return self.serializer_context
     
     def get_queryset(self):
-        queryset = FitnessClass.objects.filter(
-            datetime__gte=timezone.now(),
-            status='scheduled'
-        ).select_related('instructor', 'class_type')
-        
-        # Filtering
-        class_type = self.request.query_params.get('type')
-        instructor = self.request.query_params.get('instructor')
-        date = self.request.query_params.get('date')
-        difficulty = self.request.query_params.get('difficulty')
-        available_only = self.request.query_params.get('available_only', 'false').lower() == 'true'
-        
-        if class_type:
-            queryset = queryset.filter(class_type__name__icontains=class_type)
-        
-        if instructor:
-            queryset = queryset.filter(instructor__name__icontains=instructor)
-            
-        if date:
-            queryset = queryset.filter(datetime__date=date)
-            
-        if difficulty:
-            queryset = queryset.filter(class_type__difficulty_level=difficulty)
-            
-        if available_only:
-            queryset = queryset.filter(current_bookings__lt=models.F('max_capacity'))
-        
-        return queryset
+        return upcoming_classes(self.request.query_params, self.get_serializer())
+    
+    def list_page(self):
+        """ListAPIView.list() with rows rendered through the class listing fast path"""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            self.listed = page
+            return self.get_paginated_response(serialize_classes(page, self.get_serializer_context()))
+        self.listed = queryset
+        return Response(serialize_classes(queryset, self.get_serializer_context()))
     
     def list(self, request, *args, **kwargs):
-        # Add caching for better performance
-        cache_key = f"classes_list_{hash(str(request.GET))}"
+        query = FieldsetQuerySerializer(
+            data=request.query_params, context={'serializer_class': FitnessClassSerializer}
+        )
+        if not query.is_valid():
+            return Response(invalid_fieldset(query), status=status.HTTP_400_BAD_REQUEST)
+        self.fieldset = query.validated_data['fieldset']
+        
+        # Versioned namespace: bookings and class changes bump it on commit
+        cache_key = class_list_cache_key(request.query_params)
         cached_response = cache.get(cache_key)
         
         if cached_response:
             return Response(cached_response)
         
-        response = super().list(request, *args, **kwargs)
+        response = self.list_page()
         
         # Fix: Handle both paginated and non-paginated responses
         if isinstance(response.data, dict) and 'results' in response.data:
             # Paginated response
             results_count = len(response.data['results'])
-            response.data['metadata'] = {
-                'total_available_classes': results_count,
-                'generated_at': timezone.now().isoformat(),
-                'filters_applied': {
-                    'type': request.query_params.get('type'),
-                    'instructor': request.query_params.get('instructor'),
-                    'date': request.query_params.get('date'),
-                    'difficulty': request.query_params.get('difficulty'),
-                    'available_only': request.query_params.get('available_only', 'false')
-                }
-            }
+            response.data['metadata'] = class_list_metadata(request.query_params, results_count)
         else:
             # Non-paginated response (list)
             results_count = len(response.data) if response.data else 0
             # Convert to dict format with results and metadata
             response.data = {
                 'results': response.data,
-                'metadata': {
-                    'total_available_classes': results_count,
-                    'generated_at': timezone.now().isoformat(),
-                    'filters_applied': {
-                        'type': request.query_params.get('type'),
-                        'instructor': request.query_params.get('instructor'),
-                        'date': request.query_params.get('date'),
-                        'difficulty': request.query_params.get('difficulty'),
-                        'available_only': request.query_params.get('available_only', 'false')
-                    }
-                }
+                'metadata': class_list_metadata(request.query_params, results_count)
             }
+        # Normalized mode: instructors and class types once, beside the rows
+        response.data.update(sideloaded_entities(self.get_serializer_context()))
         
-        # Cache for 5 minutes
-        cache.set(cache_key, response.data, 300)
+        # Changes orphan the entry through version bumps; the clock expires it
+        cache.set(cache_key, response.data, class_list_ttl(c.datetime for c in self.listed))
         
         logger.info(f"Classes listed: {results_count} classes returned")
         return response
 
 @api_view(['POST'])
-@throttle_classes([AnonRateThrottle])
+@throttle_classes([AnonRateThrottle, BookingRateThrottle])
 def book_class(request):
     """
     POST /api/book
     Create a new booking for a fitness class
     """
-    serializer = BookingCreateSerializer(data=request.data)
+    loader = BookingLoader.for_request(request)
+    serializer = BookingCreateSerializer(
+        data=request.data,
+        context={'request': request, 'loader': loader}
+    )
     
     if not serializer.is_valid():
         logger.warning(f"Invalid booking request: {serializer.errors}")
@@ -147,51 +228,74 @@ def book_class(request):
                 defaults=client_data
             )
             
-            # Get fitness class
-            fitness_class = get_object_or_404(FitnessClass, id=serializer.validated_data['class_id'])
+            # Get fitness class (already loaded during validation)
+            fitness_class = loader.get_fitness_class(serializer.validated_data['class_id'])
+            if fitness_class is None:
+                return Response({
+                    'success': False,
+                    'message': 'Class not found'
+                }, status=status.HTTP_404_NOT_FOUND)
             
-            # Check if client already has a booking for this class
-            existing_booking = Booking.objects.filter(
-                fitness_class=fitness_class,
-                client=client,
-                status__in=['confirmed', 'waitlisted']
-            ).first()
+            # The duplicate check ran during validation; a concurrent request
+            # that got in since then is caught by unique_together below
             
-            if existing_booking:
+            # Double-check availability (race condition protection)
+            if not fitness_class.is_open_for_booking:
                 return Response({
                     'success': False,
-                    'message': 'You already have a booking for this class'
+                    'message': 'Class is no longer available for booking'
                 }, status=status.HTTP_409_CONFLICT)
-            
-            # Double-check availability (race condition protection)
-            if not fitness_class.is_bookable:
+
+            # Claim the seat with a single conditional UPDATE so concurrent
+            # requests can never push current_bookings past max_capacity;
+            # when the class is full the client joins the back of the waitlist
+            waitlisted = not fitness_class.reserve_seat()
+            if waitlisted and serializer.validated_data['join_waitlist']:
+                # reserve_seat also fails for a class cancelled since validation;
+                # only a scheduled class has a waitlist. The row lock keeps a
+                # cancellation from slipping in before the waitlist entry exists
+                fitness_class.status = FitnessClass.objects.select_for_update().values_list(
+                    'status', flat=True
+                ).get(pk=fitness_class.pk)
+            if waitlisted and not (serializer.validated_data['join_waitlist'] and fitness_class.status == 'scheduled'):
                 return Response({
                     'success': False,
                     'message': 'Class is no longer available for booking'
                 }, status=status.HTTP_409_CONFLICT)
-            
+
             # Create booking
             booking = Booking.objects.create(
                 fitness_class=fitness_class,
                 client=client,
                 special_requests=serializer.validated_data.get('special_requests', ''),
-                status='confirmed',
+                status='waitlisted' if waitlisted else 'confirmed',
+                waitlist_position=fitness_class.next_waitlist_position() if waitlisted else None,
                 payment_status='pending'
             )
-            
-            # Update class booking count
-            fitness_class.current_bookings += 1
-            fitness_class.save()
-            
+
             # Update client total bookings
+            Client.objects.filter(pk=client.pk).update(
+                total_bookings=models.F('total_bookings') + 1
+            )
             client.total_bookings += 1
-            client.save()
             
-            # Send confirmation (in real app, this would be async)
-            try:
-                send_booking_confirmation(booking)
-            except Exception as e:
-                logger.error(f"Failed to send confirmation email: {e}")
+            if waitlisted:
+                logger.info(f"Waitlisted: {booking.booking_reference} for {client.email}")
+                return Response({
+                    'success': True,
+                    'message': 'Class is full; you have been added to the waitlist',
+                    'booking': {
+                        'id': str(booking.id),
+                        'reference': booking.booking_reference,
+                        'class_name': fitness_class.class_type.name,
+                        'datetime': fitness_class.datetime.isoformat(),
+                        'status': booking.status,
+                        'waitlist_position': booking.waitlist_rank()
+                    }
+                }, status=status.HTTP_202_ACCEPTED)
+            
+            # Queue the confirmation in this transaction; drain_outbox sends it
+            enqueue('booking_confirmation', {'booking_id': str(booking.id)})
             
             logger.info(f"New booking created: {booking.booking_reference} for {client.email}")
             
@@ -210,6 +314,13 @@ def book_class(request):
                 }
             }, status=status.HTTP_201_CREATED)
             
+    except IntegrityError:
+        # The seat claim rolled back with the duplicate insert
+        return Response({
+            'success': False,
+            'message': 'Invalid booking data',
+            'errors': {'non_field_errors': [DUPLICATE_BOOKING]}
+        }, status=status.HTTP_400_BAD_REQUEST)
     except Exception as e:
         logger.error(f"Booking creation failed: {e}")
         return Response({
@@ -217,6 +328,70 @@ def book_class(request):
             'message': 'An error occurred while processing your booking'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@throttle_classes([AnonRateThrottle, BookingRateThrottle])
+def book_batch(request):
+    """
+    POST /api/book/batch
+    Book several classes, given as class_ids or a weekly recurrence, in one
+    transaction. mode=all_or_nothing books everything or nothing;
+    mode=best_effort books whatever is available. Returns one result per class.
+    """
+    serializer = BatchBookingSerializer(data=request.data)
+    if not serializer.is_valid():
+        logger.warning(f"Invalid batch booking request: {serializer.errors}")
+        return Response({
+            'success': False,
+            'message': 'Invalid booking data',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    if 'recurrence' in data:
+        recurrence = data['recurrence']
+        datetimes = recurrence_datetimes(
+            recurrence['weekday'], recurrence['time'], recurrence['weeks'],
+            data['timezone'], recurrence.get('start_date')
+        )
+        matches = resolve_recurrence(recurrence['class_type'], datetimes, recurrence.get('instructor'))
+        items = [
+            (matches.get(start), start, None if start in matches else 'No matching class is scheduled at this time.')
+            for start in datetimes
+        ]
+    else:
+        items = [(class_id, None, None) for class_id in data['class_ids']]
+    
+    client_data = {'name': data['client_name'], 'email': data['client_email']}
+    if data.get('phone'):
+        client_data['phone'] = data['phone']
+    
+    try:
+        batch = BatchBooking(client_data, items, data['mode'], data.get('special_requests', ''))
+        results = batch.run()
+    except Exception as e:
+        logger.error(f"Batch booking failed: {e}")
+        return Response({
+            'success': False,
+            'message': 'An error occurred while processing your booking'
+        }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+    
+    booked = batch.booked_count
+    logger.info(f"Batch booking for {client_data['email']}: {booked} of {len(items)} booked")
+    
+    if booked == len(items):
+        response_status, message = status.HTTP_201_CREATED, 'All bookings confirmed successfully!'
+    elif booked:
+        response_status, message = status.HTTP_207_MULTI_STATUS, f'{booked} of {len(items)} classes booked'
+    else:
+        response_status, message = status.HTTP_409_CONFLICT, 'No classes were booked'
+    return Response({
+        'success': booked > 0,
+        'message': message,
+        'mode': data['mode'],
+        'booked': booked,
+        'results': results
+    }, status=response_status)
+
 @api_view(['GET'])
 def get_bookings(request):
     """
@@ -231,28 +406,34 @@ def get_bookings(request):
             'message': 'Email parameter is required'
         }, status=status.HTTP_400_BAD_REQUEST)
     
+    query = FieldsetQuerySerializer(
+        data=request.query_params, context={'serializer_class': BookingSerializer}
+    )
+    if not query.is_valid():
+        return Response(invalid_fieldset(query), status=status.HTTP_400_BAD_REQUEST)
+    context = {'request': request, 'fieldset': query.validated_data['fieldset']}
+    
     try:
         client = get_object_or_404(Client, email=email)
-        bookings = Booking.objects.filter(client=client).select_related(
-            'fitness_class__instructor', 
-            'fitness_class__class_type'
-        ).order_by('-booking_datetime')
+        bookings = booking_history(client, request.query_params, BookingSerializer(context=context))
         
-        # Filter by status if requested
-        status_filter = request.query_params.get('status')
-        if status_filter:
-            bookings = bookings.filter(status=status_filter)
-        
-        serializer = BookingSerializer(bookings, many=True, context={'request': request})
+        paginator = BookingCursorPagination()
+        page = paginator.paginate_queryset(bookings, request)
+        booking_rows = BookingSerializer(page, many=True, context=context).data
         
         # Add summary statistics
         stats = generate_booking_stats(client)
         
-        logger.info(f"Bookings retrieved for {email}: {bookings.count()} bookings")
+        logger.info(f"Bookings retrieved for {email}: {len(page)} bookings")
         
         return Response({
             'success': True,
-            'bookings': serializer.data,
+            'bookings': booking_rows,
+            **sideloaded_entities(context),
+            'pagination': {
+                'next': paginator.get_next_link(),
+                'previous': paginator.get_previous_link()
+            },
             'client_info': ClientSerializer(client).data,
             'statistics': stats
         })
@@ -282,16 +463,25 @@ def cancel_booking(request, booking_id):
                 'message': 'This booking cannot be cancelled. Cancellation deadline has passed.'
             }, status=status.HTTP_400_BAD_REQUEST)
         
+        held_seat = booking.status == 'confirmed'
+        promoted = None
         with transaction.atomic():
-            booking.status = 'cancelled'
-            booking.save()
-            
-            # Update class booking count
-            fitness_class = booking.fitness_class
-            fitness_class.current_bookings = max(0, fitness_class.current_bookings - 1)
-            fitness_class.save()
-        
+            # Only the request that actually flips the status releases the seat
+            if not booking.transition_to('cancelled'):
+                return Response({
+                    'success': False,
+                    'message': 'This booking has already been cancelled'
+                }, status=status.HTTP_409_CONFLICT)
+
+            # Update class booking count and hand the seat to the waitlist
+            if held_seat and booking.fitness_class.release_seat():
+                promoted = booking.fitness_class.promote_from_waitlist()
+                if promoted:
+                    enqueue('booking_confirmation', {'booking_id': str(promoted.id)})
+
         logger.info(f"Booking cancelled: {booking.booking_reference}")
+        if promoted:
+            logger.info(f"Promoted from waitlist: {promoted.booking_reference}")
         
         return Response({
             'success': True,
@@ -305,6 +495,147 @@ def cancel_booking(request, booking_id):
             'message': 'An error occurred while cancelling the booking'
         }, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+@api_view(['POST'])
+@permission_classes([IsAdminUser])
+def cancel_fitness_classes(request):
+    """
+    POST /api/classes/cancel
+    Studio-side cancellation of classes (by id or date range); every active
+    booking is cancelled and its client notified through the outbox
+    """
+    serializer = ClassCancellationSerializer(data=request.data)
+    if not serializer.is_valid():
+        return Response({
+            'success': False,
+            'message': 'Invalid cancellation request',
+            'errors': serializer.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    data = serializer.validated_data
+    if 'class_ids' in data:
+        classes = FitnessClass.objects.filter(id__in=data['class_ids'])
+    else:
+        start, end = date_range_bounds(data['date_from'], data['date_to'])
+        classes = FitnessClass.objects.filter(datetime__gte=start, datetime__lt=end)
+    
+    classes_cancelled, bookings_cancelled = cancel_classes(classes, data['reason'])
+    logger.info(
+        f"{request.user.username} cancelled {classes_cancelled} classes "
+        f"and {bookings_cancelled} bookings: {data['reason']}"
+    )
+    
+    return Response({
+        'success': True,
+        'message': f'{classes_cancelled} class(es) cancelled',
+        'classes_cancelled': classes_cancelled,
+        'bookings_cancelled': bookings_cancelled
+    })
+
+@api_view(['GET'])
+@permission_classes([IsAdminUser])
+def get_cache_stats(request):
+    """
+    GET /api/cache/stats
+    Hit and miss counts per cache tier in the worker serving the request
+    """
+    if not hasattr(cache, 'stats'):
+        return Response({'success': False, 'message': 'The default cache keeps no statistics'},
+                        status=status.HTTP_404_NOT_FOUND)
+    return Response({'success': True, 'stats': cache.stats()})
+
+@api_view(['GET'])
+def get_class_availability(request):
+    """
+    GET /api/classes/availability?date_from=YYYY-MM-DD&date_to=YYYY-MM-DD
+    Seat counts only, for dashboards that poll. Carries a strong ETag that
+    changes only when a returned value changes; a matching If-None-Match
+    gets an empty 304.
+    """
+    query = AvailabilityQuerySerializer(data=request.query_params)
+    if not query.is_valid():
+        return Response({
+            'success': False,
+            'message': 'Invalid date range',
+            'errors': query.errors
+        }, status=status.HTTP_400_BAD_REQUEST)
+    
+    start, end = date_range_bounds(query.validated_data['date_from'], query.validated_data['date_to'])
+    rows = FitnessClass.objects.filter(
+        datetime__gte=start, datetime__lt=end
+    ).with_availability().order_by('datetime', 'id').values_list('id', 'seats_left', 'bookable', 'status')
+    
+    data = {
+        'success': True,
+        'classes': [
+            {
+                'id': str(class_id),
+                'available_slots': seats_left,
+                'is_bookable': bool(bookable),
+                'status': class_status,
+            }
+            for class_id, seats_left, bookable, class_status in rows
+        ]
+    }
+    etag = strong_etag(data)
+    
+    if etag in parse_etags(request.META.get('HTTP_IF_NONE_MATCH', '')):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        response = Response(data)
+    response['ETag'] = etag
+    # Clients may keep the snapshot but must revalidate before reusing it
+    patch_cache_control(response, no_cache=True)
+    return response
+
+async def stream_class_availability(request):
+    """
+    GET /api/classes/availability/stream?classes=<id>,<id>&dates=YYYY-MM-DD
+    Server-sent events: one `snapshot` event with the current seat counts of
+    the followed classes, then an `availability` event whenever a booking,
+    cancellation or schedule change commits for one of them. Served from the
+    event loop, so an idle connection costs a queue rather than a thread;
+    nothing polls the database.
+    """
+    # Plain Django view: DRF's api_view cannot wrap coroutines
+    if request.method != 'GET':
+        return HttpResponseNotAllowed(['GET'])
+    
+    # Under WSGI Django drains the stream synchronously: the response would be
+    # buffered for the whole session while it holds a worker thread
+    if not isinstance(request, ASGIRequest):
+        return JsonResponse({
+            'success': False,
+            'message': 'Availability streaming is only served over ASGI'
+        }, status=501)
+    
+    query = AvailabilityStreamSerializer(data=request.GET)
+    if not query.is_valid():
+        return JsonResponse({
+            'success': False,
+            'message': 'Invalid subscription',
+            'errors': query.errors
+        }, status=400)
+    
+    class_ids = query.validated_data['classes']
+    dates = query.validated_data['dates']
+    topics = [class_topic(class_id) for class_id in class_ids] + [date_topic(date) for date in dates]
+    
+    followed = models.Q(id__in=class_ids)
+    for date in dates:
+        start, end = date_range_bounds(date, date)
+        followed |= models.Q(datetime__gte=start, datetime__lt=end)
+    
+    def snapshot():
+        return [event for event, _ in availability_events(FitnessClass.objects.filter(followed))]
+    
+    # Subscribe before reading the snapshot so no change can fall in between
+    stream = EventStream(get_hub().subscribe(topics), sync_to_async(snapshot))
+    response = StreamingHttpResponse(stream, content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # Proxies must pass events through as they are written
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
 @api_view(['GET'])
 def get_class_details(request, class_id):
     """
@@ -313,7 +644,7 @@ def get_class_details(request, class_id):
     """
     try:
         fitness_class = get_object_or_404(
-            FitnessClass.objects.select_related('instructor', 'class_type'),
+            FitnessClass.objects.with_related(),
             id=class_id
         )
         
@@ -333,14 +664,7 @@ def get_class_details(request, class_id):
                 'waitlist_count': fitness_class.bookings.filter(status='waitlisted').count(),
                 'available_slots': fitness_class.available_slots,
                 'is_bookable': fitness_class.is_bookable,
-                'recent_bookings': [
-                    {
-                        'client_name': booking.client.name, 
-                        'booking_time': booking.booking_datetime.isoformat(),
-                        'booking_reference': booking.booking_reference
-                    }
-                    for booking in recent_bookings
-                ]
+                'recent_bookings': recent_booking_details(recent_bookings)
             }
         })
         
@@ -637,7 +961,7 @@ def get_instructors(request):
     Get list of active instructors
     """
     try:
-        instructors = Instructor.objects.filter(is_active=True).order_by('name')
+        instructors = Instructor.objects.filter(is_active=True).with_class_counts().order_by('name')
         
         instructor_data = []
         for instructor in instructors:
@@ -648,7 +972,7 @@ def get_instructors(request):
                 'bio': instructor.bio,
                 'experience_years': instructor.experience_years,
                 'rating': float(instructor.rating),
-                'total_classes': instructor.classes.filter(status='completed').count()
+                'total_classes': instructor.total_classes
             })
         
         return Response({
@@ -2,6 +2,8 @@
 ASGI config for fitness_studio project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+Requests are routed through fitness_studio.asgi_urls, which serves the
+read-heavy bookings endpoints from async views.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
@@ -9,8 +11,23 @@ https://docs.djangoproject.com/en/4.2/howto/deployment/asgi/
 
 import os
 
-from django.core.asgi import get_asgi_application
+import django
+from django.core.handlers.asgi import ASGIHandler
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'fitness_studio.settings')
 
-application = get_asgi_application()
+ASGI_URLCONF = 'fitness_studio.asgi_urls'
+
+
+class AsyncReadsASGIHandler(ASGIHandler):
+    """ASGIHandler resolving every request against ASGI_URLCONF"""
+
+    def create_request(self, scope, body_file):
+        request, error_response = super().create_request(scope, body_file)
+        if request is not None:
+            request.urlconf = ASGI_URLCONF
+        return request, error_response
+
+
+django.setup(set_prefix=False)
+application = AsyncReadsASGIHandler()
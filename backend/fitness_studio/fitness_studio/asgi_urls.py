@@ -0,0 +1,11 @@
+"""
+URL configuration used by asgi.py: the same routes as fitness_studio.urls,
+with the bookings API served by its async read views.
+"""
+from django.contrib import admin
+from django.urls import path, include
+
+urlpatterns = [
+    path('admin/', admin.site.urls),
+    path('api/', include('bookings.async_urls')),
+]
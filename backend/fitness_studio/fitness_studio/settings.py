@@ -45,6 +45,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'bookings.middleware.QueryInstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -94,6 +95,25 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'fitness_studio.wsgi.application'
 
+TEST_RUNNER = 'bookings.testing.TestRunner'
+
+# Cache: a short-lived in-process L1 in front of 'shared'. Token, throttle
+# and cache version lookups use 'shared' directly. LocMemCache below is per
+# process, so it is only correct for a single-process server: in production
+# 'shared' MUST point at Redis or Memcached, or invalidation, revocation and
+# throttling stop at the worker that made the change.
+CACHES = {
+    'default': {
+        'BACKEND': 'bookings.cache_backends.TwoTierCache',
+        'LOCATION': 'shared',
+        'OPTIONS': {'L1_MAX_ENTRIES': 1024, 'L1_TIMEOUT': 5},
+    },
+    'shared': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'shared',
+    },
+}
+
 
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
@@ -174,23 +194,52 @@ BOOKING_SETTINGS = {
     'MAX_BOOKING_DAYS_AHEAD': 30,
     'MIN_BOOKING_HOURS_AHEAD': 2,
     'CANCELLATION_HOURS_AHEAD': 4,
+    # Upper bound only: listings also expire when a listed class passes the
+    # booking cutoff or starts
+    'CLASS_LIST_CACHE_TTL': 60 * 5,
+    'CLIENT_STATS_CACHE_TTL': 60 * 5,
+    'CLASS_PAGE_SIZE': 50,
+    'BOOKING_PAGE_SIZE': 50,
+    'MAX_BATCH_BOOKINGS': 26,
+    # Render class listings through the compiled serializer (same output)
+    'FAST_CLASS_SERIALIZER': True,
+    # Availability stream: transport for seat change events (one process by
+    # default; point at another BroadcastHub to fan out across workers)
+    'BROADCAST_HUB': 'bookings.streaming.InProcessHub',
+    'MAX_STREAM_TOPICS': 50,
+    'STREAM_KEEPALIVE_SECONDS': 15,
+    'STREAM_MAX_SECONDS': 60 * 10,
+    # Token authentication cache: revocation only reaches the workers sharing
+    # it, and with the per-process LocMemCache a revoked token lives on in the
+    # others for up to the TTL (check --deploy warns)
+    'AUTH_TOKEN_CACHE': 'shared',
+    'AUTH_TOKEN_CACHE_TTL': 30,
+    # Throttle counters: a SQLite file every worker on the host shares
+    # (CacheThrottleStore keeps them in THROTTLE_CACHE instead)
+    'THROTTLE_STORE': 'bookings.throttling.SQLiteThrottleStore',
+    'THROTTLE_CACHE': 'shared',
+    'THROTTLE_STORE_PATH': BASE_DIR / 'throttle.sqlite3',
+    # Namespace version counters: read and bumped on the shared tier, never
+    # through a per-process L1
+    'CACHE_VERSION_CACHE': 'shared',
 }
 
 # REST Framework Configuration
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'bookings.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.IsAuthenticatedOrReadOnly',
     ],
     'DEFAULT_THROTTLE_CLASSES': [
-        'rest_framework.throttling.AnonRateThrottle',
-        'rest_framework.throttling.UserRateThrottle'
+        'bookings.throttling.AnonRateThrottle',
+        'bookings.throttling.UserRateThrottle'
     ],
     'DEFAULT_THROTTLE_RATES': {
         'anon': '100/hour',
-        'user': '1000/hour'
+        'user': '1000/hour',
+        'booking': '30/hour'
     }
 }
\ No newline at end of file